@@ -0,0 +1,71 @@
+import os
+import asyncio
+from starlette.responses import JSONResponse
+from telemetry import Counter, Gauge
+
+# === Admission control for the prediction endpoints ===
+# Each server worker processes at most ADMISSION_MAX_IN_FLIGHT predictions at once. A
+# request over the limit waits up to ADMISSION_QUEUE_TIMEOUT seconds for a slot and is
+# then turned away with a 503, so overload sheds in milliseconds instead of queueing.
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.05"))
+ADMISSION_RETRY_AFTER = os.getenv("ADMISSION_RETRY_AFTER", "2")
+
+requests_in_flight = Gauge(
+    "advisor_requests_in_flight", "Prediction requests being processed by this worker.")
+requests_rejected = Counter(
+    "advisor_requests_rejected_total", "Prediction requests turned away with a 503 by admission control.", ["path"])
+
+
+class AdmissionControl:
+    """
+    ASGI middleware limiting the requests in flight on `paths`.
+
+    A request holds its slot until its response has been sent, so a streamed
+    response counts for as long as it streams.
+    """
+
+    def __init__(self, app, paths, limit=ADMISSION_MAX_IN_FLIGHT, queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                 retry_after=ADMISSION_RETRY_AFTER):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._slots = None
+        requests_in_flight.set_function(lambda: self.in_flight)
+
+    async def _acquire(self):
+        if self._slots is None:
+            # Created on first use, on the serving event loop
+            self._slots = asyncio.Semaphore(self.limit)
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return True
+        if self.queue_timeout <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        if not await self._acquire():
+            requests_rejected.inc(path=scope["path"])
+            response = JSONResponse(
+                {"detail": "The server is at capacity, please retry shortly."},
+                status_code=503, headers={"Retry-After": self.retry_after},
+            )
+            await response(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
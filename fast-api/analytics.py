@@ -0,0 +1,122 @@
+import os
+import numpy as np
+
+# === Deterministic fund analytics ===
+# Metrics are computed for every fund at once over a date-aligned NAV matrix and handed
+# to the model as facts, instead of asking the model to do the arithmetic itself.
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.065"))
+TRADING_DAYS = 252
+RETURN_PERIODS = {"1Y": 365, "3Y": 3 * 365, "5Y": 5 * 365}
+
+
+def build_nav_matrix(series):
+    """
+    Align NAV series on the union of their dates.
+
+    `series` is a list of ascending (ordinal days, navs) arrays. Returns
+    (dates, observed, filled): `observed` holds NaN on days a fund did not report, and
+    `filled` carries the last known NAV forward over those gaps (NaN before a fund's
+    first observation).
+    """
+    non_empty = [days for days, _ in series if len(days)]
+    dates = np.unique(np.concatenate(non_empty)) if non_empty else np.empty(0, dtype=np.int64)
+    observed = np.full((len(dates), len(series)), np.nan)
+    for j, (days, navs) in enumerate(series):
+        observed[np.searchsorted(dates, days), j] = navs
+
+    if len(dates) == 0:
+        return dates, observed, observed.copy()
+    rows = np.where(np.isnan(observed), 0, np.arange(len(dates))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = observed[rows, np.arange(len(series))]
+    return dates, observed, filled
+
+
+def compute_metrics(dates, observed, filled, risk_free_rate=RISK_FREE_RATE):
+    """Return a dict of metric name -> per-fund array (NaN where a metric cannot be computed)."""
+    n_funds = filled.shape[1]
+    if len(dates) == 0:
+        empty = np.full(n_funds, np.nan)
+        return {"latest_nav": empty, **{f"return_{p}": empty for p in RETURN_PERIODS},
+                "volatility": empty, "sharpe_ratio": empty, "max_drawdown": empty}
+
+    latest = filled[-1]
+    metrics = {"latest_nav": latest}
+
+    # Point-to-point CAGR against the last NAV on or before each horizon's start date
+    for label, days in RETURN_PERIODS.items():
+        i = np.searchsorted(dates, dates[-1] - days, side='right') - 1
+        if i < 0:
+            metrics[f"return_{label}"] = np.full(n_funds, np.nan)
+            continue
+        years = (dates[-1] - dates[i]) / 365.25
+        with np.errstate(invalid='ignore', divide='ignore'):
+            metrics[f"return_{label}"] = (latest / filled[i]) ** (1 / years) - 1
+
+    # Daily returns only on days a fund actually reported, measured from its previous NAV,
+    # so holidays and missing days do not show up as zero-return days
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily = filled[1:] / filled[:-1] - 1
+    daily[np.isnan(observed[1:])] = np.nan
+    counts = np.sum(~np.isnan(daily), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(daily, axis=0) / counts
+        std = np.sqrt(np.nansum((daily - mean) ** 2, axis=0) / (counts - 1))
+        volatility = std * np.sqrt(TRADING_DAYS)
+        sharpe = (mean * TRADING_DAYS - risk_free_rate) / volatility
+    metrics["volatility"] = np.where(counts > 1, volatility, np.nan)
+    metrics["sharpe_ratio"] = np.where((counts > 1) & (volatility > 0), sharpe, np.nan)
+
+    running_peak = np.fmax.accumulate(filled, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = filled / running_peak - 1
+    all_nan = np.all(np.isnan(drawdown), axis=0)
+    drawdown[:, all_nan] = 0
+    metrics["max_drawdown"] = np.where(all_nan, np.nan, np.nanmin(drawdown, axis=0))
+    return metrics
+
+
+def nav_matrix(nav_series_list):
+    """Align parsed NavSeries objects into (dates, observed, filled)."""
+    return build_nav_matrix([(series.days, series.navs) for series in nav_series_list])
+
+
+def fund_metrics(matrix, risk_free_rate=RISK_FREE_RATE):
+    """
+    Compute metrics for every fund in a (dates, observed, filled) NAV matrix.
+
+    Returns one dict per fund with returns, volatility and drawdown as percentages
+    rounded to two decimals, or None where a value is not available.
+    """
+    dates, observed, filled = matrix
+    metrics = compute_metrics(dates, observed, filled, risk_free_rate)
+    percent = {f"return_{p}" for p in RETURN_PERIODS} | {"volatility", "max_drawdown"}
+
+    results = []
+    for j in range(filled.shape[1]):
+        row = {}
+        for name, values in metrics.items():
+            value = values[j]
+            if np.isnan(value):
+                row[name] = None
+            elif name in percent:
+                row[name] = round(float(value) * 100, 2)
+            else:
+                row[name] = round(float(value), 4)
+        results.append(row)
+    return results
+
+
+METRIC_COLUMNS = [
+    "latest_nav", "return_1Y", "return_3Y", "return_5Y", "volatility", "sharpe_ratio", "max_drawdown",
+]
+
+
+def metrics_table(scheme_codes, names, metrics):
+    """Render fund metrics as a compact pipe-separated table for the prompt."""
+    header = ["scheme_code", "fund_name"] + METRIC_COLUMNS
+    lines = [" | ".join(header)]
+    for code, name, row in zip(scheme_codes, names, metrics):
+        values = ["N/A" if row.get(col) is None else str(row[col]) for col in METRIC_COLUMNS]
+        lines.append(" | ".join([str(code), name] + values))
+    return "\n".join(lines)
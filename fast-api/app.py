@@ -1,31 +1,52 @@
 import os
-import requests
+import asyncio
 import json
-import csv
 import uuid
-from datetime import datetime, timedelta
-import urllib.parse
+import logging
+from contextlib import asynccontextmanager
+from typing import List
 import google.generativeai as genai
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware  # Import CORSMiddleware
+from upstream import lyzr, twelvedata, UpstreamError, UPSTREAMS, open_clients, close_clients
+from enrichment import resolve_funds
+from nav_series import series_cache, NAV_WINDOW_DAYS
+from analytics import nav_matrix, fund_metrics, metrics_table, METRIC_COLUMNS
+from projections import project_plan
+from recommendations import Prediction, RecommendationParser, dump_section, parse_recommendations
+from dataset import FUND_FIELDS, NAV_GRANULARITIES, build_csv, compact_nav_column
+from prompt_budget import PROMPT_NAV_GRANULARITY, compact_schema, fit_to_budget
+from genai_client import upload_cache, get_model
+from scheme_index import start_background_refresh
+from fund_universe import get_universe, FUND_LIST_URL, start_background_refresh as start_universe_refresh
+from cache import prediction_cache, parameters_cache, profile_key
+from jobs import JobQueue, QueueFull, DONE, FAILED
+from profile_rules import rule_parameters, extraction_stats
+from telemetry import REGISTRY, CONTENT_TYPE, configure_logging, span, trace_request, funds_skipped
+from admission import AdmissionControl
 
 # === Security Best Practice: Use Environment Variables for API Keys ===
 load_dotenv()
+configure_logging()
+log = logging.getLogger(__name__)
 
 # Ensure your .env file or environment variables contain the following keys
 lyzr_api_key = os.getenv("LYZR_API_KEY")
 twelvedata_api_key = os.getenv("TWELVEDATA_API_KEY")
 GENAI_API_KEY = os.getenv("GENAI_API_KEY") 
 agent_id = os.getenv("AGENT_ID")  # Replace with your actual agent ID or set via environment variable
+LYZR_CHAT_URL = os.getenv("LYZR_CHAT_URL", "https://agent.api.lyzr.app/v2/chat/")
 
-if not all([lyzr_api_key, twelvedata_api_key, GENAI_API_KEY, agent_id]):
-    raise EnvironmentError("Missing API keys or agent ID. Please set LYZR_API_KEY, TWELVEDATA_API_KEY, GENAI_API_KEY, and AGENT_ID in your environment.")
-
-# === Configure the Gemini API Client ===
-genai.configure(api_key=GENAI_API_KEY)
+# Server worker processes for `python app.py`; each runs its own event loop and gets an
+# equal share of every upstream's rate limit (see upstream.WORKER_PROCESSES)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8080"))
 
 # Headers for Lyzr API requests
 headers = {
@@ -33,7 +54,37 @@ headers = {
     "x-api-key": lyzr_api_key
 }
 
-app = FastAPI()
+def check_environment():
+    if not all([lyzr_api_key, twelvedata_api_key, GENAI_API_KEY, agent_id]):
+        raise EnvironmentError("Missing API keys or agent ID. Please set LYZR_API_KEY, TWELVEDATA_API_KEY, GENAI_API_KEY, and AGENT_ID in your environment.")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Checked and configured when a server starts rather than on import
+    check_environment()
+    # === Configure the Gemini API Client ===
+    genai.configure(api_key=GENAI_API_KEY)
+    # Keep-alive clients for Lyzr, Twelve Data and mfapi, bound to this event loop
+    open_clients()
+    # Build the fund name -> scheme code index in the background and keep it fresh
+    start_background_refresh()
+    # Keep the local snapshot of the fund universe up to date
+    start_universe_refresh()
+    # Start the job workers and resume jobs left queued or running before a restart
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        await close_clients()
+
+app = FastAPI(lifespan=lifespan)
+
+# Added before CORS so that 503s still carry the CORS headers
+app.add_middleware(
+    AdmissionControl,
+    paths=["/get-predictions", "/get-predictions/stream", "/get-predictions/batch"],
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +94,10 @@ app.add_middleware(
     allow_headers=["*"],            # Allows all headers
 )
 
+# Profiles per batch request, and agent/Gemini calls in flight at once while a batch runs
+BATCH_MAX_PROFILES = int(os.getenv("BATCH_MAX_PROFILES", "500"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
 class UserProfile(BaseModel):
     risk_tolerance: str
     financial_goals: list
@@ -52,8 +107,8 @@ class UserProfile(BaseModel):
     savings: str
     debt_levels: str
 
-def get_api_parameters(agent_id, user_id, session_id, user_input):
-    url = "https://agent.api.lyzr.app/v2/chat/"
+async def get_api_parameters(agent_id, user_id, session_id, user_input):
+    url = LYZR_CHAT_URL
     payload = {
         "user_id": user_id,
         "agent_id": agent_id,
@@ -62,9 +117,9 @@ def get_api_parameters(agent_id, user_id, session_id, user_input):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
+        response = await lyzr.arequest(lyzr.async_client, "POST", url, headers=headers, json=payload)
+    except UpstreamError as e:
+        log.warning("Request failed: %s", e)
         return None
     
     if response.status_code == 200:
@@ -76,21 +131,26 @@ def get_api_parameters(agent_id, user_id, session_id, user_input):
             params = json.loads(output)
             return params
         except json.JSONDecodeError:
-            print("Failed to parse JSON output.")
+            log.warning("Failed to parse JSON output.")
             return None
     else:
-        print(f"Error during conversation: {response.status_code} - {response.text}")
+        log.warning("Error during conversation: %s - %s", response.status_code, response.text)
         return None
 
-def fetch_mutual_funds(api_parameters):
-    api_endpoint = "https://api.twelvedata.com/mutual_funds/list"
+async def fetch_mutual_funds(api_parameters):
+    # Answer from the local fund universe snapshot while it is fresh
+    universe = get_universe()
+    if universe and universe.supports(api_parameters):
+        return {"result": {"list": universe.query(api_parameters)}}
+
+    api_endpoint = FUND_LIST_URL
     # Add the Twelve Data API key to the parameters
     api_parameters["apikey"] = twelvedata_api_key
 
     try:
-        response = requests.get(api_endpoint, params=api_parameters)
-    except requests.exceptions.RequestException as e:
-        print(f"API request failed: {e}")
+        response = await twelvedata.arequest(twelvedata.async_client, "GET", api_endpoint, params=api_parameters)
+    except UpstreamError as e:
+        log.warning("API request failed: %s", e)
         return None
 
     if response.status_code == 200:
@@ -98,97 +158,192 @@ def fetch_mutual_funds(api_parameters):
             funds_list = response.json()
             return funds_list
         except json.JSONDecodeError:
-            print("Failed to parse mutual funds JSON response.")
+            log.warning("Failed to parse mutual funds JSON response.")
             return None
     else:
-        print(f"Error fetching mutual funds: {response.status_code} - {response.text}")
+        log.warning("Error fetching mutual funds: %s - %s", response.status_code, response.text)
         return None
 
-def get_scheme_code(fund_name):
-    query = urllib.parse.quote(fund_name)
-    search_url = f'https://api.mfapi.in/mf/search?q={query}'
-    try:
-        response = requests.get(search_url)
-        if response.status_code == 200:
-            schemes = response.json()
-            if schemes:
-                # Attempt to find the best match
-                fund_name_lower = fund_name.lower()
-                best_match = None
-                for scheme in schemes:
-                    scheme_name = scheme['schemeName']
-                    if scheme_name.lower() == fund_name_lower:
-                        best_match = scheme
-                        break
-                if not best_match:
-                    # No exact match, pick the first one
-                    best_match = schemes[0]
-                return best_match['schemeCode']
-            else:
-                print(f"No schemes found for fund name: {fund_name}")
-                return None
-        else:
-            print(f"Error fetching scheme code: {response.status_code} - {response.text}")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
-
-def get_fund_data(scheme_code):
-    url = f'https://api.mfapi.in/mf/{scheme_code}'
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            fund_data = response.json()
-            return fund_data
-        else:
-            print(f"Error fetching fund data for scheme code {scheme_code}: {response.status_code} - {response.text}")
+async def upload_csv_file(csv_bytes):
+    with span("upload"):
+        try:
+            # Identical datasets reuse the handle of an earlier, still valid upload; the SDK call blocks
+            uploaded_file = await asyncio.to_thread(upload_cache.upload, csv_bytes, mime_type='text/csv')
+            log.debug("File uploaded successfully. File name: %s", uploaded_file.name)
+            return uploaded_file
+        except Exception as e:
+            log.warning("An error occurred during file upload: %s", e)
             return None
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
 
-def get_nav_data_one_year(fund_data):
-    nav_data = fund_data.get('data', [])
-    one_year_ago = datetime.now() - timedelta(days=1825)
-    nav_data_one_year = []
-    for entry in nav_data:
-        date_str = entry['date']
+async def chat_with_csv(prompt, uploaded_file, on_chunk=None):
+    with span("generation"):
         try:
-            date_obj = datetime.strptime(date_str, '%d-%m-%Y')
-        except ValueError:
-            print(f"Invalid date format: {date_str}")
-            continue
-        if date_obj >= one_year_ago:
-            nav_data_one_year.append(entry)
-        else:
-            break  # Since data is usually in reverse chronological order
-    return nav_data_one_year
+            model = get_model()
+            if on_chunk is None:
+                response = await model.generate_content_async([prompt, uploaded_file])
+                return response.text
+            # Stream tokens to the caller as they are generated
+            chunks = []
+            async for chunk in await model.generate_content_async([prompt, uploaded_file], stream=True):
+                chunks.append(chunk.text)
+                on_chunk(chunk.text)
+            return "".join(chunks)
+        except Exception as e:
+            log.warning("An error occurred during content generation: %s", e)
+            return None
 
-def format_nav_data(nav_entries):
-    try:
-        return json.dumps(nav_entries)
-    except (TypeError, ValueError):
-        return json.dumps([])  # Return empty list if serialization fails
+RESPONSE_SCHEMA = (
+    "{\n"
+    "  \"Investment_Actions\": [\n"
+    "    {\n"
+    "      \"Action\": \"<Brief, actionable title>\",\n"
+    "      \"Details\": \"<Detailed explanation with specific numbers and rationale>\",\n"
+    "      \"Priority\": \"<High/Medium/Low>\",\n"
+    "      \"Timeline\": \"<Immediate/Short-term/Long-term>\",\n"
+    "      \"Expected_Impact\": \"<Quantified impact on portfolio>\",\n"
+    "      \"Associated_Strategies\": [\"<List of related diversification strategies>\"]\n"
+    "    }\n"
+    "  ],\n"
+    "  \"Top_Mutual_Funds\": [\n"
+    "    {\n"
+    "      \"Fund_Name\": \"<Full fund name>\",\n"
+    "      \"Scheme_Code\": \"<Scheme code>\",\n"
+    "      \"Fund_House\": \"<Fund house name>\",\n"
+    "      \"Scheme_Type\": \"<Type>\",\n"
+    "      \"Scheme_Category\": \"<Category>\",\n"
+    "      \"Performance_Rating\": \"<1-5 rating>\",\n"
+    "      \"Risk_Rating\": \"<1-5 rating>\",\n"
+    "      \"Currency\": \"<Currency code>\",\n"
+    "      \"Exchange\": \"<Exchange name>\",\n"
+    "      \"MIC_Code\": \"<Market identifier code>\",\n"
+    "      \"Latest_NAV\": \"<Current NAV>\",\n"
+    "      \"Historical_Returns\": [\n"
+    "        {\n"
+    "          \"Time_Period\": \"1Y\",\n"
+    "          \"Return_Percentage\": \"<Calculated 1-year return>\"\n"
+    "        },\n"
+    "        {\n"
+    "          \"Time_Period\": \"3Y\",\n"
+    "          \"Return_Percentage\": \"<Calculated 3-year return>\"\n"
+    "        },\n"
+    "        {\n"
+    "          \"Time_Period\": \"5Y\",\n"
+    "          \"Return_Percentage\": \"<Calculated 5-year return>\"\n"
+    "        }\n"
+    "      ],\n"
+    "      \"Expense_Ratio\": \"<Expense ratio of the fund>\",\n"
+    "      \"AUM\": \"<Assets Under Management>\"\n"
+    "    }\n"
+    "  ],\n"
+    "  \"Diversification_Strategies\": [\n"
+    "    {\n"
+    "      \"Strategy\": \"<Name of the diversification strategy>\",\n"
+    "      \"Description\": \"<Detailed description of the strategy>\",\n"
+    "      \"Benefits\": \"<Benefits of implementing this strategy>\",\n"
+    "      \"Recommended_Allocation\": \"<Suggested percentage allocation>\",\n"
+    "      \"Supported_Funds\": [\n"
+    "        {\n"
+    "          \"Scheme_Code\": \"<Scheme code>\",\n"
+    "          \"Fund_Name\": \"<Full fund name>\",\n"
+    "          \"Allocation_Percentage\": \"<Allocation percentage for this fund>\",\n"
+    "          \"Key_Metrics\": {\n"
+    "            \"1Y_Return\": \"<Calculated 1-year return>\",\n"
+    "            \"3Y_Return\": \"<Calculated 3-year return>\",\n"
+    "            \"5Y_Return\": \"<Calculated 5-year return>\",\n"
+    "            \"Standard_Deviation\": \"<Calculated standard deviation of returns>\",\n"
+    "            \"Sharpe_Ratio\": \"<Calculated Sharpe ratio>\"\n"
+    "          }\n"
+    "        }\n"
+    "      ]\n"
+    "    }\n"
+    "  ],\n"
+    "  \"Sample_Investment_Plan\": {\n"
+    "    \"Initial_Investment\": \"<Total amount to invest>\",\n"
+    "    \"Allocation\": [\n"
+    "      {\n"
+    "        \"Fund_Name\": \"<Name of the mutual fund>\",\n"
+    "        \"Scheme_Code\": \"<Scheme code>\",\n"
+    "        \"Investment_Amount\": \"<Amount allocated>\",\n"
+    "        \"Percentage\": \"<Allocation percentage>\",\n"
+    "        \"Projected_Returns\": \"<Calculated expected returns>\",\n"
+    "        \"Investment_Strategy\": \"<Associated diversification strategy>\"\n"
+    "      }\n"
+    "    ],\n"
+    "    \"Growth_Projection\": [\n"
+    "      {\n"
+    "        \"Year\": \"<Year number>\",\n"
+    "        \"Projected_Value\": \"<Calculated value based on growth projections>\",\n"
+    "        \"Best_Case\": \"<Calculated best case value>\",\n"
+    "        \"Worst_Case\": \"<Calculated worst case value>\",\n"
+    "        \"Expected_Return\": \"<Calculated return percentage>\",\n"
+    "        \"CAGR\": \"<Calculated Compound Annual Growth Rate>\"\n"
+    "      }\n"
+    "    ]\n"
+    "  },\n"
+    "  \"Market_Trends\": [\n"
+    "    {\n"
+    "      \"Trend\": \"<Identified market trend>\",\n"
+    "      \"Analysis\": \"<Detailed analysis using data>\",\n"
+    "      \"Impact\": \"<Impact on the recommended investments>\",\n"
+    "      \"Direction\": \"<Positive/Negative/Neutral>\",\n"
+    "      \"Confidence\": \"<High/Medium/Low based on data>\",\n"
+    "      \"Supporting_Data\": [\n"
+    "        {\n"
+    "          \"Metric\": \"<Related metric>\",\n"
+    "          \"Value\": \"<Calculated value>\",\n"
+    "          \"Change\": \"<Calculated percentage change>\",\n"
+    "          \"Date\": \"<Relevant date>\"\n"
+    "        }\n"
+    "      ]\n"
+    "    }\n"
+    "  ],\n"
+    "  \"Risk_Assessment\": [\n"
+    "    {\n"
+    "      \"Risk\": \"<Identified risk>\",\n"
+    "      \"Category\": \"<Market/Credit/Liquidity/Operational>\",\n"
+    "      \"Severity\": \"<High/Medium/Low>\",\n"
+    "      \"Probability\": \"<High/Medium/Low>\",\n"
+    "      \"Impact_Score\": \"<Calculated on a scale of 1-10>\",\n"
+    "      \"Assessment\": \"<Detailed assessment based on data>\",\n"
+    "      \"Mitigation_Strategies\": \"<Specific strategies to mitigate risk>\",\n"
+    "      \"Associated_Funds\": [\n"
+    "        {\n"
+    "          \"Scheme_Code\": \"<Scheme code>\",\n"
+    "          \"Fund_Name\": \"<Full fund name>\"\n"
+    "        }\n"
+    "      ]\n"
+    "    }\n"
+    "  ],\n"
+    "  \"Projected_Outcomes\": [\n"
+    "    {\n"
+    "      \"Time_Horizon\": \"<Time frame>\",\n"
+    "      \"Projected_Return\": \"<Calculated return percentage>\",\n"
+    "      \"Details\": \"<Detailed explanation based on calculations>\",\n"
+    "      \"Assumptions\": \"<Any assumptions made during calculations>\",\n"
+    "      \"Risk_Adjusted_Return\": \"<Calculated risk-adjusted return percentage>\"\n"
+    "    }\n"
+    "  ],\n"
+    "  \"Justifications\": [\n"
+    "    {\n"
+    "      \"Title\": \"<Title of the justification>\",\n"
+    "      \"Details\": \"<Detailed justification for recommendations based on data and calculations>\",\n"
+    "      \"Associated_Funds\": [\n"
+    "        {\n"
+    "          \"Scheme_Code\": \"<Scheme code>\",\n"
+    "          \"Fund_Name\": \"<Full fund name>\"\n"
+    "        }\n"
+    "      ]\n"
+    "    }\n"
+    "  ]\n"
+    "}\n"
+)
 
-def upload_csv_file(file_path):
-    try:
-        uploaded_file = genai.upload_file(file_path, mime_type='text/csv')
-        print(f"File uploaded successfully. File name: {uploaded_file.name}")
-        return uploaded_file
-    except Exception as e:
-        print(f"An error occurred during file upload: {e}")
-        return None
+def nav_history_note(nav_granularity):
+    if nav_granularity not in NAV_GRANULARITIES:
+        return ""
+    return f"The CSV's nav_history column lists {nav_granularity} period-end NAVs as 'period:nav' pairs separated by ';'.\n"
 
-def chat_with_csv(prompt, uploaded_file):
-    try:
-        model = genai.GenerativeModel(model_name="gemini-1.5-flash")
-        response = model.generate_content([prompt, uploaded_file])
-        return response.text
-    except Exception as e:
-        print(f"An error occurred during content generation: {e}")
-        return None
-def create_ai_prompt(user_profile):
+def create_ai_prompt(user_profile, fund_metrics_table, nav_granularity):
     prompt = (
         "You are a highly knowledgeable financial advisor specializing in creating personalized investment portfolios. "
         "Based on the client's detailed financial profile and the provided mutual funds data in the attached CSV file, "
@@ -197,162 +352,14 @@ def create_ai_prompt(user_profile):
         
         "### Important Notes:\n"
         "- **All fields must be populated with calculated values; do not leave any fields null or empty.**\n"
-        "- Perform necessary calculations using the 5 years of NAV data provided in the CSV file.\n"
-        "- Use appropriate financial formulas to compute returns, standard deviation, Sharpe ratio, projections, etc.\n"
+        "- Returns, volatility, Sharpe ratio and drawdown for every fund are precomputed from 5 years of NAV data "
+        "and listed under 'Precomputed Fund Metrics'; use these exact values and do not recalculate them.\n"
+        "- Use appropriate financial formulas only for values that are not precomputed, such as projections.\n"
         "- If any data is missing, make reasonable and justifiable estimates based on available information.\n\n"
         
         "### JSON Schema:\n"
-        "{\n"
-        "  \"Investment_Actions\": [\n"
-        "    {\n"
-        "      \"Action\": \"<Brief, actionable title>\",\n"
-        "      \"Details\": \"<Detailed explanation with specific numbers and rationale>\",\n"
-        "      \"Priority\": \"<High/Medium/Low>\",\n"
-        "      \"Timeline\": \"<Immediate/Short-term/Long-term>\",\n"
-        "      \"Expected_Impact\": \"<Quantified impact on portfolio>\",\n"
-        "      \"Associated_Strategies\": [\"<List of related diversification strategies>\"]\n"
-        "    }\n"
-        "  ],\n"
-        
-        "  \"Top_Mutual_Funds\": [\n"
-        "    {\n"
-        "      \"Fund_Name\": \"<Full fund name>\",\n"
-        "      \"Scheme_Code\": \"<Scheme code>\",\n"
-        "      \"Fund_House\": \"<Fund house name>\",\n"
-        "      \"Scheme_Type\": \"<Type>\",\n"
-        "      \"Scheme_Category\": \"<Category>\",\n"
-        "      \"Performance_Rating\": \"<1-5 rating>\",\n"
-        "      \"Risk_Rating\": \"<1-5 rating>\",\n"
-        "      \"Currency\": \"<Currency code>\",\n"
-        "      \"Exchange\": \"<Exchange name>\",\n"
-        "      \"MIC_Code\": \"<Market identifier code>\",\n"
-        "      \"Latest_NAV\": \"<Current NAV>\",\n"
-        "      \"Historical_Returns\": [\n"
-        "        {\n"
-        "          \"Time_Period\": \"1Y\",\n"
-        "          \"Return_Percentage\": \"<Calculated 1-year return>\"\n"
-        "        },\n"
-        "        {\n"
-        "          \"Time_Period\": \"3Y\",\n"
-        "          \"Return_Percentage\": \"<Calculated 3-year return>\"\n"
-        "        },\n"
-        "        {\n"
-        "          \"Time_Period\": \"5Y\",\n"
-        "          \"Return_Percentage\": \"<Calculated 5-year return>\"\n"
-        "        }\n"
-        "      ],\n"
-        "      \"Expense_Ratio\": \"<Expense ratio of the fund>\",\n"
-        "      \"AUM\": \"<Assets Under Management>\"\n"
-        "    }\n"
-        "  ],\n"
-        
-        "  \"Diversification_Strategies\": [\n"
-        "    {\n"
-        "      \"Strategy\": \"<Name of the diversification strategy>\",\n"
-        "      \"Description\": \"<Detailed description of the strategy>\",\n"
-        "      \"Benefits\": \"<Benefits of implementing this strategy>\",\n"
-        "      \"Recommended_Allocation\": \"<Suggested percentage allocation>\",\n"
-        "      \"Supported_Funds\": [\n"
-        "        {\n"
-        "          \"Scheme_Code\": \"<Scheme code>\",\n"
-        "          \"Fund_Name\": \"<Full fund name>\",\n"
-        "          \"Allocation_Percentage\": \"<Allocation percentage for this fund>\",\n"
-        "          \"Key_Metrics\": {\n"
-        "            \"1Y_Return\": \"<Calculated 1-year return>\",\n"
-        "            \"3Y_Return\": \"<Calculated 3-year return>\",\n"
-        "            \"5Y_Return\": \"<Calculated 5-year return>\",\n"
-        "            \"Standard_Deviation\": \"<Calculated standard deviation of returns>\",\n"
-        "            \"Sharpe_Ratio\": \"<Calculated Sharpe ratio>\"\n"
-        "          }\n"
-        "        }\n"
-        "      ]\n"
-        "    }\n"
-        "  ],\n"
-        
-        "  \"Sample_Investment_Plan\": {\n"
-        "    \"Initial_Investment\": \"<Total amount to invest>\",\n"
-        "    \"Allocation\": [\n"
-        "      {\n"
-        "        \"Fund_Name\": \"<Name of the mutual fund>\",\n"
-        "        \"Scheme_Code\": \"<Scheme code>\",\n"
-        "        \"Investment_Amount\": \"<Amount allocated>\",\n"
-        "        \"Percentage\": \"<Allocation percentage>\",\n"
-        "        \"Projected_Returns\": \"<Calculated expected returns>\",\n"
-        "        \"Investment_Strategy\": \"<Associated diversification strategy>\"\n"
-        "      }\n"
-        "    ],\n"
-        "    \"Growth_Projection\": [\n"
-        "      {\n"
-        "        \"Year\": \"<Year number>\",\n"
-        "        \"Projected_Value\": \"<Calculated value based on growth projections>\",\n"
-        "        \"Best_Case\": \"<Calculated best case value>\",\n"
-        "        \"Worst_Case\": \"<Calculated worst case value>\",\n"
-        "        \"Expected_Return\": \"<Calculated return percentage>\",\n"
-        "        \"CAGR\": \"<Calculated Compound Annual Growth Rate>\"\n"
-        "      }\n"
-        "    ]\n"
-        "  },\n"
-        
-        "  \"Market_Trends\": [\n"
-        "    {\n"
-        "      \"Trend\": \"<Identified market trend>\",\n"
-        "      \"Analysis\": \"<Detailed analysis using data>\",\n"
-        "      \"Impact\": \"<Impact on the recommended investments>\",\n"
-        "      \"Direction\": \"<Positive/Negative/Neutral>\",\n"
-        "      \"Confidence\": \"<High/Medium/Low based on data>\",\n"
-        "      \"Supporting_Data\": [\n"
-        "        {\n"
-        "          \"Metric\": \"<Related metric>\",\n"
-        "          \"Value\": \"<Calculated value>\",\n"
-        "          \"Change\": \"<Calculated percentage change>\",\n"
-        "          \"Date\": \"<Relevant date>\"\n"
-        "        }\n"
-        "      ]\n"
-        "    }\n"
-        "  ],\n"
-    
-        "  \"Risk_Assessment\": [\n"
-        "    {\n"
-        "      \"Risk\": \"<Identified risk>\",\n"
-        "      \"Category\": \"<Market/Credit/Liquidity/Operational>\",\n"
-        "      \"Severity\": \"<High/Medium/Low>\",\n"
-        "      \"Probability\": \"<High/Medium/Low>\",\n"
-        "      \"Impact_Score\": \"<Calculated on a scale of 1-10>\",\n"
-        "      \"Assessment\": \"<Detailed assessment based on data>\",\n"
-        "      \"Mitigation_Strategies\": \"<Specific strategies to mitigate risk>\",\n"
-        "      \"Associated_Funds\": [\n"
-        "        {\n"
-        "          \"Scheme_Code\": \"<Scheme code>\",\n"
-        "          \"Fund_Name\": \"<Full fund name>\"\n"
-        "        }\n"
-        "      ]\n"
-        "    }\n"
-        "  ],\n"
-    
-        "  \"Projected_Outcomes\": [\n"
-        "    {\n"
-        "      \"Time_Horizon\": \"<Time frame>\",\n"
-        "      \"Projected_Return\": \"<Calculated return percentage>\",\n"
-        "      \"Details\": \"<Detailed explanation based on calculations>\",\n"
-        "      \"Assumptions\": \"<Any assumptions made during calculations>\",\n"
-        "      \"Risk_Adjusted_Return\": \"<Calculated risk-adjusted return percentage>\"\n"
-        "    }\n"
-        "  ],\n"
-    
-        "  \"Justifications\": [\n"
-        "    {\n"
-        "      \"Title\": \"<Title of the justification>\",\n"
-        "      \"Details\": \"<Detailed justification for recommendations based on data and calculations>\",\n"
-        "      \"Associated_Funds\": [\n"
-        "        {\n"
-        "          \"Scheme_Code\": \"<Scheme code>\",\n"
-        "          \"Fund_Name\": \"<Full fund name>\"\n"
-        "        }\n"
-        "      ]\n"
-        "    }\n"
-        "  ]\n"
-        "}\n\n"
-    
+        f"{compact_schema(RESPONSE_SCHEMA)}\n\n"
+
         "### Client's Financial Profile:\n"
         f"Risk Tolerance: {user_profile['Risk Tolerance']}\n"
         f"Financial Goals: {', '.join(user_profile['Financial Goals'])}\n"
@@ -362,11 +369,17 @@ def create_ai_prompt(user_profile):
         f"Total Savings: ₹{user_profile['Savings']}\n"
         f"Total Debt: ₹{user_profile['Debt Levels']}\n\n"
     
+        "### Precomputed Fund Metrics:\n"
+        "Returns are CAGR percentages, volatility is annualized standard deviation of daily returns in percent, "
+        "max_drawdown is in percent.\n"
+        f"{nav_history_note(nav_granularity)}"
+        f"{fund_metrics_table}\n\n"
+
         "### Instructions:\n"
         "1. **Use only the data provided in the CSV file** for mutual fund recommendations and all calculations.\n"
         "2. **All fields must be filled**; do not leave any fields null or empty.\n"
-        "3. **Calculate** the \"1Y_Return\", \"3Y_Return\", and \"5Y_Return\" using the 5 years of NAV data from the CSV. Use appropriate formulas for CAGR.\n"
-        "4. **Compute** the \"Standard_Deviation\" and \"Sharpe_Ratio\" for each fund using the NAV data.\n"
+        "3. **Use** the precomputed return_1Y, return_3Y and return_5Y values for \"1Y_Return\", \"3Y_Return\" and \"5Y_Return\".\n"
+        "4. **Use** the precomputed volatility and sharpe_ratio values for \"Standard_Deviation\" and \"Sharpe_Ratio\".\n"
         "5. Ensure all fund recommendations match the client's risk profile.\n"
         "6. In 'Supported_Funds' under 'Diversification_Strategies', include both scheme codes and full fund names, and provide detailed key metrics for each fund.\n"
         "7. Provide multiple diversification strategies (at least three) relevant to the client's profile.\n"
@@ -378,27 +391,176 @@ def create_ai_prompt(user_profile):
         "13. The response must be in valid JSON format without any additional text outside the JSON.\n"
     )
     return prompt
-def format_response_to_json(response_text: str) -> dict:
+@span("growth_projection")
+def apply_growth_projection(recommendations, scheme_codes, filled):
+    """Replace the model's Growth_Projection with a Monte Carlo simulation of its own allocation."""
+    plan = recommendations['Sample_Investment_Plan']
+    projection = project_plan(plan, scheme_codes, filled)
+    if projection:
+        plan['Growth_Projection'] = projection
+    return recommendations
+
+@app.post("/get-predictions", response_model=Prediction)
+async def get_predictions(user_profile: UserProfile):
+    # Identical profiles reuse a cached result, and concurrent ones share a single computation
+    return await prediction_cache.aget_or_compute(profile_key(user_profile), lambda: predict(user_profile))
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "predictions": prediction_cache.stats(),
+        "api_parameters": parameters_cache.stats(),
+        "parameter_extraction": extraction_stats.stats(),
+        "uploads": upload_cache.stats(),
+        "upstreams": {name: upstream.stats() for name, upstream in UPSTREAMS.items()},
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Prometheus text format: stage and upstream latency histograms, cache, error and skip counters
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.post("/get-predictions/stream")
+async def get_predictions_stream(user_profile: UserProfile):
+    # Server-sent events: stage progress as each step completes, then Gemini tokens and each
+    # recommendation section as soon as it validates, then the result
+    return StreamingResponse(
+        stream_predictions(user_profile),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def stream_events(run, started):
+    """
+    SSE lines for the events `run(emit)` emits, after a "started" event.
+
+    The run is cancelled if the client goes away before it finishes.
+    """
+    events = asyncio.Queue()
+
+    async def produce():
+        try:
+            await run(lambda event, data: events.put_nowait((event, data)))
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.create_task(produce())
     try:
-        if response_text.startswith("```json") and response_text.endswith("```"):
-            json_str = response_text[len("```json"): -len("```")].strip()
-        else:
-            json_str = response_text
-        response_json = json.loads(json_str)
-        required_fields = ["Investment_Actions", "Top_Mutual_Funds", "Diversification_Strategies",
-                           "Sample_Investment_Plan", "Market_Trends", "Justifications",
-                           "Risk_Assessment", "Projected_Outcomes"]
-        for field in required_fields:
-            if field not in response_json or not response_json[field]:
-                response_json[field] = [{}] if field != "Sample_Investment_Plan" else {}
-        return response_json
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Invalid JSON response from AI.")
+        yield sse_event("started", started)
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+    finally:
+        task.cancel()
+
+# Profile key -> emit callbacks of the streams waiting on that prediction
+_stream_listeners = {}
+
+def _broadcast(key):
+    def emit(event, data):
+        for listener in list(_stream_listeners.get(key, ())):
+            listener(event, data)
+    return emit
+
+async def stream_predictions(user_profile: UserProfile):
+    key = profile_key(user_profile)
+
+    async def run(emit):
+        # Identical concurrent streams share one prediction through the cache's single-flight
+        # guard; its progress events go to every stream still listening, from when it joined
+        listeners = _stream_listeners.setdefault(key, [])
+        listeners.append(emit)
+        try:
+            result = await prediction_cache.aget_or_compute(key, lambda: predict(user_profile, emit=_broadcast(key)))
+            emit("result", result)
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            emit("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            listeners.remove(emit)
+            if not listeners and _stream_listeners.get(key) is listeners:
+                del _stream_listeners[key]
+
+    async for line in stream_events(run, {}):
+        yield line
+
+class BatchRequest(BaseModel):
+    profiles: List[UserProfile]
+
+@app.post("/get-predictions/batch")
+async def get_predictions_batch(batch: BatchRequest):
+    if not batch.profiles:
+        raise HTTPException(status_code=400, detail="No profiles in the batch.")
+    if len(batch.profiles) > BATCH_MAX_PROFILES:
+        raise HTTPException(status_code=413, detail=f"A batch can hold at most {BATCH_MAX_PROFILES} profiles.")
+    # Server-sent events: one "result" or "error" event per profile, in completion order
+    return StreamingResponse(
+        stream_batch(batch.profiles),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_batch(profiles):
+    async def run(emit):
+        try:
+            completed, failed = await predict_batch(profiles, emit=emit)
+            emit("done", {"completed": completed, "failed": failed})
+        except Exception as e:
+            emit("error", {"status_code": 500, "detail": str(e)})
+
+    async for line in stream_events(run, {"profiles": len(profiles)}):
+        yield line
 
-@app.post("/get-predictions")
-def get_predictions(user_profile: UserProfile):
-    # Create a user profile dictionary
-    user_profile_dict = {
+async def run_job(payload, emit):
+    user_profile = UserProfile(**payload)
+    return await prediction_cache.aget_or_compute(profile_key(user_profile), lambda: predict(user_profile, emit=emit))
+
+job_queue = JobQueue(run_job)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(user_profile: UserProfile):
+    try:
+        job_id = await job_queue.submit(jsonable_encoder(user_profile))
+    except QueueFull:
+        raise HTTPException(status_code=429, detail="Too many queued jobs, please retry later.")
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+@app.get("/jobs/{job_id}/result", response_model=Prediction)
+async def get_job_result(job_id: str):
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=job["error"] or "Job failed.")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+    return job["result"]
+
+def _no_emit(event, data):
+    pass
+
+def profile_dict(user_profile: UserProfile):
+    return {
         "Risk Tolerance": user_profile.risk_tolerance,
         "Financial Goals": user_profile.financial_goals,
         "Timeline": user_profile.timeline,
@@ -408,105 +570,305 @@ def get_predictions(user_profile: UserProfile):
         "Debt Levels": user_profile.debt_levels
     }
 
-    # Combine user profile into a single input string
-    user_input = (
-        f"I am an investor from India with a {user_profile.risk_tolerance.lower()} risk tolerance. "
-        f"My financial goals are {', '.join(user_profile.financial_goals)} and my investment timeline is {', '.join(user_profile.timeline)}. "
-        f"My monthly income is {user_profile.income}, expenses are {user_profile.expenses}, total savings are {user_profile.savings}, "
-        f"and I have a total debt of {user_profile.debt_levels}."
-    )
-
-    # Generate unique user ID and session ID
-    user_id = str(uuid.uuid4())
-    session_id = str(uuid.uuid4())
+async def extract_parameters(user_profile: UserProfile):
+    """Twelve Data filters for a profile, with the country set; raises HTTPException on failure."""
+    with span("parameters"):
+        # Combine user profile into a single input string
+        user_input = (
+            f"I am an investor from India with a {user_profile.risk_tolerance.lower()} risk tolerance. "
+            f"My financial goals are {', '.join(user_profile.financial_goals)} and my investment timeline is {', '.join(user_profile.timeline)}. "
+            f"My monthly income is {user_profile.income}, expenses are {user_profile.expenses}, total savings are {user_profile.savings}, "
+            f"and I have a total debt of {user_profile.debt_levels}."
+        )
+
+        # Generate unique user ID and session ID
+        user_id = str(uuid.uuid4())
+        session_id = str(uuid.uuid4())
+
+        # Map common profiles locally; otherwise ask the agent, reusing earlier answers for the same profile
+        api_parameters = rule_parameters(user_profile)
+        if api_parameters:
+            extraction_stats.record("rules")
+        else:
+            extraction_stats.record("agent")
+            api_parameters = await parameters_cache.aget_or_compute(
+                profile_key(user_profile),
+                lambda: get_api_parameters(agent_id, user_id, session_id, user_input)
+            )
+
+        # Set country to India explicitly (on a copy, so the cached parameters stay untouched)
+        if api_parameters:
+            api_parameters = dict(api_parameters)
+            api_parameters['country'] = 'India'
+        else:
+            raise HTTPException(status_code=500, detail="Failed to get API parameters.")
+
+        log.debug("Extracted API parameters: %s", api_parameters)
+
+        # Optional: Validate required parameters
+        required_keys = ['country', 'performance_rating', 'risk_rating']
+        for key in required_keys:
+            if key not in api_parameters:
+                raise HTTPException(status_code=400, detail=f"Missing required parameter: {key}")
+        return api_parameters
+
+async def list_funds(api_parameters):
+    with span("fund_listing"):
+        # Make the API call to fetch mutual funds (on a copy, since the API key is added to it)
+        funds_list = await fetch_mutual_funds(dict(api_parameters))
+        if funds_list and 'result' in funds_list and 'list' in funds_list['result']:
+            return funds_list['result']['list']  # Access the correct keys
+        raise HTTPException(status_code=500, detail="No funds data found in the API response.")
 
-    # Use the agent to get API parameters
-    api_parameters = get_api_parameters(agent_id, user_id, session_id, user_input)
+def attach_scheme_details(funds_data, resolved):
+    """Keep the funds with a scheme code, add their mfapi details and return (funds, nav_series)."""
+    funds = []
+    nav_series = []
+    # Process each fund in the original order
+    for fund, (scheme_code, fund_data) in zip(funds_data, resolved):
+        fund_name = fund['name']
+        if not scheme_code:
+            log.debug("Skipping fund '%s' as no schemeCode was found.", fund_name)
+            funds_skipped.inc(reason="no_scheme_code")
+            continue
+        fund['schemeCode'] = scheme_code
+        meta = fund_data.get('meta', {}) if fund_data else {}
+        fund['fund_house'] = meta.get('fund_house', 'N/A')
+        fund['scheme_type'] = meta.get('scheme_type', 'N/A')
+        fund['scheme_category'] = meta.get('scheme_category', 'N/A')
+        fund['scheme_name'] = meta.get('scheme_name', 'N/A')
+        funds.append(fund)
+        # Parsed once per stored scheme version and cut to the last five years (plus a margin) by binary search
+        series = fund_data.get('series') if fund_data else None
+        if series is None:
+            series = series_cache.get(scheme_code, fund_data)
+        nav_series.append(series.window(NAV_WINDOW_DAYS))
+    return funds, nav_series
+
+def analyse(nav_series):
+    """The aligned NAV matrix and per-fund metrics; CPU-bound, so the pipeline runs it in a thread."""
+    with span("analytics"):
+        matrix = nav_matrix(nav_series)
+        return matrix, fund_metrics(matrix)
+
+@span("prompt")
+def build_prompt(user_profile_dict, funds, metrics, matrix):
+    """
+    The prompt and dataset for the best-ranked funds that fit the token budget.
+
+    Returns (kept_indexes, prompt, csv_bytes, prompt_tokens). The fund dicts are
+    updated in place with their metric and NAV history columns.
+    """
+    for fund, fund_metric in zip(funds, metrics):
+        fund.update({col: 'N/A' if fund_metric[col] is None else fund_metric[col] for col in METRIC_COLUMNS})
+
+    def render(indexes):
+        kept = [funds[i] for i in indexes]
+        prompt = create_ai_prompt(
+            user_profile_dict,
+            metrics_table([f['schemeCode'] for f in kept], [f['name'] for f in kept], [metrics[i] for i in indexes]),
+            PROMPT_NAV_GRANULARITY
+        )
+        return prompt, build_csv(kept, fieldnames)
+
+    # Attach a compact period-end NAV series to every fund, unless only summary statistics are sent
+    fieldnames = FUND_FIELDS + METRIC_COLUMNS
+    if PROMPT_NAV_GRANULARITY in NAV_GRANULARITIES:
+        dates, _, filled = matrix
+        for fund, nav_history in zip(funds, compact_nav_column(dates, filled, PROMPT_NAV_GRANULARITY)):
+            fund['nav_history'] = nav_history
+        fieldnames = fieldnames + ['nav_history']
+
+    # Keep the best-ranked funds that fit the token budget
+    return fit_to_budget(metrics, render)
+
+def finish_recommendations(answer, parser, scheme_codes, filled):
+    """
+    The validated recommendations with a simulated growth projection.
+
+    `parser` is the RecommendationParser the answer was streamed into, or None when
+    the complete answer is parsed here. Raises HTTPException when it holds no JSON.
+    """
+    try:
+        with span("response_parse"):
+            recommendation = parser.finish() if parser else parse_recommendations(answer)
+    except ValueError:
+        raise HTTPException(status_code=500, detail="Invalid JSON response from AI.")
+    return apply_growth_projection(recommendation.model_dump(by_alias=True), scheme_codes, filled)
+
+async def recommend(user_profile_dict, funds, metrics, matrix, emit=_no_emit):
+    """
+    Ask Gemini for recommendations over funds whose metrics are already computed.
+
+    `metrics` and the columns of `matrix` are in the same order as `funds`; the fund
+    dicts are updated in place with their metric and NAV history columns. The CPU-bound
+    steps run in threads so the event loop keeps serving other requests.
+    """
+    kept_indexes, prompt, csv_bytes, prompt_tokens = await asyncio.to_thread(
+        build_prompt, user_profile_dict, funds, metrics, matrix
+    )
+    dropped = len(funds) - len(kept_indexes)
+    funds = [funds[i] for i in kept_indexes]
+    filled = matrix[2][:, kept_indexes]
+    if dropped:
+        funds_skipped.inc(dropped, reason="token_budget")
+    log.debug("Prompt for %d funds is about %d tokens (%d funds dropped to fit the budget).", len(funds), prompt_tokens, dropped)
+    emit("prompt", {"funds": len(funds), "dropped_funds": dropped, "estimated_tokens": prompt_tokens})
+
+    # Upload the in-memory dataset to GenAI
+    uploaded_file = await upload_csv_file(csv_bytes)
+
+    if not uploaded_file:
+        raise HTTPException(status_code=500, detail="File upload failed.")
+    emit("uploaded", {"funds": len(funds), "bytes": len(csv_bytes)})
+
+    # Get AI response; when streaming, parse and validate it section by section as it arrives
+    parser = on_chunk = None
+    if emit is not _no_emit:
+        parser = RecommendationParser()
+
+        def on_chunk(text):
+            emit("token", {"text": text})
+            for name in parser.feed(text):
+                emit("section", {"name": name, "data": dump_section(parser.sections[name])})
+    answer = await chat_with_csv(prompt, uploaded_file, on_chunk=on_chunk)
+    if not answer:
+        raise HTTPException(status_code=500, detail="Failed to get a response from the AI.")
+    recommendations = await asyncio.to_thread(
+        finish_recommendations, answer, parser, [f['schemeCode'] for f in funds], filled
+    )
+    return {"recommendations": recommendations, "estimated_prompt_tokens": prompt_tokens}
+
+async def predict(user_profile: UserProfile, emit=_no_emit):
+    with trace_request("predict"), span("predict"):
+        user_profile_dict = profile_dict(user_profile)
+        api_parameters = await extract_parameters(user_profile)
+        emit("parameters", dict(api_parameters))
+
+        funds_data = await list_funds(api_parameters)
+        # Resolve scheme codes and NAV data for all funds concurrently
+        emit("funds_listed", {"count": len(funds_data)})
+        with span("fund_resolution"):
+            resolved = await resolve_funds(
+                funds_data,
+                on_resolved=lambda i, fund, code: emit("fund_resolved", {"index": i, "name": fund['name'], "scheme_code": code})
+            )
+            funds, nav_series = await asyncio.to_thread(attach_scheme_details, funds_data, resolved)
+
+        # Compute returns, volatility and Sharpe ratio for all funds at once
+        matrix, metrics = await asyncio.to_thread(analyse, nav_series)
+        emit("metrics", [
+            {"scheme_code": fund['schemeCode'], "name": fund['name'], **fund_metric}
+            for fund, fund_metric in zip(funds, metrics)
+        ])
+        return await recommend(user_profile_dict, funds, metrics, matrix, emit)
+
+async def predict_batch(profiles, emit=_no_emit, llm_concurrency=BATCH_LLM_CONCURRENCY):
+    """
+    Compute recommendations for many profiles, sharing the work they have in common.
+
+    Profiles are grouped by their fund filters so each distinct filter set is listed
+    once; every distinct fund in the batch is resolved, loaded and analysed once; only
+    the Gemini call is made per profile. Agent and Gemini calls run at most
+    `llm_concurrency` at a time. Emits "result" or "error" events carrying the
+    profile's index as each profile finishes. Returns (completed, failed) counts.
+    """
+    with trace_request("predict_batch"), span("batch"):
+        return await _predict_batch(profiles, emit, llm_concurrency)
+
+async def _predict_batch(profiles, emit, llm_concurrency):
+    counts = {"completed": 0, "failed": 0}
+
+    def finish(index, result):
+        counts["completed"] += 1
+        emit("result", {"index": index, "result": result})
+
+    def fail(index, e):
+        counts["failed"] += 1
+        if isinstance(e, HTTPException):
+            emit("error", {"index": index, "status_code": e.status_code, "detail": e.detail})
+        else:
+            emit("error", {"index": index, "status_code": 500, "detail": str(e)})
 
-    # Set country to India explicitly
-    if api_parameters:
-        api_parameters['country'] = 'India'
-    else:
-        raise HTTPException(status_code=500, detail="Failed to get API parameters.")
-
-    print("\nExtracted API Parameters:")
-    print(api_parameters)
-
-    # Validate extracted parameters
-    if not api_parameters:
-        raise HTTPException(status_code=500, detail="Failed to get API parameters.")
-
-    # Optional: Validate required parameters
-    required_keys = ['country', 'performance_rating', 'risk_rating']
-    for key in required_keys:
-        if key not in api_parameters:
-            raise HTTPException(status_code=400, detail=f"Missing required parameter: {key}")
-
-    # Make the API call to fetch mutual funds
-    funds_list = fetch_mutual_funds(api_parameters)
-    if funds_list and 'result' in funds_list and 'list' in funds_list['result']:
-        funds_data = funds_list['result']['list']  # Access the correct keys
-        # Prepare to write to CSV
-        csv_filename = f'funds_data_{uuid.uuid4()}.csv'
-        with open(csv_filename, mode='w', newline='', encoding='utf-8') as csv_file:
-            fieldnames = [
-                'symbol', 'name', 'country', 'fund_family', 'fund_type',
-                'performance_rating', 'risk_rating', 'currency', 'exchange', 'mic_code',
-                'schemeCode', 'fund_house', 'scheme_type', 'scheme_category', 'scheme_name', 'nav_data'
-            ]
-            writer = csv.DictWriter(csv_file, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-            writer.writeheader()
-            # Process each fund
-            for fund in funds_data:
-                fund_name = fund['name']
-                print(f"Processing fund: {fund_name}")
-                scheme_code = get_scheme_code(fund_name)
-                if scheme_code:
-                    fund['schemeCode'] = scheme_code
-                    fund_data = get_fund_data(scheme_code)
-                    if fund_data:
-                        meta = fund_data.get('meta', {})
-                        fund['fund_house'] = meta.get('fund_house', 'N/A')
-                        fund['scheme_type'] = meta.get('scheme_type', 'N/A')
-                        fund['scheme_category'] = meta.get('scheme_category', 'N/A')
-                        fund['scheme_name'] = meta.get('scheme_name', 'N/A')
-                        nav_data = get_nav_data_one_year(fund_data)
-                        # Convert NAV data to JSON string
-                        fund['nav_data'] = format_nav_data(nav_data)
-                    else:
-                        fund['fund_house'] = 'N/A'
-                        fund['scheme_type'] = 'N/A'
-                        fund['scheme_category'] = 'N/A'
-                        fund['scheme_name'] = 'N/A'
-                        fund['nav_data'] = json.dumps([])
-                    
-                    # Write the fund_row to CSV
-                    writer.writerow(fund)
-                    print(f"Fund '{fund_name}' processed and added to the CSV file.")
-                else:
-                    print(f"Skipping fund '{fund_name}' as no schemeCode was found.")
-        print(f"Data saved to {csv_filename}")
-
-        # Now, proceed to upload the CSV file to GenAI
-        print("\nUploading the CSV file to the AI model...")
-        uploaded_file = upload_csv_file(csv_filename)
-
-        if not uploaded_file:
-            raise HTTPException(status_code=500, detail="File upload failed.")
-
-        print("\nAnalyzing your financial profile and investment options...")
-
-        # Generate the AI prompt with user inputs
-        prompt = create_ai_prompt(user_profile_dict)
-
-        # Get AI response
-        answer = chat_with_csv(prompt, uploaded_file)
-        if answer:
-            return {"recommendations": answer}
+    pending = []
+    for i, user_profile in enumerate(profiles):
+        cached = await prediction_cache.aget(profile_key(user_profile))
+        if cached is not None:
+            finish(i, cached)
         else:
-            raise HTTPException(status_code=500, detail="Failed to get a response from the AI.")
-    else:
-        raise HTTPException(status_code=500, detail="No funds data found in the API response.")
+            pending.append(i)
+    if not pending:
+        return counts["completed"], counts["failed"]
+
+    llm_slots = asyncio.Semaphore(llm_concurrency)
+
+    async def limited(coro_fn, *args):
+        async with llm_slots:
+            return await coro_fn(*args)
+
+    # Profiles sharing the same filters form one group with a single fund listing
+    groups = {}
+    extracted = await asyncio.gather(*(limited(extract_parameters, profiles[i]) for i in pending), return_exceptions=True)
+    for i, api_parameters in zip(pending, extracted):
+        if isinstance(api_parameters, BaseException):
+            fail(i, api_parameters)
+            continue
+        key = json.dumps(api_parameters, sort_keys=True, default=str)
+        groups.setdefault(key, (api_parameters, []))[1].append(i)
+
+    listings = {}
+    listed = await asyncio.gather(*(list_funds(api_parameters) for api_parameters, _ in groups.values()), return_exceptions=True)
+    for (key, (_, indexes)), funds_data in zip(groups.items(), listed):
+        if isinstance(funds_data, HTTPException):
+            for i in indexes:
+                fail(i, funds_data)
+        elif isinstance(funds_data, BaseException):
+            raise funds_data
+        else:
+            listings[key] = funds_data
+    emit("groups", {"profiles": len(pending), "groups": len(groups), "listed": len(listings)})
+    if not listings:
+        return counts["completed"], counts["failed"]
+
+    # Resolve every distinct fund once and compute its analytics once for the whole batch
+    distinct = {}
+    for funds_data in listings.values():
+        for fund in funds_data:
+            distinct.setdefault(fund['name'], fund)
+    emit("funds_listed", {"count": len(distinct)})
+    with span("fund_resolution"):
+        resolved = await resolve_funds(list(distinct.values()))
+        funds, nav_series = await asyncio.to_thread(attach_scheme_details, list(distinct.values()), resolved)
+    matrix, metrics = await asyncio.to_thread(analyse, nav_series)
+    emit("metrics", {"funds": len(funds)})
+    column_of = {fund['name']: j for j, fund in enumerate(funds)}
+
+    async def recommend_profile(i, columns):
+        user_profile = profiles[i]
+        dates, observed, filled = matrix
+        group_matrix = (dates, observed[:, columns], filled[:, columns])
+        # Each profile gets its own copies, since recommend() annotates the fund dicts
+        group_funds = [dict(funds[j]) for j in columns]
+        try:
+            result = await limited(
+                prediction_cache.aget_or_compute, profile_key(user_profile),
+                lambda: recommend(profile_dict(user_profile), group_funds, [metrics[j] for j in columns], group_matrix)
+            )
+        except Exception as e:
+            fail(i, e)
+            return
+        finish(i, result)
+
+    recommendations = []
+    for key, funds_data in listings.items():
+        columns = list(dict.fromkeys(column_of[f['name']] for f in funds_data if f['name'] in column_of))
+        recommendations.extend(recommend_profile(i, columns) for i in groups[key][1])
+    await asyncio.gather(*recommendations)
+    return counts["completed"], counts["failed"]
 
 if __name__ == '__main__':
-    uvicorn.run(app, host='0.0.0.0', port=8080)
+    # Several worker processes share the port, each with its own event loop, caches, job
+    # workers and /metrics; set PREDICTION_CACHE_PATH so that they also share cached
+    # predictions. Upstream rate limits are split evenly between them, so together they
+    # stay within each provider's quota.
+    uvicorn.run("app:app", host=HOST, port=PORT, workers=WEB_CONCURRENCY)
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+
+# === Shared helpers for the benchmark scripts ===
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+FAST_API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Placeholder credentials so app.py imports without real keys; every upstream is faked
+FAKE_ENV = {
+    "LYZR_API_KEY": "bench",
+    "TWELVEDATA_API_KEY": "bench",
+    "GENAI_API_KEY": "bench",
+    "AGENT_ID": "bench",
+}
+
+
+def isolated_env(directory):
+    """FAKE_ENV plus store and cache paths inside `directory`, so runs start cold and leave no files behind."""
+    return {
+        **FAKE_ENV,
+        "NAV_STORE_PATH": os.path.join(directory, "nav_store.sqlite3"),
+        "JOB_STORE_PATH": os.path.join(directory, "jobs.sqlite3"),
+        "FUND_UNIVERSE_PATH": os.path.join(directory, "fund_universe.json"),
+        "PREDICTION_CACHE_PATH": "",
+    }
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 4),
+        "min_ms": round(float(values.min()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(values.max()), 4),
+    }
+
+
+def measure(fn, repeat=30, warmup=3, setup=None):
+    """Call `fn` `repeat` times after `warmup` calls; `setup()` runs untimed before every call."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=FAST_API_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_results(kind, results, config, path=None):
+    """Write a benchmark run as JSON, with enough context to compare it against later runs."""
+    document = {
+        "kind": kind,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{kind}-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    return path
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60.0, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before listening on {port}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nothing is listening on port {port} after {timeout}s")
+
+
+def start_module(module, args, env=None):
+    """Run `python -m <module>` from the fast-api directory in a child process."""
+    return subprocess.Popen(
+        [sys.executable, "-m", module, *args], cwd=FAST_API_DIR,
+        env={**os.environ, **(env or {})},
+    )
@@ -0,0 +1,56 @@
+import sys
+import json
+import argparse
+
+# === Regression check between two benchmark runs ===
+# Compares latency percentiles (higher is worse) and throughput (lower is worse) of a
+# candidate run against a baseline of the same kind; exits with 1 on any regression.
+
+
+def _rows(document):
+    """(name, metric, value, higher_is_worse) for every comparable number in a result file."""
+    if document["kind"] == "microbench":
+        for name, result in document["results"].items():
+            for metric in ("p50_ms", "p95_ms"):
+                yield name, metric, result.get(metric), True
+    else:
+        for level in document["results"]:
+            name = f"concurrency={level['concurrency']}"
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                yield name, metric, level["latency"].get(metric), True
+            yield name, "throughput_rps", level.get("throughput_rps"), False
+
+
+def compare(baseline, candidate, threshold=0.10):
+    if baseline["kind"] != candidate["kind"]:
+        raise ValueError(f"Cannot compare a {baseline['kind']} run with a {candidate['kind']} run")
+    before = {(name, metric): value for name, metric, value, _ in _rows(baseline)}
+    rows = []
+    for name, metric, value, higher_is_worse in _rows(candidate):
+        old = before.get((name, metric))
+        if not old or value is None:
+            continue
+        change = (value - old) / old
+        regressed = change > threshold if higher_is_worse else change < -threshold
+        rows.append({"name": name, "metric": metric, "baseline": old, "candidate": value,
+                     "change_pct": round(change * 100, 2), "regressed": regressed})
+    return rows
+
+
+if __name__ == '__main__':
+    # python -m bench.compare baseline.json candidate.json [--threshold 0.1]
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(f"{row['name']:<30} {row['metric']:<15} {row['baseline']:>12} -> {row['candidate']:>12} "
+              f"({row['change_pct']:+.1f}%){flag}")
+    sys.exit(1 if any(row["regressed"] for row in rows) else 0)
@@ -0,0 +1,513 @@
+import io
+import csv
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+import numpy as np
+
+# === Local stand-ins for Lyzr, Twelve Data, mfapi.in and Gemini ===
+# A seeded synthetic fund market served with production-like payload sizes (full daily
+# NAV histories, a scheme master list of tens of thousands of entries, multi-kilobyte
+# model answers) and lognormal latencies. Lyzr, Twelve Data and mfapi are served over
+# HTTP by create_app(); Gemini is replaced in-process by FakeGemini.
+
+# (median, p95) latency in seconds per upstream call
+LATENCIES = {
+    "lyzr": (1.8, 4.0),
+    "twelvedata": (0.35, 0.9),
+    "mfapi_master": (1.5, 3.0),
+    "mfapi_search": (0.15, 0.5),
+    "mfapi_scheme": (0.25, 0.8),
+    "mfapi_latest": (0.08, 0.25),
+    "gemini_upload": (0.8, 2.0),
+    "gemini_generate": (9.0, 20.0),
+}
+
+HOUSES = [
+    "Aditya", "Bharat", "Canara", "Deccan", "Everest", "Falcon", "Ganga", "Himalaya", "Indus",
+    "Jaipur", "Kaveri", "Lotus", "Malabar", "Narmada", "Orchid", "Peacock", "Quantum Leap",
+    "Rajput", "Sahyadri", "Tapti", "Udaipur", "Vindhya", "Western Ghats", "Yamuna", "Zenith",
+]
+# strategy -> (mfapi scheme category, annual drift, annual volatility)
+STRATEGIES = {
+    "Bluechip": ("Equity Scheme - Large Cap Fund", 0.11, 0.16),
+    "Top 100": ("Equity Scheme - Large Cap Fund", 0.10, 0.15),
+    "Large & Mid Cap": ("Equity Scheme - Large & Mid Cap Fund", 0.12, 0.18),
+    "Midcap Opportunities": ("Equity Scheme - Mid Cap Fund", 0.14, 0.21),
+    "Emerging Equity": ("Equity Scheme - Mid Cap Fund", 0.15, 0.22),
+    "Small Cap": ("Equity Scheme - Small Cap Fund", 0.16, 0.25),
+    "Smaller Companies": ("Equity Scheme - Small Cap Fund", 0.15, 0.24),
+    "Flexi Cap": ("Equity Scheme - Flexi Cap Fund", 0.12, 0.17),
+    "Multi Cap": ("Equity Scheme - Multi Cap Fund", 0.12, 0.18),
+    "Focused Equity": ("Equity Scheme - Focused Fund", 0.12, 0.19),
+    "Value Discovery": ("Equity Scheme - Value Fund", 0.11, 0.18),
+    "Contra": ("Equity Scheme - Contra Fund", 0.12, 0.19),
+    "Dividend Yield": ("Equity Scheme - Dividend Yield Fund", 0.10, 0.15),
+    "Tax Saver": ("Equity Scheme - ELSS", 0.12, 0.17),
+    "Long Term Equity": ("Equity Scheme - ELSS", 0.12, 0.18),
+    "Banking & Financial Services": ("Equity Scheme - Sectoral/ Thematic", 0.11, 0.22),
+    "Technology": ("Equity Scheme - Sectoral/ Thematic", 0.14, 0.24),
+    "Pharma & Healthcare": ("Equity Scheme - Sectoral/ Thematic", 0.11, 0.20),
+    "Infrastructure": ("Equity Scheme - Sectoral/ Thematic", 0.12, 0.23),
+    "Consumption": ("Equity Scheme - Sectoral/ Thematic", 0.11, 0.17),
+    "Nifty 50 Index": ("Other Scheme - Index Funds", 0.11, 0.15),
+    "Nifty Next 50 Index": ("Other Scheme - Index Funds", 0.12, 0.19),
+    "Balanced Advantage": ("Hybrid Scheme - Dynamic Asset Allocation or Balanced Advantage", 0.09, 0.09),
+    "Equity Hybrid": ("Hybrid Scheme - Aggressive Hybrid Fund", 0.10, 0.12),
+    "Equity Savings": ("Hybrid Scheme - Equity Savings", 0.08, 0.06),
+    "Multi Asset Allocation": ("Hybrid Scheme - Multi Asset Allocation", 0.09, 0.08),
+    "Arbitrage": ("Hybrid Scheme - Arbitrage Fund", 0.06, 0.01),
+    "Conservative Hybrid": ("Hybrid Scheme - Conservative Hybrid Fund", 0.08, 0.05),
+    "Corporate Bond": ("Debt Scheme - Corporate Bond Fund", 0.07, 0.02),
+    "Short Term Debt": ("Debt Scheme - Short Duration Fund", 0.07, 0.02),
+    "Dynamic Bond": ("Debt Scheme - Dynamic Bond", 0.07, 0.04),
+    "Gilt": ("Debt Scheme - Gilt Fund", 0.07, 0.05),
+    "Banking & PSU Debt": ("Debt Scheme - Banking and PSU Fund", 0.07, 0.02),
+    "Credit Risk": ("Debt Scheme - Credit Risk Fund", 0.08, 0.03),
+    "Liquid": ("Debt Scheme - Liquid Fund", 0.06, 0.005),
+    "Overnight": ("Debt Scheme - Overnight Fund", 0.05, 0.002),
+    "Money Market": ("Debt Scheme - Money Market Fund", 0.06, 0.006),
+    "Ultra Short Duration": ("Debt Scheme - Ultra Short Duration Fund", 0.065, 0.008),
+    "Gold ETF Fund of Fund": ("Other Scheme - FoF Domestic", 0.09, 0.14),
+    "US Equity Fund of Fund": ("Other Scheme - FoF Overseas", 0.12, 0.20),
+}
+
+
+class LatencyModel:
+    """Lognormal latencies fitted to each upstream's (median, p95), multiplied by `scale`."""
+
+    def __init__(self, scale=1.0, seed=None, latencies=LATENCIES):
+        self.scale = scale
+        self.latencies = latencies
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, name):
+        if self.scale <= 0:
+            return 0.0
+        median, p95 = self.latencies[name]
+        sigma = math.log(p95 / median) / 1.645
+        with self._lock:
+            z = self._random.gauss(0.0, 1.0)
+        return self.scale * median * math.exp(sigma * z)
+
+    def sleep(self, name):
+        time.sleep(self.sample(name))
+
+    async def asleep(self, name):
+        await asyncio.sleep(self.sample(name))
+
+
+def _business_days(end, years):
+    day = end - timedelta(days=int(years * 365.25))
+    days = []
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+class SyntheticMarket:
+    """
+    A reproducible fund universe in the shapes Twelve Data and mfapi return.
+
+    Every listed fund has Direct/Regular growth and IDCW variants in the scheme master,
+    which is padded with `filler_schemes` closed-ended schemes so name matching works
+    against a realistically sized list. NAV histories are daily business-day random
+    walks with each strategy's drift and volatility, generated on first request.
+    """
+
+    def __init__(self, n_funds=1000, filler_schemes=30000, years=10, seed=7, end=None):
+        self.years = years
+        self.seed = seed
+        self.end = end or date.today()
+        rng = random.Random(seed)
+        self.funds = []
+        self.schemes = []
+        self.scheme_meta = {}
+        code = 100000
+        bases = [(house, strategy) for house in HOUSES for strategy in STRATEGIES]
+        rng.shuffle(bases)
+        for i in range(n_funds):
+            house, strategy = bases[i % len(bases)]
+            series = f" {i // len(bases) + 1}" if i >= len(bases) else ""
+            base = f"{house} {strategy}{series} Fund"
+            category, drift, volatility = STRATEGIES[strategy]
+            risk = min(5, max(0, round(volatility / 0.05) + rng.choice((-1, 0, 0, 1))))
+            performance = min(5, max(0, round(drift * 40 - 1) + rng.choice((-2, -1, 0, 0, 1))))
+            self.funds.append({
+                "symbol": f"0P{code:08d}",
+                "name": f"{base} Direct Growth",
+                "country": "India",
+                "fund_family": f"{house} Mutual Fund",
+                "fund_type": category.split(" - ")[-1],
+                "performance_rating": performance,
+                "risk_rating": risk,
+                "currency": "INR",
+                "exchange": "BSE",
+                "mic_code": "XBOM",
+            })
+            for variant in ("Direct Plan - Growth", "Regular Plan - Growth", "Direct Plan - IDCW"):
+                code += 1
+                self._add_scheme(code, f"{base} - {variant}", house, category, drift, volatility)
+        for n in range(filler_schemes):
+            code += 1
+            house = HOUSES[n % len(HOUSES)]
+            self._add_scheme(code, f"{house} Fixed Term Plan Series {n // len(HOUSES) + 1} - Direct Plan - Growth",
+                             house, "Income - Fixed Maturity Plan", 0.07, 0.01)
+        self._master = json.dumps(
+            [{"schemeCode": c, "schemeName": n} for c, n in self.schemes]
+        ).encode("utf-8")
+        self._lock = threading.Lock()
+
+    def _add_scheme(self, code, name, house, category, drift, volatility):
+        self.schemes.append((code, name))
+        self.scheme_meta[code] = {
+            "fund_house": f"{house} Mutual Fund",
+            "scheme_type": "Open Ended Schemes",
+            "scheme_category": category,
+            "scheme_code": code,
+            "scheme_name": name,
+            "_drift": drift,
+            "_volatility": volatility,
+        }
+
+    def master_payload(self):
+        return self._master
+
+    def list_payload(self, params):
+        rows = self.funds
+        for column in ("performance_rating", "risk_rating"):
+            if params.get(column) not in (None, ""):
+                wanted = {int(float(v)) for v in str(params[column]).split(",")}
+                rows = [f for f in rows if f[column] in wanted]
+        if params.get("country"):
+            rows = [f for f in rows if f["country"].lower() == str(params["country"]).lower()]
+        size = int(params.get("outputsize") or 50)
+        page = int(params.get("page") or 1)
+        page_rows = rows[(page - 1) * size:page * size]
+        return json.dumps({"result": {"count": len(rows), "list": page_rows}, "status": "ok"}).encode("utf-8")
+
+    def search_payload(self, query):
+        query = query.lower()
+        tokens = query.split()
+        matches = [
+            {"schemeCode": c, "schemeName": n} for c, n in self.schemes
+            if query in n.lower() or all(t in n.lower() for t in tokens)
+        ]
+        return json.dumps(matches[:50]).encode("utf-8")
+
+    def nav_entries(self, code):
+        """mfapi 'data' entries for a scheme, newest first, or None for unknown codes."""
+        code = int(code)
+        meta = self.scheme_meta.get(code)
+        if meta is None:
+            return None
+        rng = np.random.default_rng([self.seed, code])
+        days = _business_days(self.end, self.years)
+        daily_drift = meta["_drift"] / 252
+        daily_vol = meta["_volatility"] / math.sqrt(252)
+        steps = rng.normal(daily_drift - daily_vol ** 2 / 2, daily_vol, len(days))
+        navs = 10.0 * np.exp(np.cumsum(steps))
+        return [
+            {"date": day.strftime("%d-%m-%Y"), "nav": f"{nav:.4f}"}
+            for day, nav in zip(reversed(days), navs[::-1])
+        ]
+
+    @lru_cache(maxsize=4096)
+    def scheme_payload(self, code):
+        entries = self.nav_entries(code)
+        if entries is None:
+            return None
+        meta = {k: v for k, v in self.scheme_meta[int(code)].items() if not k.startswith("_")}
+        return json.dumps({"meta": meta, "data": entries, "status": "SUCCESS"}).encode("utf-8")
+
+    def latest_payload(self, code):
+        payload = self.scheme_payload(code)
+        if payload is None:
+            return None
+        document = json.loads(payload)
+        document["data"] = document["data"][:1]
+        return json.dumps(document).encode("utf-8")
+
+
+def lyzr_parameters(message):
+    """The filters a Lyzr agent would extract from the profile sentence app.py sends it."""
+    text = message.lower()
+    if "aggressive" in text or "high risk" in text:
+        risk = 4
+    elif "conservative" in text or "low risk" in text:
+        risk = 2
+    else:
+        risk = 3
+    return {"performance_rating": 4, "risk_rating": risk}
+
+
+def create_app(market, latency):
+    """FastAPI app serving the Lyzr, Twelve Data and mfapi endpoints app.py calls."""
+    from fastapi import FastAPI, Request, Response
+
+    fake = FastAPI()
+
+    def json_response(body, status_code=200):
+        if body is None:
+            return Response(b'{"status": "ERROR"}', status_code=404, media_type="application/json")
+        return Response(body, status_code=status_code, media_type="application/json")
+
+    @fake.post("/lyzr/v2/chat/")
+    async def lyzr_chat(request: Request):
+        payload = await request.json()
+        await latency.asleep("lyzr")
+        return {"response": json.dumps(lyzr_parameters(payload.get("message", "")))}
+
+    @fake.get("/twelvedata/mutual_funds/list")
+    async def twelvedata_list(request: Request):
+        await latency.asleep("twelvedata")
+        return json_response(market.list_payload(dict(request.query_params)))
+
+    @fake.get("/mfapi/mf")
+    async def mfapi_master():
+        await latency.asleep("mfapi_master")
+        return json_response(market.master_payload())
+
+    @fake.get("/mfapi/mf/search")
+    async def mfapi_search(q: str = ""):
+        await latency.asleep("mfapi_search")
+        return json_response(market.search_payload(q))
+
+    @fake.get("/mfapi/mf/{code}")
+    async def mfapi_scheme(code: int):
+        await latency.asleep("mfapi_scheme")
+        return json_response(await asyncio.to_thread(market.scheme_payload, code))
+
+    @fake.get("/mfapi/mf/{code}/latest")
+    async def mfapi_latest(code: int):
+        await latency.asleep("mfapi_latest")
+        return json_response(await asyncio.to_thread(market.latest_payload, code))
+
+    return fake
+
+
+def upstream_env(base_url):
+    """Environment variables that point app.py at a fake upstream server."""
+    return {
+        "LYZR_CHAT_URL": f"{base_url}/lyzr/v2/chat/",
+        "TWELVEDATA_FUND_LIST_URL": f"{base_url}/twelvedata/mutual_funds/list",
+        "MFAPI_BASE_URL": f"{base_url}/mfapi/mf",
+    }
+
+
+# --- Gemini ---
+
+def fake_answer(rows, years=10):
+    """A recommendation in the prompt's schema for the first funds of the uploaded CSV, in a ```json fence."""
+    picks = rows[:5] or [{"schemeCode": "0", "name": "Unknown Fund"}]
+    weight = round(100 / len(picks), 2)
+
+    def metric(row, column):
+        value = row.get(column)
+        return "N/A" if value in (None, "", "N/A") else f"{value}%"
+
+    def fund_ref(row):
+        return {"Scheme_Code": str(row.get("schemeCode")), "Fund_Name": row.get("name")}
+
+    answer = {
+        "Investment_Actions": [{
+            "Action": f"Allocate to {row.get('name')}",
+            "Details": f"Invest {weight}% of the initial corpus in {row.get('name')}, whose precomputed 3Y CAGR is "
+                       f"{metric(row, 'return_3Y')} with volatility of {metric(row, 'volatility')}.",
+            "Priority": ("High", "Medium", "Low")[i % 3],
+            "Timeline": ("Immediate", "Short-term", "Long-term")[i % 3],
+            "Expected_Impact": f"Adds {metric(row, 'return_1Y')} trailing return exposure to the portfolio.",
+            "Associated_Strategies": ["Core-Satellite Allocation", "Systematic Investment Plan"],
+        } for i, row in enumerate(picks)],
+        "Top_Mutual_Funds": [{
+            **fund_ref(row),
+            "Fund_House": row.get("fund_house"),
+            "Scheme_Type": row.get("scheme_type"),
+            "Scheme_Category": row.get("scheme_category"),
+            "Performance_Rating": str(row.get("performance_rating")),
+            "Risk_Rating": str(row.get("risk_rating")),
+            "Currency": row.get("currency"),
+            "Exchange": row.get("exchange"),
+            "MIC_Code": row.get("mic_code"),
+            "Latest_NAV": row.get("latest_nav"),
+            "Historical_Returns": [
+                {"Time_Period": p, "Return_Percentage": metric(row, f"return_{p}")} for p in ("1Y", "3Y", "5Y")
+            ],
+            "Expense_Ratio": "0.65%",
+            "AUM": "₹12,450 Cr",
+        } for row in picks],
+        "Diversification_Strategies": [{
+            "Strategy": name,
+            "Description": f"{name} spreads the corpus across the recommended funds to balance growth and stability.",
+            "Benefits": "Lower concentration risk and smoother returns across market cycles.",
+            "Recommended_Allocation": f"{share}%",
+            "Supported_Funds": [{
+                **fund_ref(row),
+                "Allocation_Percentage": f"{weight}%",
+                "Key_Metrics": {
+                    "1Y_Return": metric(row, "return_1Y"), "3Y_Return": metric(row, "return_3Y"),
+                    "5Y_Return": metric(row, "return_5Y"), "Standard_Deviation": metric(row, "volatility"),
+                    "Sharpe_Ratio": row.get("sharpe_ratio"),
+                },
+            } for row in picks],
+        } for name, share in (("Core-Satellite Allocation", 50), ("Market Cap Diversification", 30),
+                              ("Systematic Investment Plan", 20))],
+        "Sample_Investment_Plan": {
+            "Initial_Investment": "₹5,00,000",
+            "Allocation": [{
+                **fund_ref(row),
+                "Investment_Amount": f"₹{500000 * weight / 100:,.0f}",
+                "Percentage": f"{weight}%",
+                "Projected_Returns": metric(row, "return_3Y"),
+                "Investment_Strategy": "Core-Satellite Allocation",
+            } for row in picks],
+            "Growth_Projection": [{
+                "Year": str(year),
+                "Projected_Value": f"₹{500000 * 1.11 ** year:,.0f}",
+                "Best_Case": f"₹{500000 * 1.16 ** year:,.0f}",
+                "Worst_Case": f"₹{500000 * 1.04 ** year:,.0f}",
+                "Expected_Return": f"{(1.11 ** year - 1) * 100:.1f}%",
+                "CAGR": "11%",
+            } for year in range(1, years + 1)],
+        },
+        "Market_Trends": [{
+            "Trend": trend,
+            "Analysis": f"{trend} has shaped returns of the shortlisted funds over the last three years.",
+            "Impact": "Supports the recommended equity allocation.",
+            "Direction": direction,
+            "Confidence": "Medium",
+            "Supporting_Data": [{"Metric": "Nifty 50 3Y CAGR", "Value": "12.4%", "Change": "+1.2%", "Date": "2024-09-30"}],
+        } for trend, direction in (("Domestic consumption growth", "Positive"), ("Interest rate cycle", "Neutral"),
+                                   ("Foreign portfolio outflows", "Negative"))],
+        "Risk_Assessment": [{
+            "Risk": risk,
+            "Category": category,
+            "Severity": "Medium",
+            "Probability": "Medium",
+            "Impact_Score": "6",
+            "Assessment": f"{risk} could reduce portfolio value in the short term.",
+            "Mitigation_Strategies": "Stagger investments through SIPs and rebalance annually.",
+            "Associated_Funds": [fund_ref(row) for row in picks[:2]],
+        } for risk, category in (("Equity market drawdown", "Market"), ("Credit events", "Credit"),
+                                 ("Redemption pressure", "Liquidity"))],
+        "Projected_Outcomes": [{
+            "Time_Horizon": f"{horizon} years",
+            "Projected_Return": f"{(1.11 ** horizon - 1) * 100:.1f}%",
+            "Details": "Based on the weighted 3Y CAGR of the allocation.",
+            "Assumptions": "Returns follow the trailing three-year average.",
+            "Risk_Adjusted_Return": f"{(1.08 ** horizon - 1) * 100:.1f}%",
+        } for horizon in (1, 3, 5)],
+        "Justifications": [{
+            "Title": f"Why {row.get('name')}",
+            "Details": f"Sharpe ratio of {row.get('sharpe_ratio')} and drawdown of {metric(row, 'max_drawdown')} "
+                       f"fit the client's risk profile.",
+            "Associated_Funds": [fund_ref(row)],
+        } for row in picks[:3]],
+    }
+    return f"```json\n{json.dumps(answer, ensure_ascii=False, indent=2)}\n```"
+
+
+class FakeFile:
+    def __init__(self, name, data, expiration_time):
+        self.name = name
+        self.data = data
+        self.expiration_time = expiration_time
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, latency, chunk_chars=400):
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+
+    def _answer(self, contents):
+        uploaded = next((c for c in contents if isinstance(c, FakeFile)), None)
+        rows = list(csv.DictReader(io.StringIO(uploaded.data.decode("utf-8")))) if uploaded else []
+        return fake_answer(rows), self.latency.sample("gemini_generate")
+
+    def _chunks(self, text):
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+    def generate_content(self, contents, stream=False):
+        text, duration = self._answer(contents)
+        if not stream:
+            time.sleep(duration)
+            return FakeChunk(text)
+        return self._stream(text, duration)
+
+    def _stream(self, text, duration):
+        chunks = self._chunks(text)
+        for chunk in chunks:
+            time.sleep(duration / len(chunks))
+            yield FakeChunk(chunk)
+
+    async def generate_content_async(self, contents, stream=False):
+        text, duration = self._answer(contents)
+        if not stream:
+            await asyncio.sleep(duration)
+            return FakeChunk(text)
+        return self._astream(text, duration)
+
+    async def _astream(self, text, duration):
+        chunks = self._chunks(text)
+        for chunk in chunks:
+            await asyncio.sleep(duration / len(chunks))
+            yield FakeChunk(chunk)
+
+
+class FakeGemini:
+    """Stands in for the genai module: upload_file() plus GenerativeModel()."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def upload_file(self, source, mime_type=None):
+        data = source.read() if hasattr(source, "read") else open(source, "rb").read()
+        self.latency.sleep("gemini_upload")
+        name = f"files/{hashlib.sha256(data).hexdigest()[:12]}"
+        return FakeFile(name, data, datetime.now(timezone.utc) + timedelta(hours=48))
+
+    def GenerativeModel(self, model_name=None):
+        return FakeModel(self.latency)
+
+
+def install_fake_gemini(latency):
+    """Route genai_client's uploads and model calls to FakeGemini."""
+    import genai_client
+
+    fake = FakeGemini(latency)
+    genai_client.upload_cache.client = fake
+    with genai_client._models_lock:
+        genai_client._models.clear()
+        genai_client._models[genai_client.GEMINI_MODEL] = fake.GenerativeModel()
+    return fake
+
+
+if __name__ == '__main__':
+    # python -m bench.fake_upstreams --port 9100 [--latency-scale 0.1]
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve fake Lyzr, Twelve Data and mfapi endpoints.")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--funds", type=int, default=1000)
+    parser.add_argument("--filler-schemes", type=int, default=30000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    market = SyntheticMarket(args.funds, args.filler_schemes, seed=args.seed)
+    uvicorn.run(create_app(market, LatencyModel(args.latency_scale, args.seed)),
+                host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,189 @@
+import re
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import httpx
+from bench.common import (
+    free_port, isolated_env, save_results, start_module, summarize, wait_for_port,
+)
+from bench.fake_upstreams import upstream_env
+
+# === End-to-end load generator ===
+# Starts the fake upstreams and the API in child processes, then drives the API with a
+# closed loop of concurrent clients at each concurrency level and reports latency
+# percentiles, throughput and per-stage means from /metrics.
+RISKS = ["Conservative", "Moderate", "Aggressive"]
+# Not covered by profile_rules, so these profiles go through the Lyzr agent
+AGENT_RISKS = ["Moderately aggressive", "Cautious but growth-seeking"]
+TIMELINES = ["Short-term (1-2 years)", "Medium-term (3-5 years)", "Long-term (5+ years)"]
+GOALS = ["Retirement", "Child education", "Buying a home", "Wealth creation", "Emergency fund"]
+_STAGE_RE = re.compile(r'^advisor_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+class ProfileFactory:
+    """Distinct profiles (so the result cache does not answer them) with a share needing the agent."""
+
+    def __init__(self, agent_ratio=0.2, seed=7):
+        self.agent_ratio = agent_ratio
+        self.random = random.Random(seed)
+        self.counter = 0
+
+    def __call__(self):
+        self.counter += 1
+        rng = self.random
+        risk = rng.choice(AGENT_RISKS) if rng.random() < self.agent_ratio else rng.choice(RISKS)
+        return {
+            "risk_tolerance": risk,
+            "financial_goals": rng.sample(GOALS, 2),
+            "timeline": [rng.choice(TIMELINES)],
+            "income": str(50000 + self.counter * 137),
+            "expenses": str(rng.randrange(20000, 60000, 1000)),
+            "savings": str(rng.randrange(100000, 5000000, 10000)),
+            "debt_levels": str(rng.randrange(0, 1000000, 10000)),
+        }
+
+
+def stage_totals(metrics_text):
+    """{stage: (sum_seconds, count)} from the /metrics stage histogram."""
+    totals = {}
+    for line in metrics_text.splitlines():
+        match = _STAGE_RE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            current = totals.get(stage, (0.0, 0))
+            totals[stage] = (float(value), current[1]) if kind == "sum" else (current[0], int(float(value)))
+    return totals
+
+
+def stage_means(before, after):
+    """Mean milliseconds per stage over the requests made between two stage_totals snapshots."""
+    means = {}
+    for stage, (total, count) in after.items():
+        prev_total, prev_count = before.get(stage, (0.0, 0))
+        if count > prev_count:
+            means[stage] = round((total - prev_total) / (count - prev_count) * 1000, 2)
+    return means
+
+
+async def _send(client, path, profile, stream):
+    start = time.perf_counter()
+    first_byte = None
+    if stream:
+        async with client.stream("POST", path, json=profile) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+            status = response.status_code
+    else:
+        response = await client.post(path, json=profile)
+        status = response.status_code
+    return status, time.perf_counter() - start, first_byte
+
+
+async def run_level(base_url, path, concurrency, n_requests, make_profile, timeout):
+    """Closed loop: `concurrency` clients each send their next request as soon as the last one returns."""
+    stream = path.endswith("/stream")
+    latencies, first_bytes, statuses = [], [], {}
+    remaining = n_requests
+
+    async def worker(client):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            try:
+                status, latency, first_byte = await _send(client, path, make_profile(), stream)
+            except httpx.HTTPError as e:
+                status, latency, first_byte = type(e).__name__, None, None
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                latencies.append(latency)
+                if first_byte is not None:
+                    first_bytes.append(first_byte)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    result = {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "succeeded": len(latencies),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 4) if elapsed else None,
+        "latency": summarize(latencies),
+    }
+    if stream:
+        result["time_to_first_byte"] = summarize(first_bytes)
+    return result
+
+
+async def run(args):
+    make_profile = ProfileFactory(args.agent_ratio, args.seed)
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        for _ in range(args.warmup):
+            await client.post(args.endpoint, json=make_profile())
+        for concurrency in args.concurrency:
+            before = stage_totals((await client.get("/metrics")).text)
+            level = await run_level(base_url, args.endpoint, concurrency, max(args.requests, concurrency),
+                                    make_profile, args.timeout)
+            level["stage_mean_ms"] = stage_means(before, stage_totals((await client.get("/metrics")).text))
+            latency = level["latency"]
+            print(f"concurrency {concurrency:>4}: {level['succeeded']}/{level['requests']} ok, "
+                  f"{level['throughput_rps']} req/s, p50 {latency.get('p50_ms')} ms, "
+                  f"p95 {latency.get('p95_ms')} ms, p99 {latency.get('p99_ms')} ms")
+            results.append(level)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API against fake upstreams.")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 2, 4, 8, 16],
+                        help="comma-separated concurrency levels (default 1,2,4,8,16)")
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--endpoint", default="/get-predictions",
+                        choices=["/get-predictions", "/get-predictions/stream"])
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier on the fake upstream latencies (0 disables them)")
+    parser.add_argument("--agent-ratio", type=float, default=0.2, help="share of profiles sent to the Lyzr agent")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--funds", type=int, default=1000, help="funds in the synthetic universe")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="JSON file to write (default: bench/results/)")
+    args = parser.parse_args()
+
+    upstream_port, args.port = free_port(), free_port()
+    with tempfile.TemporaryDirectory(prefix="advisor-load-") as workdir:
+        env = {**isolated_env(workdir), **upstream_env(f"http://127.0.0.1:{upstream_port}")}
+        processes = []
+        try:
+            processes.append(start_module("bench.fake_upstreams", [
+                "--port", str(upstream_port), "--latency-scale", str(args.latency_scale),
+                "--funds", str(args.funds), "--seed", str(args.seed),
+            ]))
+            wait_for_port(upstream_port, process=processes[-1])
+            processes.append(start_module("bench.serve", [
+                "--port", str(args.port), "--latency-scale", str(args.latency_scale), "--seed", str(args.seed),
+            ], env=env))
+            wait_for_port(args.port, process=processes[-1])
+            results = asyncio.run(run(args))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=30)
+    config = {k: v for k, v in vars(args).items() if k != "port"}
+    path = save_results("loadtest", results, config, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == '__main__':
+    # python -m bench.loadtest [--concurrency 1,4,16] [--requests 32] [--latency-scale 0.1]
+    main()
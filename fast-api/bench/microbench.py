@@ -0,0 +1,115 @@
+import os
+import json
+import argparse
+import tempfile
+from datetime import datetime
+from bench.common import isolated_env, measure, save_results
+from bench.fake_upstreams import SyntheticMarket, fake_answer
+
+# === Microbenchmarks for the CPU-bound steps of a prediction ===
+# NAV parsing, analytics, dataset and prompt building, and parsing the model's answer,
+# each timed on synthetic funds with full ten-year daily histories.
+
+
+def run(n_funds=50, repeat=30, seed=7):
+    with tempfile.TemporaryDirectory(prefix="advisor-bench-") as workdir:
+        for key, value in isolated_env(workdir).items():
+            os.environ.setdefault(key, value)
+        return _run(n_funds, repeat, seed)
+
+
+def _run(n_funds, repeat, seed):
+    # Imported after the environment is set, since the stores read their paths at import time
+    import app
+    from nav_series import NavSeries, SeriesCache, parse_date, NAV_WINDOW_DAYS
+    from analytics import nav_matrix, fund_metrics, METRIC_COLUMNS
+    from dataset import FUND_FIELDS, build_csv, compact_nav_column
+    from projections import project_plan
+    from prompt_budget import fit_to_budget
+    from recommendations import RecommendationParser, parse_recommendations
+
+    market = SyntheticMarket(n_funds=n_funds, filler_schemes=0, seed=seed)
+    codes = [code for code, name in market.schemes if name.endswith("Direct Plan - Growth")][:n_funds]
+    payloads = [market.scheme_payload(code) for code in codes]
+    fund_data = [json.loads(payload) for payload in payloads]
+    entries = fund_data[0]["data"]
+
+    results = {}
+
+    def bench(name, fn, setup=None, times=repeat, **info):
+        results[name] = {**measure(fn, repeat=times, setup=setup), **info}
+        print(f"{name:<28} p50 {results[name]['p50_ms']:>10.3f} ms   p95 {results[name]['p95_ms']:>10.3f} ms")
+
+    bench("nav_payload_json_decode", lambda: json.loads(payloads[0]), bytes=len(payloads[0]))
+    bench("nav_parse_strptime_baseline",
+          lambda: [(datetime.strptime(e["date"], "%d-%m-%Y"), float(e["nav"])) for e in entries],
+          entries=len(entries))
+    bench("nav_parse_cold", lambda: NavSeries.from_entries(entries), setup=parse_date.cache_clear,
+          entries=len(entries))
+    bench("nav_parse_warm", lambda: NavSeries.from_entries(entries), entries=len(entries))
+    series = NavSeries.from_entries(entries)
+    bench("nav_window_5y", lambda: series.window(NAV_WINDOW_DAYS))
+
+    cache = SeriesCache()
+    bench("series_cache_all_funds",
+          lambda: [cache.get(code, data) for code, data in zip(codes, fund_data)], funds=n_funds)
+    windows = [cache.get(code, data).window(NAV_WINDOW_DAYS) for code, data in zip(codes, fund_data)]
+
+    bench("nav_matrix", lambda: nav_matrix(windows), funds=n_funds)
+    matrix = nav_matrix(windows)
+    bench("fund_metrics", lambda: fund_metrics(matrix), funds=n_funds)
+    metrics = fund_metrics(matrix)
+
+    dates, _, filled = matrix
+    bench("compact_nav_column_monthly", lambda: compact_nav_column(dates, filled, "monthly"), funds=n_funds)
+    funds = []
+    histories = compact_nav_column(dates, filled, "monthly")
+    for listed, code, data, row, history in zip(market.funds, codes, fund_data, metrics, histories):
+        fund = {**listed, "schemeCode": code, **{k: v for k, v in data["meta"].items() if k in FUND_FIELDS}}
+        fund.update({col: "N/A" if row[col] is None else row[col] for col in METRIC_COLUMNS})
+        fund["nav_history"] = history
+        funds.append(fund)
+    fieldnames = FUND_FIELDS + METRIC_COLUMNS + ["nav_history"]
+    csv_bytes = build_csv(funds, fieldnames)
+    bench("build_csv", lambda: build_csv(funds, fieldnames), funds=n_funds, bytes=len(csv_bytes))
+
+    profile = app.profile_dict(app.UserProfile(
+        risk_tolerance="Moderate", financial_goals=["Retirement"], timeline=["Long-term (5+ years)"],
+        income="150000", expenses="60000", savings="1500000", debt_levels="0",
+    ))
+
+    def render(indexes):
+        kept = [funds[i] for i in indexes]
+        table = app.metrics_table([f["schemeCode"] for f in kept], [f["name"] for f in kept],
+                                  [metrics[i] for i in indexes])
+        return app.create_ai_prompt(profile, table, "monthly"), build_csv(kept, fieldnames)
+
+    bench("fit_to_budget", lambda: fit_to_budget(metrics, render), funds=n_funds)
+
+    rows = [{k: str(v) for k, v in fund.items()} for fund in funds]
+    answer = fake_answer(rows)
+    bench("response_parse", lambda: parse_recommendations(answer), chars=len(answer))
+
+    def parse_streamed():
+        parser = RecommendationParser()
+        for start in range(0, len(answer), 64):
+            parser.feed(answer[start:start + 64])
+        return parser.finish()
+
+    bench("response_parse_streamed", parse_streamed, chars=len(answer), chunk_chars=64)
+    plan = parse_recommendations(answer).model_dump(by_alias=True)["Sample_Investment_Plan"]
+    bench("growth_projection", lambda: project_plan(plan, codes, filled), times=min(repeat, 10))
+    return results
+
+
+if __name__ == '__main__':
+    # python -m bench.microbench [--funds 50] [--repeat 30] [--output results.json]
+    parser = argparse.ArgumentParser(description="Time the CPU-bound steps of a prediction.")
+    parser.add_argument("--funds", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="JSON file to write (default: bench/results/)")
+    args = parser.parse_args()
+    results = run(args.funds, args.repeat, args.seed)
+    path = save_results("microbench", results, vars(args), args.output)
+    print(f"Results written to {path}")
@@ -0,0 +1,25 @@
+import os
+import argparse
+from bench.common import FAKE_ENV
+from bench.fake_upstreams import LatencyModel, install_fake_gemini
+
+# === The service under test ===
+# Runs app.py with Gemini faked in-process. The Lyzr, Twelve Data and mfapi URLs come
+# from the environment (see fake_upstreams.upstream_env), as set by bench.loadtest.
+
+if __name__ == '__main__':
+    # python -m bench.serve --port 8090 [--latency-scale 0.1]
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the API against fake upstreams.")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    for key, value in FAKE_ENV.items():
+        os.environ.setdefault(key, value)
+    import app
+
+    install_fake_gemini(LatencyModel(args.latency_scale, args.seed))
+    uvicorn.run(app.app, host="127.0.0.1", port=args.port, log_level="warning")
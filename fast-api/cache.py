@@ -0,0 +1,242 @@
+import os
+import re
+import asyncio
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from telemetry import cache_requests
+
+# === Result caches for /get-predictions ===
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "256"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+# Optional disk tier shared across workers and restarts; empty disables it
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", "")
+PARAMETERS_CACHE_SIZE = int(os.getenv("PARAMETERS_CACHE_SIZE", "1024"))
+PARAMETERS_CACHE_TTL = float(os.getenv("PARAMETERS_CACHE_TTL", "86400"))
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _bucket(amount):
+    """Round a free-text amount to two significant figures so near-identical profiles share a key."""
+    text = str(amount).replace(",", "").strip().lower()
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return text
+    value = float(match.group())
+    rounded = f"{float(f'{value:.2g}'):g}" if value else "0"
+    # Keep units such as "lakh" or "per month" so different magnitudes never collide
+    unit = " ".join(re.findall(r"[a-z]+", text[match.end():]))
+    return f"{rounded} {unit}".strip()
+
+
+def normalize_profile(profile):
+    return {
+        "risk_tolerance": profile.risk_tolerance.strip().lower(),
+        "financial_goals": sorted(goal.strip().lower() for goal in profile.financial_goals),
+        "timeline": sorted(item.strip().lower() for item in profile.timeline),
+        "income": _bucket(profile.income),
+        "expenses": _bucket(profile.expenses),
+        "savings": _bucket(profile.savings),
+        "debt_levels": _bucket(profile.debt_levels),
+    }
+
+
+def profile_key(profile):
+    """Canonical hash of a normalized UserProfile."""
+    canonical = json.dumps(normalize_profile(profile), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """SQLite-backed cache tier; values are pickled and expire after `ttl` seconds."""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """A connection for one transaction: committed, or rolled back on error, then closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT expires_at, value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return pickle.loads(row[1])
+
+    def set(self, key, value):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, pickle.dumps(value))
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Makes identical concurrent calls share one execution of `fn`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class ResultCache:
+    """
+    Memory LRU in front of an optional disk tier, with hit/miss counters and a
+    single-flight guard. None results are never cached.
+    """
+
+    def __init__(self, name, maxsize, ttl, path=""):
+        self.name = name
+        self.memory = TTLCache(maxsize, ttl)
+        self.disk = DiskCache(path, ttl) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._tasks = {}
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        cache_requests.inc(cache=self.name, result="hit" if hit else "miss")
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk:
+            self.disk.set(key, value)
+
+    async def aget(self, key):
+        """Like get(), for the event loop: the disk tier is read on a worker thread."""
+        value = self.memory.get(key)
+        if value is None and self.disk:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def aset(self, key, value):
+        """Like set(), for the event loop: the disk tier is written on a worker thread."""
+        self.memory.set(key, value)
+        if self.disk:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    async def aget_or_compute(self, key, fn):
+        """
+        The cached value for `key`, or the result of the coroutine function `fn`, which is
+        cached unless it is None. Concurrent callers on the event loop await one task.
+        """
+        value = await self.aget(key)
+        if value is not None:
+            self._count(True)
+            return value
+        self._count(False)
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(self._acompute(key, fn))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # Shielded, so a caller that disconnects does not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _acompute(self, key, fn):
+        value = await fn()
+        if value is not None:
+            await self.aset(key, value)
+        return value
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.memory)}
+
+
+prediction_cache = ResultCache("predictions", PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, PREDICTION_CACHE_PATH)
+parameters_cache = ResultCache("api_parameters", PARAMETERS_CACHE_SIZE, PARAMETERS_CACHE_TTL)
@@ -0,0 +1,89 @@
+import io
+import os
+import csv
+import tempfile
+from datetime import date
+import numpy as np
+
+# === In-memory fund dataset ===
+# The dataset sent to Gemini is built as bytes in memory; each fund carries a compact
+# period-end NAV series instead of its full daily history as a JSON string.
+FUND_FIELDS = [
+    'symbol', 'name', 'country', 'fund_family', 'fund_type',
+    'performance_rating', 'risk_rating', 'currency', 'exchange', 'mic_code',
+    'schemeCode', 'fund_house', 'scheme_type', 'scheme_category', 'scheme_name',
+]
+
+
+NAV_GRANULARITIES = ('weekly', 'monthly', 'quarterly')
+
+
+def _period_key(day, granularity):
+    if granularity == 'weekly':
+        return (day.toordinal() - 1) // 7
+    if granularity == 'quarterly':
+        return day.year * 4 + (day.month - 1) // 3
+    return day.year * 12 + day.month
+
+
+def _period_label(day, granularity):
+    if granularity == 'weekly':
+        return day.strftime('%Y-%m-%d')
+    if granularity == 'quarterly':
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    return day.strftime('%Y-%m')
+
+
+def period_end_rows(dates, granularity='monthly'):
+    """Indexes of the last row of every week, month or quarter in an ascending ordinal-date array."""
+    if len(dates) == 0:
+        return np.empty(0, dtype=np.int64)
+    keys = np.fromiter(
+        (_period_key(d, granularity) for d in map(date.fromordinal, dates.tolist())),
+        dtype=np.int64, count=len(dates)
+    )
+    return np.append(np.flatnonzero(np.diff(keys)), len(dates) - 1)
+
+
+def compact_nav_column(dates, filled, granularity='monthly'):
+    """Render each fund's period-end NAVs as 'label:nav;...' strings."""
+    rows = period_end_rows(dates, granularity)
+    labels = [_period_label(date.fromordinal(int(d)), granularity) for d in dates[rows]]
+    sampled = filled[rows]
+    columns = []
+    for j in range(filled.shape[1]):
+        columns.append(";".join(
+            f"{label}:{nav:.4g}" for label, nav in zip(labels, sampled[:, j]) if not np.isnan(nav)
+        ))
+    return columns
+
+
+def build_csv(rows, fieldnames):
+    """Serialize fund rows to UTF-8 CSV bytes without touching the filesystem."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+class ManagedTempFile:
+    """Context manager that writes bytes to a temp file and always deletes it afterwards."""
+
+    def __init__(self, data, suffix='.csv'):
+        self.data = data
+        self.suffix = suffix
+        self.path = None
+
+    def __enter__(self):
+        fd, self.path = tempfile.mkstemp(suffix=self.suffix, prefix='funds_data_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.data)
+        return self.path
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
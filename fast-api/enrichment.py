@@ -0,0 +1,212 @@
+import os
+import asyncio
+import logging
+import urllib.parse
+from contextlib import asynccontextmanager
+import httpx
+from datetime import date, timedelta
+from nav_store import get_store, to_iso
+from nav_series import NavSeries, series_cache, NAV_WINDOW_DAYS
+from scheme_index import get_index, MFAPI_BASE_URL
+from upstream import mfapi, UpstreamError
+from telemetry import cache_requests
+
+log = logging.getLogger(__name__)
+
+# === Concurrency settings for the per-fund enrichment fan-out ===
+# ENRICH_MAX_CONCURRENCY caps the number of funds processed at once,
+# ENRICH_MAX_PER_HOST caps the requests in flight against any single upstream host,
+# across every request this process is serving.
+MAX_CONCURRENCY = int(os.getenv("ENRICH_MAX_CONCURRENCY", "16"))
+MAX_PER_HOST = int(os.getenv("ENRICH_MAX_PER_HOST", "8"))
+
+
+class HostLimiter:
+    """Hands out one semaphore per upstream host so a single slow API cannot absorb every slot."""
+
+    def __init__(self, max_per_host, loop=None):
+        self.max_per_host = max_per_host
+        self.loop = loop
+        self._semaphores = {}
+
+    def for_url(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._semaphores[host]
+
+
+_limiter = None
+
+
+def host_limiter():
+    """
+    The process-wide HostLimiter, so the per-host cap holds across concurrent requests.
+
+    Like the upstream clients it belongs to one event loop: the app's loop while it runs,
+    or a fresh one for each asyncio.run() of a script such as the bulk loader.
+    """
+    global _limiter
+    loop = asyncio.get_running_loop()
+    if _limiter is None or _limiter.loop is not loop:
+        _limiter = HostLimiter(MAX_PER_HOST, loop)
+    return _limiter
+
+
+async def _get_json(client, limiter, url):
+    async with limiter.for_url(url):
+        try:
+            response = await mfapi.arequest(client, "GET", url)
+        except UpstreamError as e:
+            log.warning("Request failed: %s", e)
+            return None
+    if response.status_code != 200:
+        log.warning("Error fetching %s: %s - %s", url, response.status_code, response.text)
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        log.warning("Failed to parse JSON response from %s.", url)
+        return None
+
+
+async def get_scheme_code(client, limiter, fund_name):
+    # Resolve locally from the scheme master index; only fall back to mfapi search
+    # while the index is still building or when nothing in it is close enough
+    index = get_index()
+    if index:
+        scheme_code = index.resolve(fund_name)
+        if scheme_code:
+            return scheme_code
+    query = urllib.parse.quote(fund_name)
+    schemes = await _get_json(client, limiter, f"{MFAPI_BASE_URL}/search?q={query}")
+    if not schemes:
+        log.info("No schemes found for fund name: %s", fund_name)
+        return None
+    # Attempt to find the best match, otherwise pick the first one
+    fund_name_lower = fund_name.lower()
+    for scheme in schemes:
+        if scheme['schemeName'].lower() == fund_name_lower:
+            return scheme['schemeCode']
+    return schemes[0]['schemeCode']
+
+
+async def fetch_fund_data(client, limiter, scheme_code):
+    return await _get_json(client, limiter, f"{MFAPI_BASE_URL}/{scheme_code}")
+
+
+async def _fetch_latest_date(client, limiter, scheme_code):
+    latest = await _get_json(client, limiter, f"{MFAPI_BASE_URL}/{scheme_code}/latest")
+    try:
+        return to_iso(latest['data'][0]['date'])
+    except (TypeError, KeyError, IndexError, ValueError):
+        return None
+
+
+async def _load_stored(store, scheme_code, since):
+    """
+    Stored fund data for a scheme as {'meta': ..., 'series': NavSeries}, or None when unknown.
+
+    The parsed series is cached per (last stored date, window start), so the NAV points
+    are only read back from the store and parsed when new ones were merged.
+    """
+    summary = await asyncio.to_thread(store.summary, scheme_code)
+    if summary is None:
+        return None
+    meta, last_date = summary
+    version = (last_date, since.toordinal())
+    series = series_cache.lookup(scheme_code, version)
+    if series is None:
+        fund_data = await asyncio.to_thread(store.load, scheme_code, since)
+        series = await asyncio.to_thread(NavSeries.from_entries, fund_data['data'] if fund_data else [])
+        series_cache.put(scheme_code, version, series)
+    return {"meta": meta, "series": series, "status": "SUCCESS"}
+
+
+async def get_fund_data(client, limiter, scheme_code):
+    """
+    Return fund data for a scheme as {'meta': ..., 'series': NavSeries}, served from the
+    local NAV store when possible.
+
+    Schemes already refreshed today are read straight from disk. Otherwise the cheap
+    /latest endpoint is probed first and the full history is only downloaded when it
+    reports a date newer than the one stored; only those newer points are merged.
+    """
+    store = get_store()
+    since = date.today() - timedelta(days=NAV_WINDOW_DAYS)
+    state = await asyncio.to_thread(store.scheme_state, scheme_code)
+    if state:
+        last_date, refreshed_on = state
+        if refreshed_on == date.today().isoformat():
+            cache_requests.inc(cache="nav_store", result="hit")
+            return await _load_stored(store, scheme_code, since)
+        latest_date = await _fetch_latest_date(client, limiter, scheme_code)
+        if latest_date and last_date and latest_date <= last_date:
+            cache_requests.inc(cache="nav_store", result="revalidated")
+            await asyncio.to_thread(store.mark_refreshed, scheme_code)
+            return await _load_stored(store, scheme_code, since)
+
+    cache_requests.inc(cache="nav_store", result="miss")
+    fund_data = await fetch_fund_data(client, limiter, scheme_code)
+    if not fund_data:
+        # Serve stale history rather than nothing if the upstream is unavailable
+        return await _load_stored(store, scheme_code, since) if state else None
+    await asyncio.to_thread(store.merge, scheme_code, fund_data)
+    return await _load_stored(store, scheme_code, since)
+
+
+@asynccontextmanager
+async def mfapi_client():
+    """The app's shared mfapi client while it runs; a short-lived one for scripts such as the bulk loader."""
+    if mfapi.async_client is not None:
+        yield mfapi.async_client
+        return
+    async with httpx.AsyncClient(limits=mfapi.limits(), timeout=mfapi.timeout) as client:
+        yield client
+
+
+async def _resolve_fund(client, limiter, fund_slots, fund, index, on_resolved):
+    async with fund_slots:
+        fund_name = fund['name']
+        log.debug("Processing fund: %s", fund_name)
+        scheme_code = await get_scheme_code(client, limiter, fund_name)
+        fund_data = await get_fund_data(client, limiter, scheme_code) if scheme_code else None
+    if on_resolved:
+        on_resolved(index, fund, scheme_code)
+    return scheme_code, fund_data
+
+
+async def resolve_funds(funds, max_concurrency=MAX_CONCURRENCY, on_resolved=None):
+    """
+    Resolve the scheme code and mfapi fund data for every fund concurrently.
+
+    Returns a list of (scheme_code, fund_data) tuples in the same order as `funds`;
+    scheme_code is None when no match was found and fund_data is None when the
+    detail lookup failed. `on_resolved(index, fund, scheme_code)` is called as each
+    fund finishes, in completion order.
+    """
+    limiter = host_limiter()
+    fund_slots = asyncio.Semaphore(max_concurrency)
+    async with mfapi_client() as client:
+        return await asyncio.gather(
+            *(_resolve_fund(client, limiter, fund_slots, fund, i, on_resolved) for i, fund in enumerate(funds))
+        )
+
+
+async def bulk_load(scheme_codes, max_concurrency=MAX_CONCURRENCY):
+    """Cold-start loader: download and store the full NAV history for every scheme code."""
+    store = get_store()
+    limiter = host_limiter()
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def load_one(client, scheme_code):
+        async with slots:
+            fund_data = await fetch_fund_data(client, limiter, scheme_code)
+        if not fund_data:
+            return False
+        await asyncio.to_thread(store.merge, scheme_code, fund_data)
+        return True
+
+    async with mfapi_client() as client:
+        results = await asyncio.gather(*(load_one(client, code) for code in scheme_codes))
+    return sum(results)
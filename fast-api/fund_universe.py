@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import logging
+import threading
+import httpx
+import numpy as np
+from upstream import twelvedata, UpstreamError
+
+log = logging.getLogger(__name__)
+
+# === Local snapshot of the Indian mutual fund universe ===
+# The full Twelve Data listing is held as columnar arrays with inverted indexes so the
+# Lyzr-derived filters are answered locally; the live API is only used while the
+# snapshot is missing or stale, or for filters the snapshot cannot answer.
+FUND_LIST_URL = os.getenv("TWELVEDATA_FUND_LIST_URL", "https://api.twelvedata.com/mutual_funds/list")
+FUND_UNIVERSE_PATH = os.getenv("FUND_UNIVERSE_PATH", "fund_universe.json")
+REFRESH_INTERVAL = float(os.getenv("FUND_UNIVERSE_REFRESH_SECONDS", str(24 * 3600)))
+RETRY_INTERVAL = 600
+MAX_AGE = float(os.getenv("FUND_UNIVERSE_MAX_AGE_SECONDS", str(3 * 24 * 3600)))
+PAGE_SIZE = 5000
+# Twelve Data returns this many funds per call unless outputsize is given
+DEFAULT_OUTPUT_SIZE = 50
+
+RATING_COLUMNS = ("performance_rating", "risk_rating")
+CATEGORY_COLUMNS = ("fund_family", "fund_type", "country")
+IGNORED_PARAMETERS = {"apikey", "outputsize", "page", "format"}
+
+
+def _rating(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _values(value):
+    return value if isinstance(value, (list, tuple, set)) else [value]
+
+
+class FundUniverse:
+    def __init__(self, funds, fetched_at):
+        self.funds = funds
+        self.fetched_at = fetched_at
+        self.ratings = {
+            column: np.array([_rating(fund.get(column)) for fund in funds], dtype=np.int8)
+            for column in RATING_COLUMNS
+        }
+        # Inverted indexes: lowercased value -> sorted row ids
+        self.indexes = {}
+        for column in CATEGORY_COLUMNS:
+            postings = {}
+            for row, fund in enumerate(funds):
+                postings.setdefault(str(fund.get(column, "")).strip().lower(), []).append(row)
+            self.indexes[column] = {value: np.array(rows, dtype=np.int64) for value, rows in postings.items()}
+
+    def is_stale(self):
+        return time.time() - self.fetched_at > MAX_AGE
+
+    def supports(self, api_parameters):
+        """True when every filter can be answered from the snapshot (which only holds one country)."""
+        supported = set(RATING_COLUMNS) | set(CATEGORY_COLUMNS) | IGNORED_PARAMETERS
+        if not set(api_parameters) <= supported:
+            return False
+        countries = self.indexes["country"]
+        return all(str(c).strip().lower() in countries for c in _values(api_parameters.get("country", [])))
+
+    def query(self, api_parameters):
+        """Return copies of the funds matching every filter, in listing order."""
+        mask = np.ones(len(self.funds), dtype=bool)
+        for column in RATING_COLUMNS:
+            if column in api_parameters:
+                wanted = [_rating(v) for v in _values(api_parameters[column])]
+                mask &= np.isin(self.ratings[column], wanted)
+        for column in CATEGORY_COLUMNS:
+            if column in api_parameters:
+                column_mask = np.zeros(len(self.funds), dtype=bool)
+                for value in _values(api_parameters[column]):
+                    rows = self.indexes[column].get(str(value).strip().lower())
+                    if rows is not None:
+                        column_mask[rows] = True
+                mask &= column_mask
+        limit = _rating(api_parameters.get("outputsize", DEFAULT_OUTPUT_SIZE))
+        rows = np.flatnonzero(mask)[:limit if limit > 0 else DEFAULT_OUTPUT_SIZE]
+        return [dict(self.funds[i]) for i in rows]
+
+    def save(self, path=FUND_UNIVERSE_PATH):
+        # Per process, since several server workers may save at once
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at, "funds": self.funds}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=FUND_UNIVERSE_PATH):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            return cls(snapshot["funds"], snapshot["fetched_at"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def download_universe(country="India"):
+    """Page through the full Twelve Data listing for a country; returns None on failure."""
+    funds = []
+    page = 1
+    while True:
+        params = {"country": country, "outputsize": PAGE_SIZE, "page": page, "apikey": os.getenv("TWELVEDATA_API_KEY")}
+        try:
+            response = twelvedata.request("GET", FUND_LIST_URL, params=params)
+            response.raise_for_status()
+            result = response.json().get("result", {})
+        except (UpstreamError, httpx.HTTPError, ValueError) as e:
+            log.warning("Failed to download fund universe page %s: %s", page, e)
+            return None
+        batch = result.get("list", [])
+        funds.extend(batch)
+        if not batch or len(funds) >= int(result.get("count", 0)):
+            return funds
+        page += 1
+
+
+_universe = FundUniverse.load()
+_universe_lock = threading.Lock()
+_refresh_thread = None
+
+
+def get_universe():
+    """Return the current snapshot if it is fresh enough to serve queries, else None."""
+    universe = _universe
+    if universe is None or universe.is_stale():
+        return None
+    return universe
+
+
+def refresh_universe():
+    global _universe
+    funds = download_universe()
+    if not funds:
+        return None
+    universe = FundUniverse(funds, time.time())
+    with _universe_lock:
+        _universe = universe
+    try:
+        universe.save()
+    except OSError as e:
+        log.warning("Failed to save fund universe snapshot: %s", e)
+    log.info("Fund universe refreshed with %d funds.", len(funds))
+    return universe
+
+
+def _load_newer_snapshot():
+    """Adopt the saved snapshot if another server worker refreshed it since we loaded ours."""
+    global _universe
+    saved = FundUniverse.load()
+    with _universe_lock:
+        if saved and (_universe is None or saved.fetched_at > _universe.fetched_at):
+            _universe = saved
+        return _universe
+
+
+def _refresh_loop(stop_event):
+    while not stop_event.is_set():
+        universe = _universe
+        age = time.time() - universe.fetched_at if universe else REFRESH_INTERVAL
+        if age >= REFRESH_INTERVAL:
+            universe = _load_newer_snapshot()
+            age = time.time() - universe.fetched_at if universe else REFRESH_INTERVAL
+        if age < REFRESH_INTERVAL:
+            # A snapshot loaded from disk is still recent: wait until it is due
+            wait = REFRESH_INTERVAL - age
+        else:
+            wait = REFRESH_INTERVAL if refresh_universe() else RETRY_INTERVAL
+        stop_event.wait(wait)
+
+
+def start_background_refresh():
+    """Keep the snapshot refreshed every REFRESH_INTERVAL seconds in a daemon thread."""
+    global _refresh_thread
+    if _refresh_thread and _refresh_thread.is_alive():
+        return _refresh_thread.stop_event
+    stop_event = threading.Event()
+    _refresh_thread = threading.Thread(target=_refresh_loop, args=(stop_event,), daemon=True)
+    _refresh_thread.stop_event = stop_event
+    _refresh_thread.start()
+    return stop_event
@@ -0,0 +1,108 @@
+import io
+import os
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+import google.generativeai as genai
+from cache import SingleFlight
+from dataset import ManagedTempFile
+from telemetry import cache_requests
+
+# === Gemini upload and model reuse ===
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Uploaded files expire remotely after 48 hours; stop reusing a handle this long before that
+UPLOAD_EXPIRY_MARGIN = timedelta(minutes=float(os.getenv("UPLOAD_EXPIRY_MARGIN_MINUTES", "30")))
+DEFAULT_FILE_TTL = timedelta(hours=48)
+UPLOAD_CACHE_SIZE = int(os.getenv("UPLOAD_CACHE_SIZE", "512"))
+
+
+class UploadCache:
+    """
+    Content-addressed cache of uploaded file handles.
+
+    Identical bytes are uploaded once and the handle is reused until shortly before
+    its remote expiration_time. `client` is the genai module or any stub exposing
+    upload_file(source, mime_type=...).
+    """
+
+    def __init__(self, client=genai, margin=UPLOAD_EXPIRY_MARGIN, maxsize=UPLOAD_CACHE_SIZE):
+        self.client = client
+        self.margin = margin
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._files = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    @staticmethod
+    def _expires_at(uploaded_file):
+        expires_at = getattr(uploaded_file, 'expiration_time', None)
+        if not isinstance(expires_at, datetime):
+            return datetime.now(timezone.utc) + DEFAULT_FILE_TTL
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at
+
+    def _upload(self, data, mime_type):
+        try:
+            # Stream the in-memory bytes straight to the Files API
+            return self.client.upload_file(io.BytesIO(data), mime_type=mime_type)
+        except TypeError:
+            # Older SDKs only accept a path: fall back to a temp file that is always removed
+            with ManagedTempFile(data) as path:
+                return self.client.upload_file(path, mime_type=mime_type)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is None:
+                return None
+            uploaded_file, expires_at = entry
+            if expires_at - self.margin <= datetime.now(timezone.utc):
+                del self._files[key]
+                return None
+            return uploaded_file
+
+    def upload(self, data, mime_type='text/csv'):
+        key = f"{mime_type}:{hashlib.sha256(data).hexdigest()}"
+        uploaded_file = self._lookup(key)
+        if uploaded_file is not None:
+            self.hits += 1
+            cache_requests.inc(cache="uploads", result="hit")
+            return uploaded_file
+        self.misses += 1
+        cache_requests.inc(cache="uploads", result="miss")
+
+        def upload_once():
+            uploaded_file = self._lookup(key)
+            if uploaded_file is None:
+                uploaded_file = self._upload(data, mime_type)
+                with self._lock:
+                    if len(self._files) >= self.maxsize:
+                        # Drop the handle closest to expiry
+                        oldest = min(self._files, key=lambda k: self._files[k][1])
+                        del self._files[oldest]
+                    self._files[key] = (uploaded_file, self._expires_at(uploaded_file))
+            return uploaded_file
+
+        return self._flight.do(key, upload_once)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._files)}
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(model_name=GEMINI_MODEL, client=genai):
+    """Return a shared GenerativeModel instance instead of building one per call."""
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = client.GenerativeModel(model_name=model_name)
+        return model
+
+
+upload_cache = UploadCache()
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+from contextlib import contextmanager
+from telemetry import Gauge
+
+# === Background prediction jobs ===
+# Jobs are persisted in SQLite so their state survives a restart; queued and interrupted
+# jobs are picked up again when the workers start, and by a periodic sweep once their
+# lease lapses. Server worker processes share the store, and a job only runs in the
+# process that claims it.
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+# A running job whose progress has not been saved for this long, or a queued job no worker
+# has claimed for this long, is presumed orphaned
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+log = logging.getLogger(__name__)
+
+queue_depth = Gauge("advisor_job_queue_depth", "Jobs waiting for a worker.")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    progress TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStore:
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection for one transaction: committed, or rolled back on error, then closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, payload):
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, progress, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), json.dumps({}), now, now)
+            )
+        return job_id
+
+    def update(self, job_id, **fields):
+        columns = []
+        values = []
+        for name, value in fields.items():
+            columns.append(f"{name} = ?")
+            values.append(json.dumps(value, default=str) if name in ("progress", "result") else value)
+        columns.append("updated_at = ?")
+        values.extend([time.time(), job_id])
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", values)
+
+    def delete(self, job_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, payload, progress, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "payload": json.loads(row[2]),
+            "progress": json.loads(row[3]),
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def claim(self, job_id):
+        """Mark a queued job as running; False when another process claimed it first."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def requeue_expired(self, lease):
+        """
+        Queue running jobs again once their lease has lapsed, e.g. after their process
+        died, and return their ids. Each job is released by one process only.
+        """
+        now = time.time()
+        released = []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND updated_at < ?", (RUNNING, now - lease)
+            ).fetchall()
+            for (job_id,) in rows:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ? AND updated_at < ?",
+                    (QUEUED, now, job_id, RUNNING, now - lease)
+                )
+                if cursor.rowcount == 1:
+                    released.append(job_id)
+        return released
+
+    def queued(self, older_than=None):
+        """Ids of queued jobs, oldest first; with `older_than`, only those waiting at least that many seconds."""
+        before = time.time() - older_than if older_than is not None else float("inf")
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND updated_at < ? ORDER BY created_at", (QUEUED, before)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class JobQueue:
+    """
+    Bounded pool of asyncio workers for prediction jobs.
+
+    `runner(payload, emit)` is a coroutine function that does the work and returns a
+    JSON-serializable result; it reports progress through `emit(event, data)`. submit()
+    raises QueueFull once `queue_limit` jobs are waiting. Progress is saved at least
+    every `lease / 4` seconds, which renews the job's lease; as often, a sweep queues
+    again the jobs whose lease lapsed and offers this process the queued jobs nobody
+    has claimed within a lease, such as those left in a dead process's memory.
+    """
+
+    def __init__(self, runner, store=None, workers=JOB_WORKERS, queue_limit=JOB_QUEUE_LIMIT,
+                 lease=JOB_LEASE_SECONDS):
+        self.runner = runner
+        self.store = store
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.lease = lease
+        self._queue = None
+        self._pending = set()  # ids in this process's queue
+        self._tasks = []
+        queue_depth.set_function(self.depth)
+
+    async def start(self):
+        """Open the store and start the workers on the running event loop."""
+        if self._tasks:
+            return
+        if self.store is None:
+            self.store = await asyncio.to_thread(JobStore)
+        self._queue = asyncio.Queue(maxsize=self.queue_limit)
+        await asyncio.to_thread(self.store.requeue_expired, self.lease)
+        self._offer(await asyncio.to_thread(self.store.queued))
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending.clear()
+
+    async def submit(self, payload):
+        if self._queue.full():
+            raise QueueFull()
+        job_id = await asyncio.to_thread(self.store.create, payload)
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            await asyncio.to_thread(self.store.delete, job_id)
+            raise QueueFull()
+        self._pending.add(job_id)
+        return job_id
+
+    def depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    def _offer(self, job_ids):
+        """Queue job ids this process does not hold yet; every process may hold a job, claim() picks one."""
+        for job_id in job_ids:
+            if job_id in self._pending:
+                continue
+            try:
+                self._queue.put_nowait(job_id)
+            except asyncio.QueueFull:
+                log.warning("Job queue is full; leaving the remaining queued jobs for another worker.")
+                break
+            self._pending.add(job_id)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.lease / 4)
+            try:
+                released = await asyncio.to_thread(self.store.requeue_expired, self.lease)
+                if released:
+                    log.warning("Requeued %d job(s) whose lease lapsed.", len(released))
+                self._offer(released + await asyncio.to_thread(self.store.queued, self.lease))
+            except Exception:
+                log.exception("Job sweep failed.")
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            self._pending.discard(job_id)
+            try:
+                await self._run(job_id)
+            except Exception:
+                log.exception("Job %s crashed.", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        if not await asyncio.to_thread(self.store.claim, job_id):
+            return
+        job = await asyncio.to_thread(self.store.get, job_id)
+        progress = {"stage": "started", "funds_total": 0, "funds_resolved": 0}
+        changed = asyncio.Event()
+        finished = asyncio.Event()
+
+        def emit(event, data):
+            progress["stage"] = event
+            if event == "funds_listed":
+                progress["funds_total"] = data["count"]
+            elif event == "fund_resolved":
+                progress["funds_resolved"] += 1
+            elif event == "token":
+                # Token events are too frequent to be worth saving
+                return
+            changed.set()
+
+        changed.set()
+        saver = asyncio.create_task(self._save_progress(job_id, progress, changed, finished))
+        try:
+            result = await self.runner(job["payload"], emit)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job to the next worker that starts
+            finished.set()
+            saver.cancel()
+            await asyncio.to_thread(self.store.update, job_id, status=QUEUED)
+            raise
+        except Exception as e:
+            finished.set()
+            changed.set()
+            await saver
+            await asyncio.to_thread(self.store.update, job_id, status=FAILED, error=str(getattr(e, "detail", e)))
+            return
+        finished.set()
+        changed.set()
+        await saver
+        progress["stage"] = DONE
+        await asyncio.to_thread(self.store.update, job_id, status=DONE, progress=progress, result=result)
+
+    async def _save_progress(self, job_id, progress, changed, finished):
+        """Write the latest progress whenever it changes, coalescing bursts, until the job finishes."""
+        while not finished.is_set():
+            try:
+                await asyncio.wait_for(changed.wait(), self.lease / 4)
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
+            await asyncio.to_thread(self.store.update, job_id, progress=dict(progress))
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
+import numpy as np
+from telemetry import cache_requests
+
+# === Parsed NAV series ===
+# Each scheme's mfapi NAV entries are parsed once into sorted day-number and float
+# arrays; horizon windows are then binary searches instead of per-entry date parsing.
+HORIZONS = {"1Y": 365, "3Y": 3 * 365, "5Y": 5 * 365}
+# The latest NAV usually trails today by a day or more (weekends, holidays, publishing
+# lag), so the window reaches past the longest horizon to keep a point on or before its start
+NAV_LOOKBACK_MARGIN_DAYS = int(os.getenv("NAV_LOOKBACK_MARGIN_DAYS", "15"))
+NAV_WINDOW_DAYS = HORIZONS["5Y"] + NAV_LOOKBACK_MARGIN_DAYS
+SERIES_CACHE_SIZE = int(os.getenv("NAV_SERIES_CACHE_SIZE", "4096"))
+
+# date.toordinal() of 1970-01-01
+_EPOCH_ORDINAL = 719163
+_DAYS_IN_MONTH = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+@lru_cache(maxsize=65536)
+def parse_date(text):
+    """
+    Parse an mfapi 'dd-mm-yyyy' date into a proleptic Gregorian ordinal (as date.toordinal()).
+
+    Hand-written to avoid strptime; results are memoized because every fund shares the
+    same trading days. Raises ValueError for anything that is not a valid date.
+    """
+    if len(text) != 10 or text[2] != '-' or text[5] != '-':
+        raise ValueError(f"Invalid date format: {text}")
+    day, month, year = int(text[0:2]), int(text[3:5]), int(text[6:10])
+    if not 1 <= month <= 12 or not 1 <= day <= _DAYS_IN_MONTH[month - 1]:
+        raise ValueError(f"Invalid date: {text}")
+    leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    if month == 2 and day == 29 and not leap:
+        raise ValueError(f"Invalid date: {text}")
+    # Days from civil date (Howard Hinnant's algorithm), shifted from the Unix epoch to ordinals
+    year -= month <= 2
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468 + _EPOCH_ORDINAL
+
+
+class NavSeries:
+    """Ascending, de-duplicated NAV points as (ordinal day, nav) arrays."""
+
+    __slots__ = ("days", "navs")
+
+    def __init__(self, days, navs):
+        self.days = days
+        self.navs = navs
+
+    @classmethod
+    def from_entries(cls, entries):
+        days = []
+        navs = []
+        for entry in entries:
+            try:
+                day = parse_date(entry['date'])
+                nav = float(entry['nav'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if nav > 0:
+                days.append(day)
+                navs.append(nav)
+        days = np.array(days, dtype=np.int64)
+        navs = np.array(navs, dtype=np.float64)
+        if len(days) > 1:
+            if np.all(days[1:] < days[:-1]):
+                # mfapi's usual newest-first order: a reverse is enough
+                days, navs = days[::-1].copy(), navs[::-1].copy()
+            elif not np.all(days[1:] > days[:-1]):
+                # Any other order is sorted explicitly; the last entry for a repeated day wins
+                order = np.argsort(days, kind='stable')
+                days, navs = days[order], navs[order]
+                keep = np.append(days[1:] != days[:-1], True)
+                days, navs = days[keep], navs[keep]
+        return cls(days, navs)
+
+    def __len__(self):
+        return len(self.days)
+
+    def since(self, start_day):
+        """Points on or after an ordinal day, found by binary search."""
+        i = np.searchsorted(self.days, start_day, side='left')
+        return NavSeries(self.days[i:], self.navs[i:])
+
+    def window(self, horizon, today=None):
+        """Points within a horizon ('1Y', '3Y', '5Y' or a number of days) ending today."""
+        days = HORIZONS[horizon] if isinstance(horizon, str) else int(horizon)
+        today = (today or date.today()).toordinal()
+        return self.since(today - days)
+
+
+class SeriesCache:
+    """LRU of parsed series per scheme, invalidated when the scheme's payload changes."""
+
+    def __init__(self, maxsize=SERIES_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(entries):
+        return (len(entries), entries[0].get('date') if entries else None, entries[-1].get('date') if entries else None)
+
+    def lookup(self, scheme_code, version):
+        """The cached series for a scheme if it was parsed at `version`, else None."""
+        key = str(scheme_code)
+        with self._lock:
+            cached = self._data.get(key)
+            if cached and cached[0] == version:
+                self._data.move_to_end(key)
+                cache_requests.inc(cache="nav_series", result="hit")
+                return cached[1]
+        cache_requests.inc(cache="nav_series", result="miss")
+        return None
+
+    def put(self, scheme_code, version, series):
+        key = str(scheme_code)
+        with self._lock:
+            self._data[key] = (version, series)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return series
+
+    def get(self, scheme_code, fund_data):
+        """The parsed series of an mfapi payload, versioned by its entry count and end dates."""
+        entries = fund_data.get('data', []) if fund_data else []
+        version = self._version(entries)
+        series = self.lookup(scheme_code, version)
+        if series is None:
+            series = self.put(scheme_code, version, NavSeries.from_entries(entries))
+        return series
+
+
+series_cache = SeriesCache()
@@ -0,0 +1,159 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from nav_series import parse_date
+
+log = logging.getLogger(__name__)
+
+# === Local NAV history store ===
+# NAV points are kept in SQLite keyed by schemeCode so repeat requests read from disk
+# instead of downloading the full mfapi history again.
+NAV_STORE_PATH = os.getenv("NAV_STORE_PATH", "nav_store.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schemes (
+    scheme_code TEXT PRIMARY KEY,
+    meta TEXT NOT NULL,
+    last_date TEXT,
+    refreshed_on TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nav (
+    scheme_code TEXT NOT NULL,
+    date TEXT NOT NULL,
+    nav TEXT NOT NULL,
+    PRIMARY KEY (scheme_code, date)
+) WITHOUT ROWID;
+"""
+
+
+def to_iso(date_str):
+    """Convert an mfapi 'dd-mm-yyyy' date into a sortable 'yyyy-mm-dd' string."""
+    return date.fromordinal(parse_date(date_str)).isoformat()
+
+
+def from_iso(iso_str):
+    return f"{iso_str[8:10]}-{iso_str[5:7]}-{iso_str[0:4]}"
+
+
+class NavStore:
+    def __init__(self, path=NAV_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection for one transaction: committed, or rolled back on error, then closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def scheme_state(self, scheme_code):
+        """Return (last_date, refreshed_on) as ISO strings, or None for unknown schemes."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT last_date, refreshed_on FROM schemes WHERE scheme_code = ?",
+                (str(scheme_code),)
+            ).fetchone()
+        return row
+
+    def summary(self, scheme_code):
+        """Return (meta, last_date) for a stored scheme without reading its NAV points, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT meta, last_date FROM schemes WHERE scheme_code = ?", (str(scheme_code),)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def load(self, scheme_code, since=None):
+        """
+        Return the stored scheme in mfapi's response shape ({'meta': ..., 'data': [...]}),
+        newest first, optionally limited to points on or after the `since` date.
+        """
+        scheme_code = str(scheme_code)
+        with self._connect() as conn:
+            row = conn.execute("SELECT meta FROM schemes WHERE scheme_code = ?", (scheme_code,)).fetchone()
+            if not row:
+                return None
+            since_iso = since.strftime('%Y-%m-%d') if since else ''
+            points = conn.execute(
+                "SELECT date, nav FROM nav WHERE scheme_code = ? AND date >= ? ORDER BY date DESC",
+                (scheme_code, since_iso)
+            ).fetchall()
+        return {
+            "meta": json.loads(row[0]),
+            "data": [{"date": from_iso(d), "nav": nav} for d, nav in points],
+            "status": "SUCCESS",
+        }
+
+    def merge(self, scheme_code, fund_data):
+        """
+        Merge an mfapi payload into the store, writing only points newer than the last
+        stored date. Returns the number of points inserted.
+        """
+        scheme_code = str(scheme_code)
+        state = self.scheme_state(scheme_code)
+        last_date = state[0] if state else None
+        new_points = []
+        for entry in fund_data.get('data', []):
+            try:
+                iso = to_iso(entry['date'])
+            except (KeyError, ValueError):
+                log.warning("Invalid NAV entry for scheme code %s: %s", scheme_code, entry)
+                continue
+            if last_date is None or iso > last_date:
+                new_points.append((scheme_code, iso, str(entry.get('nav', ''))))
+        newest = max([p[1] for p in new_points], default=last_date)
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO nav (scheme_code, date, nav) VALUES (?, ?, ?)", new_points)
+            conn.execute(
+                "INSERT OR REPLACE INTO schemes (scheme_code, meta, last_date, refreshed_on) VALUES (?, ?, ?, ?)",
+                (scheme_code, json.dumps(fund_data.get('meta', {})), newest, date.today().isoformat())
+            )
+        return len(new_points)
+
+    def mark_refreshed(self, scheme_code):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE schemes SET refreshed_on = ? WHERE scheme_code = ?",
+                (date.today().isoformat(), str(scheme_code))
+            )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NavStore()
+        return _store
+
+
+if __name__ == '__main__':
+    # Cold-start bulk loader: python nav_store.py <scheme_code> [<scheme_code> ...]
+    # or python nav_store.py --file codes.txt (one scheme code per line)
+    import sys
+    import asyncio
+    from enrichment import bulk_load
+
+    args = sys.argv[1:]
+    if args[:1] == ['--file']:
+        with open(args[1], encoding='utf-8') as f:
+            codes = [line.strip() for line in f if line.strip()]
+    else:
+        codes = args
+    if not codes:
+        sys.exit("Usage: python nav_store.py <scheme_code> ... | --file codes.txt")
+    loaded = asyncio.run(bulk_load(codes))
+    print(f"Loaded NAV history for {loaded} of {len(codes)} schemes into {NAV_STORE_PATH}")
@@ -0,0 +1,75 @@
+import re
+import threading
+
+# === Rule-based profile -> Twelve Data filter mapping ===
+# The advisor form only offers a few risk and timeline choices, so those profiles are
+# mapped locally; anything the rules do not recognise still goes to the Lyzr agent.
+RISK_LEVELS = {
+    "conservative": "conservative", "low": "conservative", "very low": "conservative",
+    "moderate": "moderate", "medium": "moderate", "balanced": "moderate",
+    "aggressive": "aggressive", "high": "aggressive", "very high": "aggressive",
+}
+
+# (risk tolerance, horizon) -> (risk_rating, performance_rating) on Twelve Data's 0-5 scale
+RATING_RULES = {
+    ("conservative", "short"): (1, 4), ("conservative", "medium"): (2, 4), ("conservative", "long"): (2, 4),
+    ("moderate", "short"): (2, 4), ("moderate", "medium"): (3, 4), ("moderate", "long"): (3, 4),
+    ("aggressive", "short"): (3, 4), ("aggressive", "medium"): (4, 4), ("aggressive", "long"): (5, 4),
+}
+
+HORIZON_ORDER = ("short", "medium", "long")
+_YEARS_RE = re.compile(r"(\d+(?:\.\d+)?)\s*\+?\s*(?:years?|yrs?)")
+
+
+def _horizon(timeline_item):
+    text = timeline_item.strip().lower()
+    for horizon in HORIZON_ORDER:
+        if text.startswith(horizon):
+            return horizon
+    years = [float(y) for y in _YEARS_RE.findall(text)]
+    if not years:
+        return None
+    longest = max(years)
+    if longest <= 2:
+        return "short"
+    return "medium" if longest <= 5 else "long"
+
+
+def rule_parameters(profile):
+    """
+    Map a UserProfile to Twelve Data filters without calling the agent.
+
+    Returns None when the risk tolerance or timeline is not recognised. With several
+    timelines the shortest one wins, since it bounds how much risk is appropriate.
+    """
+    risk = RISK_LEVELS.get(profile.risk_tolerance.strip().lower())
+    horizons = [_horizon(item) for item in profile.timeline]
+    if risk is None or not horizons or None in horizons:
+        return None
+    horizon = min(horizons, key=HORIZON_ORDER.index)
+    risk_rating, performance_rating = RATING_RULES[(risk, horizon)]
+    return {"performance_rating": performance_rating, "risk_rating": risk_rating}
+
+
+class ExtractionStats:
+    """Counts how parameters were obtained, to report the fast-path share."""
+
+    def __init__(self):
+        self.rules = 0
+        self.agent = 0
+        self._lock = threading.Lock()
+
+    def record(self, path):
+        with self._lock:
+            setattr(self, path, getattr(self, path) + 1)
+
+    def stats(self):
+        total = self.rules + self.agent
+        return {
+            "fast_path": self.rules,
+            "agent_path": self.agent,
+            "fast_path_ratio": round(self.rules / total, 4) if total else None,
+        }
+
+
+extraction_stats = ExtractionStats()
@@ -0,0 +1,173 @@
+import os
+import re
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# === Monte Carlo growth projections ===
+# Portfolio paths are simulated by bootstrapping historical monthly returns (21 trading
+# rows, rebalanced to the target weights each month) taken from the aligned NAV matrix.
+MONTE_CARLO_PATHS = int(os.getenv("MONTE_CARLO_PATHS", "100000"))
+MONTE_CARLO_SEED = os.getenv("MONTE_CARLO_SEED")  # set for reproducible projections
+MONTE_CARLO_WORKERS = int(os.getenv("MONTE_CARLO_WORKERS", "1"))
+# Path counts above this are split across a process pool when MONTE_CARLO_WORKERS > 1
+PARALLEL_THRESHOLD = int(os.getenv("MONTE_CARLO_PARALLEL_THRESHOLD", "500000"))
+CHUNK_PATHS = 20000
+# The horizon comes from model output, so it is bounded before anything is allocated for it
+MAX_PROJECTION_YEARS = int(os.getenv("MAX_PROJECTION_YEARS", "30"))
+DEFAULT_PROJECTION_YEARS = 10
+MONTH_ROWS = 21
+PERCENTILES = (5, 50, 95)
+
+
+def monthly_portfolio_returns(filled, weights):
+    """
+    Historical monthly returns of a portfolio rebalanced to `weights`.
+
+    `filled` is the forward-filled NAV matrix from analytics.build_nav_matrix restricted
+    to the portfolio's funds; windows where any fund has no NAV yet are dropped.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    if filled.shape[0] <= MONTH_ROWS:
+        return np.empty(0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fund_returns = filled[MONTH_ROWS:] / filled[:-MONTH_ROWS] - 1
+    fund_returns = fund_returns[~np.isnan(fund_returns).any(axis=1)]
+    return fund_returns @ weights
+
+
+def _simulate_chunk(log_returns, n_paths, years, seed):
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(0, len(log_returns), size=(n_paths, years * 12))
+    yearly = log_returns[draws].reshape(n_paths, years, 12).sum(axis=2)
+    return np.cumsum(yearly, axis=1)
+
+
+def simulate_growth(monthly_returns, initial_investment, years=10, n_paths=MONTE_CARLO_PATHS,
+                    seed=MONTE_CARLO_SEED, workers=MONTE_CARLO_WORKERS):
+    """
+    Simulate portfolio value paths and summarise them per year.
+
+    Returns one dict per year shaped like the Growth_Projection entries of the
+    recommendation schema: median (Projected_Value), 95th (Best_Case) and 5th
+    (Worst_Case) percentile values, mean cumulative return in percent and the median
+    path's CAGR in percent. With a seed the output is identical whether or not the
+    process pool is used, because every chunk gets its own spawned seed.
+    """
+    monthly_returns = np.asarray(monthly_returns, dtype=np.float64)
+    if len(monthly_returns) == 0 or years < 1 or n_paths < 1:
+        return []
+    log_returns = np.log1p(monthly_returns)
+
+    sizes = [CHUNK_PATHS] * (n_paths // CHUNK_PATHS)
+    if n_paths % CHUNK_PATHS:
+        sizes.append(n_paths % CHUNK_PATHS)
+    seeds = np.random.SeedSequence(None if seed is None else int(seed)).spawn(len(sizes))
+
+    if workers > 1 and n_paths > PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_simulate_chunk, [log_returns] * len(sizes), sizes,
+                                   [years] * len(sizes), seeds))
+    else:
+        chunks = [_simulate_chunk(log_returns, size, years, s) for size, s in zip(sizes, seeds)]
+    growth = np.exp(np.concatenate(chunks))
+
+    worst, median, best = np.percentile(growth, PERCENTILES, axis=0)
+    mean = growth.mean(axis=0)
+    projection = []
+    for year in range(1, years + 1):
+        i = year - 1
+        projection.append({
+            "Year": year,
+            "Projected_Value": round(float(initial_investment * median[i]), 2),
+            "Best_Case": round(float(initial_investment * best[i]), 2),
+            "Worst_Case": round(float(initial_investment * worst[i]), 2),
+            "Expected_Return": round(float((mean[i] - 1) * 100), 2),
+            "CAGR": round(float((median[i] ** (1 / year) - 1) * 100), 2),
+        })
+    return projection
+
+
+# An amount as models write it: "₹5,00,000", "₹5 lakh", "1.5 Cr", "$1e6", "-12.5% p.a."
+_AMOUNT = re.compile(
+    r"\s*(?P<sign>[-+\u2212]?)\s*(?:[₹$€£]|rs\.?|inr|usd)?\s*(?P<sign2>[-+\u2212]?)"
+    r"(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:e[-+]?\d+)?)\s*"
+    r"(?:(?P<unit>lakhs?|lacs?|l|crores?|crs?|k|thousand|mn|million|bn|billion)\b\.?)?(?P<rest>.*)",
+    re.IGNORECASE | re.DOTALL,
+)
+# A second number right after the first makes a range ("5-7%", "10 to 12 lakh"): no single value
+_RANGE = re.compile(r"\s*(?:[-\u2013\u2014~/]|to\b)\s*[₹$€£]?\s*\d", re.IGNORECASE)
+_MAGNITUDES = {
+    "l": 1e5, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "cr": 1e7, "crs": 1e7, "crore": 1e7, "crores": 1e7,
+    "k": 1e3, "thousand": 1e3, "mn": 1e6, "million": 1e6, "bn": 1e9, "billion": 1e9,
+}
+
+
+def to_number(value):
+    """
+    A number from model output, with Indian and western magnitude words applied.
+
+    Returns None for text that does not start with a single amount (labels such as
+    "Year 7", ranges such as "5-7%", or no digits at all) rather than guessing.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _AMOUNT.match(str(value).replace(",", ""))
+    if not match or _RANGE.match(match.group('rest')):
+        return None
+    number = float(match.group('number'))
+    unit = match.group('unit')
+    if unit:
+        number *= _MAGNITUDES[unit.lower()]
+    if (match.group('sign') or match.group('sign2')) in ("-", "\u2212"):
+        number = -number
+    return number
+
+
+def projection_years(growth_projection, this_year=None):
+    """
+    The number of years a model-written Growth_Projection covers, within 1..MAX_PROJECTION_YEARS.
+
+    Years above 100 are read as calendar years ("2030") and counted from this year;
+    DEFAULT_PROJECTION_YEARS is used when no row gives a usable year.
+    """
+    this_year = this_year or date.today().year
+    offsets = []
+    for row in growth_projection or []:
+        year = to_number(row.get('Year')) if isinstance(row, dict) else None
+        if year and year > 100:
+            year -= this_year
+        if year and year >= 1:
+            offsets.append(int(year))
+    return min(max(offsets, default=DEFAULT_PROJECTION_YEARS), MAX_PROJECTION_YEARS)
+
+
+def project_plan(plan, scheme_codes, filled, years=None, n_paths=MONTE_CARLO_PATHS, seed=MONTE_CARLO_SEED):
+    """
+    Simulate the Growth_Projection for a Sample_Investment_Plan.
+
+    Allocation entries are matched to columns of the `filled` NAV matrix by scheme code
+    and weighted by their Percentage. The horizon defaults to the number of years the
+    plan already projects (see projection_years) and is never more than
+    MAX_PROJECTION_YEARS. Returns None when the plan cannot be simulated.
+    """
+    initial = to_number(plan.get('Initial_Investment'))
+    if not initial or initial <= 0:
+        return None
+    columns = {str(code): j for j, code in enumerate(scheme_codes)}
+    weights = np.zeros(filled.shape[1])
+    for allocation in plan.get('Allocation') or []:
+        column = columns.get(str(allocation.get('Scheme_Code')))
+        percentage = to_number(allocation.get('Percentage'))
+        if column is not None and percentage and percentage > 0:
+            weights[column] += percentage
+    if not weights.any():
+        return None
+    if years is None:
+        years = projection_years(plan.get('Growth_Projection'))
+    years = min(int(years), MAX_PROJECTION_YEARS)
+    held = weights > 0
+    returns = monthly_portfolio_returns(filled[:, held], weights[held])
+    return simulate_growth(returns, initial, years, n_paths=n_paths, seed=seed) or None
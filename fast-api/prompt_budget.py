@@ -0,0 +1,63 @@
+import os
+
+# === Token budget for the Gemini request ===
+# The prompt plus the uploaded dataset must fit PROMPT_TOKEN_BUDGET; when they do not,
+# the lowest-ranked funds are dropped first.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "30000"))
+PROMPT_MIN_FUNDS = int(os.getenv("PROMPT_MIN_FUNDS", "3"))
+# weekly, monthly or quarterly NAV points per fund, or "none" to send summary statistics only
+PROMPT_NAV_GRANULARITY = os.getenv("PROMPT_NAV_GRANULARITY", "monthly").lower()
+# Rough average for English text and numeric tables with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(content):
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="ignore")
+    return (len(content) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_schema(schema):
+    """Drop the indentation and line breaks of a pretty-printed JSON template."""
+    return "".join(line.strip() for line in schema.splitlines())
+
+
+def rank_funds(metrics):
+    """Fund indexes best first: by Sharpe ratio, then 3Y return; funds without metrics go last."""
+    def key(i):
+        row = metrics[i]
+        sharpe = row.get("sharpe_ratio")
+        ret = row.get("return_3Y")
+        return (sharpe is None, -(sharpe or 0.0), ret is None, -(ret or 0.0))
+    return sorted(range(len(metrics)), key=key)
+
+
+def fit_to_budget(metrics, render, budget=PROMPT_TOKEN_BUDGET, min_funds=PROMPT_MIN_FUNDS):
+    """
+    Keep as many of the best-ranked funds as fit the token budget.
+
+    `render(indexes)` builds (prompt, csv_bytes) for the funds at those indexes, in
+    their original order. Token cost grows with the number of funds, so the largest
+    count that fits is found by binary search. At least `min_funds` are kept even if
+    they exceed the budget. Returns (indexes, prompt, csv_bytes, estimated_tokens).
+    """
+    ranked = rank_funds(metrics)
+
+    def attempt(count):
+        indexes = sorted(ranked[:count])
+        prompt, csv_bytes = render(indexes)
+        return indexes, prompt, csv_bytes, estimate_tokens(prompt) + estimate_tokens(csv_bytes)
+
+    best = attempt(len(ranked))
+    if best[3] <= budget:
+        return best
+    low, high = min(min_funds, len(ranked)), len(ranked) - 1
+    best = attempt(low)
+    while low < high:
+        middle = (low + high + 1) // 2
+        candidate = attempt(middle)
+        if candidate[3] <= budget:
+            best, low = candidate, middle
+        else:
+            high = middle - 1
+    return best
@@ -0,0 +1,480 @@
+import re
+import json
+import logging
+from typing import Annotated, List, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, ValidationError
+from pydantic_core import to_jsonable_python
+from projections import to_number
+
+# === Typed recommendation schema and a forgiving, incremental parser for it ===
+# The model's answer is repaired as it is tokenized (fences, prose, comments, trailing or
+# missing commas, Python literals, stray quotes, truncation) and each top-level section
+# is validated as soon as its closing bracket streams in.
+log = logging.getLogger(__name__)
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (bool, int, float)):
+        return str(value)
+    if isinstance(value, list):
+        return ", ".join(filter(None, map(_text, value)))
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _number(value):
+    # Amounts and percentages arrive as "₹5,00,000", "₹5 lakh" or "12.5%" as often as plain numbers
+    if value is None or isinstance(value, (bool, dict, list)):
+        return None
+    return to_number(value)
+
+
+def _integer(value):
+    number = _number(value)
+    return None if number is None else int(number)
+
+
+def _text_list(value):
+    if value is None:
+        return []
+    return [text for text in map(_text, value if isinstance(value, list) else [value]) if text]
+
+
+def _records(value):
+    # A lone object where a list belongs, and non-object items inside one, are common slips
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    return []
+
+
+def _record(value):
+    if isinstance(value, list):
+        value = next((item for item in value if isinstance(item, dict)), None)
+    return value if isinstance(value, dict) else {}
+
+
+Text = Annotated[Optional[str], BeforeValidator(_text)]
+Number = Annotated[Optional[float], BeforeValidator(_number)]
+Integer = Annotated[Optional[int], BeforeValidator(_integer)]
+TextList = Annotated[List[str], BeforeValidator(_text_list)]
+
+
+def records_of(model):
+    return Annotated[List[model], BeforeValidator(_records)]
+
+
+def record_of(model):
+    return Annotated[model, BeforeValidator(_record)]
+
+
+class Section(BaseModel):
+    # Fields the model adds beyond the schema are passed through to the dashboard
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+
+class FundRef(Section):
+    Scheme_Code: Text = None
+    Fund_Name: Text = None
+
+
+class InvestmentAction(Section):
+    Action: Text = None
+    Details: Text = None
+    Priority: Text = None
+    Timeline: Text = None
+    Expected_Impact: Text = None
+    Associated_Strategies: TextList = []
+
+
+class HistoricalReturn(Section):
+    Time_Period: Text = None
+    Return_Percentage: Number = None
+
+
+class MutualFund(FundRef):
+    Fund_House: Text = None
+    Scheme_Type: Text = None
+    Scheme_Category: Text = None
+    Performance_Rating: Text = None
+    Risk_Rating: Text = None
+    Currency: Text = None
+    Exchange: Text = None
+    MIC_Code: Text = None
+    Latest_NAV: Number = None
+    Historical_Returns: records_of(HistoricalReturn) = []
+    Expense_Ratio: Number = None
+    AUM: Text = None  # carries its unit, e.g. "₹12,450 Cr"
+
+
+class KeyMetrics(Section):
+    Return_1Y: Number = Field(None, alias="1Y_Return")
+    Return_3Y: Number = Field(None, alias="3Y_Return")
+    Return_5Y: Number = Field(None, alias="5Y_Return")
+    Standard_Deviation: Number = None
+    Sharpe_Ratio: Number = None
+
+
+class SupportedFund(FundRef):
+    Allocation_Percentage: Number = None
+    Key_Metrics: record_of(KeyMetrics) = Field(default_factory=KeyMetrics)
+
+
+class DiversificationStrategy(Section):
+    Strategy: Text = None
+    Description: Text = None
+    Benefits: Text = None
+    Recommended_Allocation: Text = None
+    Supported_Funds: records_of(SupportedFund) = []
+
+
+class PlanAllocation(FundRef):
+    Investment_Amount: Number = None
+    Percentage: Number = None
+    Projected_Returns: Number = None
+    Investment_Strategy: Text = None
+
+
+class GrowthProjection(Section):
+    Year: Integer = None
+    Projected_Value: Number = None
+    Best_Case: Number = None
+    Worst_Case: Number = None
+    Expected_Return: Number = None
+    CAGR: Number = None
+
+
+class InvestmentPlan(Section):
+    Initial_Investment: Number = None
+    Allocation: records_of(PlanAllocation) = []
+    Growth_Projection: records_of(GrowthProjection) = []
+
+
+class SupportingData(Section):
+    Metric: Text = None
+    Value: Number = None
+    Change: Number = None
+    Date: Text = None
+
+
+class MarketTrend(Section):
+    Trend: Text = None
+    Analysis: Text = None
+    Impact: Text = None
+    Direction: Text = None
+    Confidence: Text = None
+    Supporting_Data: records_of(SupportingData) = []
+
+
+class RiskAssessment(Section):
+    Risk: Text = None
+    Category: Text = None
+    Severity: Text = None
+    Probability: Text = None
+    Impact_Score: Number = None
+    Assessment: Text = None
+    Mitigation_Strategies: Text = None
+    Associated_Funds: records_of(FundRef) = []
+
+
+class ProjectedOutcome(Section):
+    Time_Horizon: Text = None
+    Projected_Return: Number = None
+    Details: Text = None
+    Assumptions: Text = None
+    Risk_Adjusted_Return: Number = None
+
+
+class Justification(Section):
+    Title: Text = None
+    Details: Text = None
+    Associated_Funds: records_of(FundRef) = []
+
+
+class Recommendation(Section):
+    """The dashboard's recommendation document; a section the model left out is empty, not missing."""
+    Investment_Actions: records_of(InvestmentAction) = []
+    Top_Mutual_Funds: records_of(MutualFund) = []
+    Diversification_Strategies: records_of(DiversificationStrategy) = []
+    Sample_Investment_Plan: record_of(InvestmentPlan) = Field(default_factory=InvestmentPlan)
+    Market_Trends: records_of(MarketTrend) = []
+    Risk_Assessment: records_of(RiskAssessment) = []
+    Projected_Outcomes: records_of(ProjectedOutcome) = []
+    Justifications: records_of(Justification) = []
+
+
+class Prediction(BaseModel):
+    recommendations: Recommendation
+    estimated_prompt_tokens: int
+
+
+def validate_section(name, value):
+    """A top-level section validated on its own; unknown sections are passed through as they are."""
+    if name not in Recommendation.model_fields:
+        return value
+    # Validators are built once with the model class, so this costs one field's validation
+    return getattr(Recommendation.model_validate({name: value}), name)
+
+
+def dump_section(value):
+    """JSON-ready form of a validated section, with the schema's field names."""
+    return to_jsonable_python(value, by_alias=True)
+
+
+_WORD = re.compile(r"[A-Za-z0-9_.+\-]+")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_LITERALS = {
+    "true": "true", "false": "false", "null": "null",
+    "True": "true", "False": "false", "None": "null",
+    "NaN": "null", "Infinity": "null", "-Infinity": "null", "undefined": "null",
+}
+# Opening quote -> closing quote, including the typographic quotes some models emit
+_QUOTES = {'"': '"', "'": "'", "“": "”", "”": "”"}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+_CLOSERS = {"{": "}", "[": "]"}
+_SPACE = re.compile(r"\s*")
+_KEY_AHEAD = re.compile(r'"[^"\\\n]*"\s*:')
+# Runs of string content up to the next backslash or closing quote
+_PLAIN_RUNS = {quote: re.compile(r"[^\\%s]*" % quote) for quote in set(_QUOTES.values())}
+
+
+class RecommendationParser:
+    """
+    Incremental parser for a streamed model answer.
+
+    feed() takes chunks of text as they arrive and returns the names of the top-level
+    sections completed by them, already validated into `sections`; finish() closes
+    whatever the model left open and returns the Recommendation.
+    """
+
+    def __init__(self):
+        self.sections = {}
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._closed = False
+        self._stack = []   # closers of the open containers, outermost first
+        self._state = None  # what the innermost container expects next: key, colon, value or after
+        self._member = []  # JSON tokens of the top-level member being read
+        self._completed = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        self._scan(final=False)
+        completed, self._completed = self._completed, []
+        return completed
+
+    def finish(self):
+        self._scan(final=True)
+        if not self._started:
+            raise ValueError("No JSON object in the model response.")
+        while self._stack:
+            self._close()
+        return Recommendation.model_construct(**self.sections)
+
+    # --- tokenizer ---
+
+    def _scan(self, final):
+        while not self._closed:
+            if not self._started:
+                # Skip the ```json fence or any prose before the object
+                start = self._buffer.find("{", self._pos)
+                if start < 0:
+                    self._pos = len(self._buffer)
+                    break
+                self._pos = start
+                self._started = True
+            token = self._read_token(final)
+            if token is None:
+                break
+            self._push(*token)
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+
+    def _read_token(self, final):
+        """The next (kind, text) token, or None when the buffer ends inside one."""
+        buf, n = self._buffer, len(self._buffer)
+        while True:
+            i = self._pos = _SPACE.match(buf, self._pos).end()
+            if i >= n:
+                return None
+            ch = buf[i]
+            if ch in "{}[]:,":
+                self._pos = i + 1
+                return {"{": "open", "[": "open", "}": "close", "]": "close", ":": "colon", ",": "comma"}[ch], ch
+            if ch in _QUOTES:
+                return self._read_string(i, final)
+            if ch == "/" and buf.startswith(("//", "/*"), i):
+                end = buf.find("\n" if buf[i + 1] == "/" else "*/", i + 2)
+                if end < 0 and not final:
+                    return None
+                self._pos = n if end < 0 else end + (1 if buf[i + 1] == "/" else 2)
+                continue
+            match = _WORD.match(buf, i)
+            if match:
+                if match.end() == n and not final:
+                    return None
+                self._pos = match.end()
+                return "word", match.group()
+            # Anything else outside a string (a stray backtick, '%' after a number) is dropped
+            self._pos = i + 1
+
+    def _read_string(self, start, final):
+        buf, n = self._buffer, len(self._buffer)
+        closing = _QUOTES[buf[start]]
+        plain = _PLAIN_RUNS[closing]
+        chars = []
+        j = start + 1
+        while j < n:
+            run = plain.match(buf, j).end()
+            if run > j:
+                chars.append(buf[j:run])
+                j = run
+                continue
+            c = buf[j]
+            if c == "\\":
+                if j + 1 >= n or (buf[j + 1] == "u" and j + 6 > n):
+                    break
+                escape = buf[j + 1]
+                if escape == "u":
+                    try:
+                        chars.append(chr(int(buf[j + 2:j + 6], 16)))
+                        j += 6
+                        continue
+                    except ValueError:
+                        pass
+                chars.append(_ESCAPES.get(escape, escape))
+                j += 2
+                continue
+            # A quote ends the string only when structure follows it; otherwise it is an
+            # unescaped quote inside the text. Another string on a later line, or a key, after
+            # it means a missing comma.
+            k = _SPACE.match(buf, j + 1).end()
+            if k >= n and not final:
+                return None
+            if (k >= n or buf[k] in ",:}]"
+                    or (buf[k] in _QUOTES and ("\n" in buf[j:k] or _KEY_AHEAD.match(buf, k)))):
+                self._pos = j + 1
+                return "string", "".join(chars)
+            chars.append(c)
+            j += 1
+        if not final:
+            return None
+        # The answer was cut off inside this string
+        self._pos = n
+        return "string", "".join(chars)
+
+    # --- structure ---
+
+    def _push(self, kind, text):
+        if kind == "word":
+            literal = _LITERALS.get(text)
+            if literal is None and _NUMBER.fullmatch(text):
+                literal = text
+            kind, text = ("value", literal) if literal else ("string", text)
+        if kind == "string":
+            kind, text = "value", json.dumps(text, ensure_ascii=False)
+
+        in_object = self._stack and self._stack[-1] == "}"
+        if kind == "comma":
+            if self._state == "value" and in_object:
+                self._emit("null")
+                self._state = "after"
+            if self._state == "after":
+                self._separate()
+            return
+        if kind == "colon":
+            if self._state == "colon":
+                self._emit(":")
+                self._state = "value"
+            return
+        if kind == "close":
+            if text in self._stack:
+                while self._stack[-1] != text:
+                    self._close()
+                self._close()
+            return
+
+        if not self._stack:
+            # The outermost object
+            self._stack.append("}")
+            self._state = "key"
+            return
+        if self._state == "after":
+            self._separate()
+        if in_object and self._state == "key" and kind == "value":
+            if not text.startswith('"'):
+                text = json.dumps(text)
+            self._emit(text)
+            self._state = "colon"
+            return
+        if self._state == "colon":
+            self._emit(":")
+        self._emit(text)
+        if kind == "open":
+            self._stack.append(_CLOSERS[text])
+            self._state = "key" if text == "{" else "value"
+        else:
+            self._state = "after"
+
+    def _emit(self, text):
+        self._member.append(text)
+
+    def _separate(self):
+        if len(self._stack) == 1:
+            self._complete_member()
+        else:
+            self._emit(",")
+        self._state = "key" if self._stack[-1] == "}" else "value"
+
+    def _close(self):
+        closer = self._stack[-1]
+        if self._state == "colon":
+            self._member.pop()  # a key without a value
+        elif self._state == "value" and closer == "}":
+            self._emit("null")
+        if self._member and self._member[-1] == ",":
+            self._member.pop()
+        self._stack.pop()
+        if self._stack:
+            self._emit(closer)
+            self._state = "after"
+        else:
+            self._complete_member()
+            self._closed = True
+
+    def _complete_member(self):
+        member, self._member = self._member, []
+        if len(member) < 3:
+            return
+        try:
+            name = json.loads(member[0])
+            value = json.loads("".join(member[2:]))
+        except ValueError as e:
+            log.warning("Dropping unparseable section %s: %s", member[0], e)
+            return
+        try:
+            self.sections[name] = validate_section(name, value)
+        except ValidationError as e:
+            log.warning("Dropping invalid section %s: %s", name, e)
+            return
+        self._completed.append(name)
+
+
+def parse_recommendations(answer):
+    """The Recommendation in a complete model answer; raises ValueError when it holds no JSON object."""
+    # Well-formed answers skip the tokenizer
+    start, end = answer.find("{"), answer.rfind("}")
+    try:
+        document = json.loads(answer[start:end + 1]) if 0 <= start < end else None
+        if isinstance(document, dict):
+            return Recommendation.model_validate(document)
+    except (ValueError, ValidationError):
+        pass
+    parser = RecommendationParser()
+    parser.feed(answer)
+    return parser.finish()
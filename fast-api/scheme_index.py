@@ -0,0 +1,149 @@
+import os
+import re
+import logging
+import threading
+from collections import defaultdict
+import httpx
+from upstream import mfapi, UpstreamError
+
+log = logging.getLogger(__name__)
+
+# === In-process fund name -> scheme code index ===
+# Built once from mfapi's full scheme master list and rebuilt periodically in the
+# background, so resolving fund names needs no network call on the request path.
+MFAPI_BASE_URL = os.getenv("MFAPI_BASE_URL", "https://api.mfapi.in/mf")
+SCHEME_MASTER_URL = MFAPI_BASE_URL
+REFRESH_INTERVAL = float(os.getenv("SCHEME_INDEX_REFRESH_SECONDS", str(24 * 3600)))
+FUZZY_THRESHOLD = float(os.getenv("SCHEME_INDEX_FUZZY_THRESHOLD", "0.6"))
+
+# Plan/option words that distinguish share classes of the same scheme
+VARIANT_TOKENS = {
+    "direct", "regular", "growth", "plan", "option", "idcw", "dividend", "payout",
+    "reinvestment", "bonus", "fund", "scheme", "the",
+}
+
+# Option words of income-distributing share classes. Their NAVs drop at every payout, so
+# returns computed from them understate the scheme: the Growth option is preferred unless
+# the query asks for one of these.
+PAYOUT_TOKENS = {"idcw", "dividend", "payout", "reinvestment", "bonus"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(name):
+    return _TOKEN_RE.findall(name.lower().replace("&", " and "))
+
+
+def normalize(name):
+    """Lowercase, drop punctuation and share-class words: 'ABC Fund - Direct Plan - Growth' -> 'abc'."""
+    return " ".join(t for t in tokenize(name) if t not in VARIANT_TOKENS)
+
+
+class SchemeIndex:
+    def __init__(self, schemes):
+        self._names = []
+        self._codes = []
+        self._tokens = []
+        self._exact = {}
+        self._normalized = defaultdict(list)
+        self._postings = defaultdict(set)
+        for scheme in schemes:
+            name = scheme.get('schemeName')
+            code = scheme.get('schemeCode')
+            if not name or code is None:
+                continue
+            idx = len(self._names)
+            tokens = set(tokenize(name))
+            self._names.append(name)
+            self._codes.append(code)
+            self._tokens.append(tokens)
+            self._exact.setdefault(name.lower(), idx)
+            self._normalized[normalize(name)].append(idx)
+            for token in tokens - VARIANT_TOKENS:
+                self._postings[token].add(idx)
+        self.size = len(self._names)
+
+    def _option_matches(self, i, query_tokens):
+        """Whether a scheme is a payout class exactly when the query asks for one (IDCW and dividend are synonyms)."""
+        return bool(self._tokens[i] & PAYOUT_TOKENS) == bool(query_tokens & PAYOUT_TOKENS)
+
+    def _best_variant(self, candidates, query_tokens):
+        # Among share classes of the same scheme, prefer the Growth option unless the query
+        # asks for a payout class, then the one sharing the most words with the query
+        # (e.g. 'Direct' + 'Growth'), then the shortest name.
+        return max(candidates, key=lambda i: (
+            self._option_matches(i, query_tokens), len(self._tokens[i] & query_tokens), -len(self._names[i])
+        ))
+
+    def resolve(self, fund_name):
+        """Return the best matching scheme code for a fund name, or None if nothing is close enough."""
+        idx = self._exact.get(fund_name.lower())
+        if idx is not None:
+            return self._codes[idx]
+
+        query_tokens = set(tokenize(fund_name))
+        candidates = self._normalized.get(normalize(fund_name))
+        if candidates:
+            return self._codes[self._best_variant(candidates, query_tokens)]
+
+        core = query_tokens - VARIANT_TOKENS
+        if not core:
+            return None
+        scores = defaultdict(int)
+        for token in core:
+            for i in self._postings.get(token, ()):
+                scores[i] += 1
+        best, best_key = None, None
+        for i, shared in scores.items():
+            score = shared / len(core | (self._tokens[i] - VARIANT_TOKENS))
+            key = (score, self._option_matches(i, query_tokens), len(self._tokens[i] & query_tokens),
+                   -len(self._names[i]))
+            if best_key is None or key > best_key:
+                best, best_key = i, key
+        if best is not None and best_key[0] >= FUZZY_THRESHOLD:
+            return self._codes[best]
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+_refresh_thread = None
+
+
+def get_index():
+    """Return the current index, or None if it has not been built yet."""
+    return _index
+
+
+def rebuild_index():
+    global _index
+    try:
+        response = mfapi.request("GET", SCHEME_MASTER_URL, timeout=60)
+        response.raise_for_status()
+        schemes = response.json()
+    except (UpstreamError, httpx.HTTPError, ValueError) as e:
+        log.warning("Failed to rebuild scheme index: %s", e)
+        return None
+    index = SchemeIndex(schemes)
+    with _index_lock:
+        _index = index
+    log.info("Scheme index rebuilt with %d schemes.", index.size)
+    return index
+
+
+def _refresh_loop(stop_event):
+    while not stop_event.is_set():
+        rebuild_index()
+        stop_event.wait(REFRESH_INTERVAL)
+
+
+def start_background_refresh():
+    """Build the index in a daemon thread and rebuild it every REFRESH_INTERVAL seconds."""
+    global _refresh_thread
+    if _refresh_thread and _refresh_thread.is_alive():
+        return _refresh_thread.stop_event
+    stop_event = threading.Event()
+    _refresh_thread = threading.Thread(target=_refresh_loop, args=(stop_event,), daemon=True)
+    _refresh_thread.stop_event = stop_event
+    _refresh_thread.start()
+    return stop_event
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import queue
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+# === Latency spans, counters and request traces ===
+# Stages and upstream calls are timed into histograms and exposed in Prometheus text
+# format on /metrics. Log records are handed to a background thread, so the request
+# path never blocks on writing to stdout.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Log every prediction's spans as one JSON line on the "trace" logger
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "false").lower() in ("1", "true", "yes")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values]
+
+
+class Gauge(Metric):
+    """A gauge whose value is read from a callback when the metrics are rendered."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._functions = {}
+
+    def set_function(self, fn, **labels):
+        with self._lock:
+            self._functions[_label_key(self.labelnames, labels)] = fn
+
+    def render(self):
+        with self._lock:
+            functions = sorted(self._functions.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(fn())}" for key, fn in functions]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        """The registered metrics in Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+stage_seconds = Histogram(
+    "advisor_stage_duration_seconds", "Time spent in each prediction pipeline stage.", ["stage"])
+upstream_seconds = Histogram(
+    "advisor_upstream_request_duration_seconds", "Duration of each upstream HTTP attempt.", ["upstream"])
+upstream_errors = Counter(
+    "advisor_upstream_errors_total", "Failed upstream attempts by kind (status code, transport or circuit_open).",
+    ["upstream", "kind"])
+cache_requests = Counter(
+    "advisor_cache_requests_total", "Cache lookups by cache and result (hit or miss).", ["cache", "result"])
+funds_skipped = Counter(
+    "advisor_funds_skipped_total", "Listed funds left out of a prediction, by reason.", ["reason"])
+
+
+class Trace:
+    """Spans recorded during one request, in the order they finished."""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration, error=None):
+        span = {"name": name, "start_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2)}
+        if error:
+            span["error"] = error
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {"trace_id": self.id, "name": self.name,
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 2), "spans": spans}
+
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+trace_log = logging.getLogger("trace")
+
+
+@contextmanager
+def timed(histogram, name, **labels):
+    """Observe the duration of the block in `histogram` and add it to the current trace as `name`."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        histogram.observe(duration, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, start, duration, error)
+
+
+def span(stage):
+    return timed(stage_seconds, stage, stage=stage)
+
+
+@contextmanager
+def trace_request(name):
+    """
+    Collect the spans of one request and log them as a single JSON line when it ends.
+
+    A no-op unless TRACE_REQUESTS is set, and nested calls join the outer trace. Code
+    run on other threads joins it when started through contextvars.copy_context().
+    """
+    if not TRACE_REQUESTS or _current_trace.get() is not None:
+        yield _current_trace.get()
+        return
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace_log.info(json.dumps(trace.to_dict()))
+
+
+_listener = None
+
+
+def configure_logging(level=LOG_LEVEL):
+    """Send log records through a queue to a background writer; does nothing if logging is already set up."""
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(level)
+    # httpx logs every request at INFO, which would put a line per mfapi call on the hot path
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
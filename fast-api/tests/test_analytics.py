@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+import pytest
+from analytics import fund_metrics, nav_matrix
+from nav_series import NavSeries, NAV_WINDOW_DAYS
+from nav_store import NavStore
+
+TODAY = date(2026, 10, 17)  # a Saturday
+GROWTH = 1.10  # NAV grows 10% a year
+
+
+def history(latest, years=7):
+    """Weekday NAVs in mfapi's newest-first shape, growing at GROWTH per year up to `latest`."""
+    entries = []
+    day = latest
+    while day > latest - timedelta(days=int(years * 365.25)):
+        if day.weekday() < 5:
+            nav = 100 * GROWTH ** ((day - latest).days / 365.25)
+            entries.append({"date": day.strftime("%d-%m-%Y"), "nav": f"{nav:.5f}"})
+        day -= timedelta(days=1)
+    return entries
+
+
+@pytest.mark.parametrize("latest", [date(2026, 10, 14), date(2026, 10, 16), date(2026, 10, 17)])
+def test_five_year_return_with_latest_nav_behind_today(latest):
+    series = NavSeries.from_entries(history(latest)).window(NAV_WINDOW_DAYS, today=TODAY)
+    metrics = fund_metrics(nav_matrix([series]))[0]
+    for period in ("1Y", "3Y", "5Y"):
+        assert metrics[f"return_{period}"] == pytest.approx(10.0, abs=0.1)
+
+
+def test_five_year_return_from_store_window(tmp_path):
+    store = NavStore(str(tmp_path / "nav.sqlite3"))
+    store.merge("100001", {"meta": {}, "data": history(date(2026, 10, 15))})
+    since = TODAY - timedelta(days=NAV_WINDOW_DAYS)
+    fund_data = store.load("100001", since=since)
+    series = NavSeries.from_entries(fund_data["data"]).window(NAV_WINDOW_DAYS, today=TODAY)
+    assert fund_metrics(nav_matrix([series]))[0]["return_5Y"] == pytest.approx(10.0, abs=0.1)
+
+
+def test_five_year_return_needs_five_years_of_history():
+    series = NavSeries.from_entries(history(date(2026, 10, 16), years=4))
+    assert fund_metrics(nav_matrix([series]))[0]["return_5Y"] is None
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from fastapi import HTTPException
+import app
+import genai_client
+from bench.fake_upstreams import FakeGemini, LatencyModel
+from cache import ResultCache, profile_key
+from nav_series import NavSeries
+
+FILTERS = {
+    "Low": {"performance_rating": 4, "risk_rating": 2},
+    "High": {"performance_rating": 5, "risk_rating": 5},
+}
+LISTINGS = {
+    2: ["Alpha Debt Fund", "Shared Hybrid Fund"],
+    5: ["Gamma Small Cap Fund", "Shared Hybrid Fund", "Delta Midcap Fund"],
+}
+CODES = {"Alpha Debt Fund": 101, "Shared Hybrid Fund": 102, "Gamma Small Cap Fund": 103, "Delta Midcap Fund": 104}
+
+
+def user_profile(risk, income="150000"):
+    return app.UserProfile(
+        risk_tolerance=risk, financial_goals=["Retirement"], timeline=["10 years"],
+        income=income, expenses="60000", savings="900000", debt_levels="0",
+    )
+
+
+def nav_series(code):
+    rng = np.random.default_rng(code)
+    days = [d for d in (date.today() - timedelta(days=n) for n in range(3 * 365, 0, -1)) if d.weekday() < 5]
+    navs = 100 * np.cumprod(1 + rng.normal(0.0004, 0.01, len(days)))
+    return NavSeries(np.array([d.toordinal() for d in days], dtype=np.int64), navs)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    calls = {"listings": [], "resolved": []}
+
+    async def extract_parameters(profile):
+        if profile.risk_tolerance not in FILTERS:
+            raise HTTPException(status_code=400, detail="Missing required parameter: risk_rating")
+        return {**FILTERS[profile.risk_tolerance], "country": "India"}
+
+    async def list_funds(api_parameters):
+        calls["listings"].append(api_parameters["risk_rating"])
+        return [{"name": name, "symbol": name[:4].upper()} for name in LISTINGS[api_parameters["risk_rating"]]]
+
+    async def resolve_funds(funds, on_resolved=None):
+        calls["resolved"].append([fund["name"] for fund in funds])
+        return [(CODES[f["name"]], {"meta": {"fund_house": "Test"}, "series": nav_series(CODES[f["name"]])})
+                for f in funds]
+
+    fake = FakeGemini(LatencyModel(scale=0))
+    monkeypatch.setattr(genai_client.upload_cache, "client", fake)
+    monkeypatch.setattr(genai_client, "_models", {genai_client.GEMINI_MODEL: fake.GenerativeModel()})
+    monkeypatch.setattr(app, "prediction_cache", ResultCache("test", 64, 60))
+    monkeypatch.setattr(app, "extract_parameters", extract_parameters)
+    monkeypatch.setattr(app, "list_funds", list_funds)
+    monkeypatch.setattr(app, "resolve_funds", resolve_funds)
+    return calls
+
+
+def run_batch(profiles):
+    events = []
+    counts = asyncio.run(app.predict_batch(profiles, emit=lambda event, data: events.append((event, data))))
+    return counts, events
+
+
+def fund_names(result):
+    return {fund["Fund_Name"] for fund in result["recommendations"]["Top_Mutual_Funds"]}
+
+
+def test_batch_shares_listings_and_fund_resolution(batch):
+    profiles = [
+        user_profile("Low"),
+        user_profile("Low", income="90000"),
+        user_profile("High"),
+        user_profile("High", income="400000"),
+        user_profile("Unknown"),
+    ]
+    cached = {"recommendations": {"cached": True}, "estimated_prompt_tokens": 0}
+    app.prediction_cache.set(profile_key(profiles[0]), cached)
+
+    (completed, failed), events = run_batch(profiles)
+
+    assert (completed, failed) == (4, 1)
+    # The cached profile is answered before any shared work starts
+    assert events[0] == ("result", {"index": 0, "result": cached})
+    # One listing per distinct filter set, one resolution of each distinct fund
+    assert sorted(batch["listings"]) == [2, 5]
+    assert len(batch["resolved"]) == 1
+    assert sorted(batch["resolved"][0]) == sorted(CODES)
+
+    results = {data["index"]: data for event, data in events if event in ("result", "error")}
+    assert results[4]["status_code"] == 400
+    # Each profile only sees the funds of its own listing, sliced out of the shared matrix
+    for index, listing in ((1, 2), (2, 5), (3, 5)):
+        result = results[index]["result"]
+        assert fund_names(result) == set(LISTINGS[listing])
+        plan = result["recommendations"]["Sample_Investment_Plan"]
+        assert {a["Scheme_Code"] for a in plan["Allocation"]} == {str(CODES[n]) for n in LISTINGS[listing]}
+        assert len(plan["Growth_Projection"]) == 10
+
+
+def test_batch_of_cached_profiles_does_no_work(batch):
+    profiles = [user_profile("Low"), user_profile("High")]
+    for profile in profiles:
+        app.prediction_cache.set(profile_key(profile), {"recommendations": {}, "estimated_prompt_tokens": 0})
+    (completed, failed), events = run_batch(profiles)
+    assert (completed, failed) == (2, 0)
+    assert batch == {"listings": [], "resolved": []}
@@ -0,0 +1,181 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import cache
+from cache import ResultCache, TTLCache, _bucket, profile_key
+
+PROFILE = dict(
+    risk_tolerance="Medium", financial_goals=["Retirement", "Wealth"], timeline=["10 years"],
+    income="150000", expenses="60000", savings="900000", debt_levels="0",
+)
+
+
+def profile(**changes):
+    return SimpleNamespace(**{**PROFILE, **changes})
+
+
+@pytest.mark.parametrize("amount, expected", [
+    ("150000", "150000"),
+    ("1,50,000", "150000"),
+    ("152,000", "150000"),
+    ("12.34", "12"),
+    ("0", "0"),
+    ("5 lakh", "5 lakh"),
+    ("5 Lakh per month", "5 lakh per month"),
+    ("₹ 1.5 Cr", "1.5 cr"),
+    ("None", "none"),
+])
+def test_bucket(amount, expected):
+    assert _bucket(amount) == expected
+
+
+@pytest.mark.parametrize("changes", [
+    {"risk_tolerance": "  medium "},
+    {"financial_goals": ["wealth", "Retirement "]},
+    {"income": "1,50,000"},
+    {"income": "151000"},
+])
+def test_equivalent_profiles_share_a_key(changes):
+    assert profile_key(profile(**changes)) == profile_key(profile())
+
+
+@pytest.mark.parametrize("changes", [
+    {"risk_tolerance": "High"},
+    {"financial_goals": ["Retirement"]},
+    {"timeline": ["5 years"]},
+    {"income": "200000"},
+    {"savings": "9 lakh"},
+    {"debt_levels": "10000"},
+])
+def test_different_profiles_get_different_keys(changes):
+    assert profile_key(profile(**changes)) != profile_key(profile())
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    ttl_cache = TTLCache(maxsize=4, ttl=10)
+    ttl_cache.set("a", 1)
+    clock.now += 9
+    assert ttl_cache.get("a") == 1
+    clock.now += 2
+    assert ttl_cache.get("a") is None
+    assert len(ttl_cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    ttl_cache = TTLCache(maxsize=2, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")  # "b" is now the least recently used
+    ttl_cache.set("c", 3)
+    assert (ttl_cache.get("a"), ttl_cache.get("b"), ttl_cache.get("c")) == (1, None, 3)
+
+
+@pytest.mark.parametrize("path", ["", "disk"])
+def test_concurrent_callers_share_one_computation(tmp_path, path):
+    result_cache = ResultCache("test", 8, 60, str(tmp_path / "cache.sqlite3") if path else "")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": 42}
+
+    async def scenario():
+        results = await asyncio.gather(*(result_cache.aget_or_compute("k", compute) for _ in range(5)))
+        return results + [await result_cache.aget_or_compute("k", compute)]
+
+    results = asyncio.run(scenario())
+    assert results == [{"value": 42}] * 6
+    assert len(calls) == 1
+    assert result_cache.stats() == {"hits": 1, "misses": 5, "size": 1}
+    if path:
+        # A new process reads the disk tier
+        assert ResultCache("test", 8, 60, str(tmp_path / "cache.sqlite3")).get("k") == {"value": 42}
+
+
+def test_disk_tier_is_used_off_the_event_loop(tmp_path, monkeypatch):
+    result_cache = ResultCache("test", 8, 60, str(tmp_path / "cache.sqlite3"))
+    threads = []
+    monkeypatch.setattr(asyncio, "to_thread", lambda fn, *args: threads.append(fn.__name__) or _run(fn, *args))
+
+    async def _run(fn, *args):
+        return fn(*args)
+
+    async def compute():
+        return {"value": 42}
+
+    async def scenario():
+        await result_cache.aget_or_compute("k", compute)
+        result_cache.memory = TTLCache(8, 60)
+        return await result_cache.aget("k")
+
+    assert asyncio.run(scenario()) == {"value": 42}
+    assert threads == ["get", "set", "get"]
+    assert result_cache.memory.get("k") == {"value": 42}
+
+
+def test_none_is_not_cached():
+    result_cache = ResultCache("test", 8, 60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return None
+
+    async def scenario():
+        return [await result_cache.aget_or_compute("k", compute) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [None, None]
+    assert len(calls) == 2
+    assert len(result_cache.memory) == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    result_cache = ResultCache("test", 8, 60)
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def succeed():
+        return "ok"
+
+    async def scenario():
+        errors = await asyncio.gather(*(result_cache.aget_or_compute("k", fail) for _ in range(3)),
+                                      return_exceptions=True)
+        return errors, await result_cache.aget_or_compute("k", succeed)
+
+    errors, retried = asyncio.run(scenario())
+    assert [str(e) for e in errors] == ["upstream down"] * 3
+    assert len(calls) == 1
+    assert retried == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_work():
+    result_cache = ResultCache("test", 8, 60)
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(result_cache.aget_or_compute("k", compute))
+        second = asyncio.ensure_future(result_cache.aget_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+    assert result_cache.get("k") == "done"
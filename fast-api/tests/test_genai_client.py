@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+import genai_client
+from bench.fake_upstreams import FakeFile, FakeGemini, LatencyModel
+from genai_client import UploadCache, get_model
+
+
+class CountingGemini(FakeGemini):
+    """FakeGemini with no latency that counts calls and hands out files expiring after `ttl`."""
+
+    def __init__(self, ttl=timedelta(hours=48)):
+        super().__init__(LatencyModel(scale=0))
+        self.ttl = ttl
+        self.uploads = 0
+        self.models = []
+
+    def upload_file(self, source, mime_type=None):
+        self.uploads += 1
+        uploaded = super().upload_file(source, mime_type)
+        return FakeFile(uploaded.name, uploaded.data, datetime.now(timezone.utc) + self.ttl)
+
+    def GenerativeModel(self, model_name=None):
+        self.models.append(model_name)
+        return super().GenerativeModel(model_name)
+
+
+def test_identical_bytes_reuse_one_upload():
+    client = CountingGemini()
+    cache = UploadCache(client=client)
+    first = cache.upload(b"scheme_code,name\n1,A\n")
+    assert cache.upload(b"scheme_code,name\n1,A\n") is first
+    assert client.uploads == 1
+    assert cache.upload(b"scheme_code,name\n2,B\n") is not first
+    assert client.uploads == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+
+def test_mime_type_is_part_of_the_key():
+    client = CountingGemini()
+    cache = UploadCache(client=client)
+    cache.upload(b"{}", mime_type="text/csv")
+    cache.upload(b"{}", mime_type="application/json")
+    assert client.uploads == 2
+
+
+@pytest.mark.parametrize("ttl, uploads", [
+    (timedelta(minutes=10), 2),  # inside the expiry margin: uploaded again
+    (timedelta(hours=2), 1),  # comfortably valid: reused
+])
+def test_reupload_near_expiry(ttl, uploads):
+    client = CountingGemini(ttl=ttl)
+    cache = UploadCache(client=client, margin=timedelta(minutes=30))
+    cache.upload(b"nav data")
+    cache.upload(b"nav data")
+    assert client.uploads == uploads
+
+
+def test_naive_expiration_time_is_treated_as_utc():
+    client = CountingGemini()
+    client.upload_file = lambda source, mime_type=None: FakeFile(
+        "files/naive", source.read(), datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=10))
+    cache = UploadCache(client=client, margin=timedelta(minutes=30))
+    first = cache.upload(b"nav data")
+    assert cache.upload(b"nav data") is not first
+
+
+def test_one_generative_model_per_name(monkeypatch):
+    monkeypatch.setattr(genai_client, "_models", {})
+    client = CountingGemini()
+    flash = get_model("gemini-1.5-flash", client=client)
+    assert get_model("gemini-1.5-flash", client=client) is flash
+    pro = get_model("gemini-1.5-pro", client=client)
+    assert pro is not flash
+    assert get_model("gemini-1.5-pro", client=client) is pro
+    assert client.models == ["gemini-1.5-flash", "gemini-1.5-pro"]
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from jobs import DONE, QUEUED, RUNNING, JobQueue, JobStore
+
+
+def counting_runner(runs):
+    async def runner(payload, emit):
+        runs.append(payload["n"])
+        emit("funds_listed", {"count": 1})
+        await asyncio.sleep(0.01)
+        return {"n": payload["n"]}
+    return runner
+
+
+async def wait_for_status(store, job_ids, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(store.get(job_id)["status"] == status for job_id in job_ids):
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+def test_job_interrupted_within_its_lease_is_resumed(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create({"n": 1})
+    # A process claimed the job and died moments ago, so its lease has not lapsed at startup
+    assert store.claim(job_id)
+    runs = []
+
+    async def scenario():
+        queue = JobQueue(counting_runner(runs), store=store, workers=1, lease=0.4)
+        await queue.start()
+        assert store.get(job_id)["status"] == RUNNING
+        try:
+            return await wait_for_status(store, [job_id], DONE)
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario())
+    assert runs == [1]
+    assert store.get(job_id)["result"] == {"n": 1}
+
+
+def test_live_job_keeps_its_lease(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create({"n": 1})
+    assert store.claim(job_id)
+    assert store.requeue_expired(lease=60) == []
+    assert store.get(job_id)["status"] == RUNNING
+
+
+def test_queued_job_left_by_a_dead_process_is_picked_up(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    runs = []
+
+    async def scenario():
+        queue = JobQueue(counting_runner(runs), store=store, workers=1, lease=0.4)
+        await queue.start()
+        # Written by another process that died before running it, after this one started
+        job_id = await asyncio.to_thread(store.create, {"n": 2})
+        try:
+            return await wait_for_status(store, [job_id], DONE)
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario())
+    assert runs == [2]
+
+
+def test_processes_sharing_a_store_run_each_job_once(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    runs = []
+
+    async def scenario():
+        first = JobQueue(counting_runner(runs), store=JobStore(path), workers=2, lease=0.4)
+        second = JobQueue(counting_runner(runs), store=JobStore(path), workers=2, lease=0.4)
+        await first.start()
+        job_ids = [await first.submit({"n": n}) for n in range(6)]
+        # The second process offers itself every queued job; claim() lets only one run each
+        await second.start()
+        try:
+            done = await wait_for_status(first.store, job_ids, DONE)
+            await asyncio.sleep(0.3)  # a sweep or two more, to catch any second run
+            return done
+        finally:
+            await first.stop()
+            await second.stop()
+
+    assert asyncio.run(scenario())
+    assert sorted(runs) == list(range(6))
+
+
+def test_stop_hands_a_running_job_back(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def slow(payload, emit):
+        await asyncio.sleep(60)
+
+    async def scenario():
+        queue = JobQueue(slow, store=store, workers=1, lease=60)
+        await queue.start()
+        job_id = await queue.submit({"n": 1})
+        assert await wait_for_status(store, [job_id], RUNNING)
+        await queue.stop()
+        return job_id
+
+    job_id = asyncio.run(scenario())
+    assert store.get(job_id)["status"] == QUEUED
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+import pytest
+from nav_series import NavSeries, parse_date
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("01-01-1970", date(1970, 1, 1)),
+    ("31-12-1999", date(1999, 12, 31)),
+    ("29-02-2000", date(2000, 2, 29)),
+    ("29-02-2024", date(2024, 2, 29)),
+    ("01-03-2100", date(2100, 3, 1)),
+    ("28-02-1900", date(1900, 2, 28)),
+    ("17-10-2026", date(2026, 10, 17)),
+])
+def test_parse_date(text, expected):
+    assert parse_date(text) == expected.toordinal()
+
+
+@pytest.mark.parametrize("text", [
+    "29-02-2023", "29-02-1900", "31-04-2024", "32-01-2024", "00-01-2024", "01-00-2024", "01-13-2024",
+    "1-1-2024", "2024-01-01", "01/01/2024", "aa-bb-cccc", "", "01-01-20245",
+])
+def test_parse_date_rejects(text):
+    with pytest.raises(ValueError):
+        parse_date(text)
+
+
+def test_parse_date_matches_datetime_every_day():
+    day = date(1995, 1, 1)
+    while day < date(2030, 1, 1):
+        assert parse_date(day.strftime("%d-%m-%Y")) == day.toordinal()
+        day += timedelta(days=1)
+
+
+def test_series_sorts_and_deduplicates():
+    series = NavSeries.from_entries([
+        {"date": "03-01-2024", "nav": "12"},
+        {"date": "01-01-2024", "nav": "10"},
+        {"date": "02-01-2024", "nav": "11"},
+        {"date": "01-01-2024", "nav": "10.5"},
+        {"date": "bad", "nav": "1"},
+        {"date": "04-01-2024", "nav": "0"},
+    ])
+    assert list(series.days) == [date(2024, 1, d).toordinal() for d in (1, 2, 3)]
+    assert list(series.navs) == [10.5, 11.0, 12.0]
+
+
+def test_stored_series_is_parsed_once_per_stored_version(tmp_path, monkeypatch):
+    import asyncio
+    import enrichment
+    from nav_series import SeriesCache
+    from nav_store import NavStore
+
+    store = NavStore(str(tmp_path / "nav.sqlite3"))
+    monkeypatch.setattr(enrichment, "get_store", lambda: store)
+    monkeypatch.setattr(enrichment, "series_cache", SeriesCache())
+    loads = []
+    load = store.load
+    monkeypatch.setattr(store, "load", lambda *args: loads.append(args) or load(*args))
+    today = date.today()
+    store.merge("100", {"meta": {"scheme_name": "A"}, "data": [
+        {"date": (today - timedelta(days=d)).strftime("%d-%m-%Y"), "nav": str(100 - d)} for d in range(1, 4)
+    ]})
+
+    def fetch():
+        return asyncio.run(enrichment.get_fund_data(None, None, "100"))
+
+    first, second = fetch(), fetch()
+    assert second["series"] is first["series"]
+    assert second["meta"] == {"scheme_name": "A"}
+    assert len(loads) == 1 and len(first["series"]) == 3
+
+    store.merge("100", {"meta": {"scheme_name": "A"}, "data": [{"date": today.strftime("%d-%m-%Y"), "nav": "101"}]})
+    assert len(fetch()["series"]) == 4
+    assert len(loads) == 2
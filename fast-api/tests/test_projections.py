@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from projections import MAX_PROJECTION_YEARS, project_plan, projection_years, to_number
+
+
+@pytest.mark.parametrize("text, expected", [
+    (500000, 500000.0),
+    (12.5, 12.5),
+    ("₹5,00,000", 500000.0),
+    ("₹5 lakh", 500000.0),
+    ("INR 10 lacs", 1000000.0),
+    ("5L", 500000.0),
+    ("1.5 Cr", 15000000.0),
+    ("₹ 2.5 crore", 25000000.0),
+    ("Rs. 50,000", 50000.0),
+    ("10k", 10000.0),
+    ("$1e6", 1000000.0),
+    ("$1.2 million", 1200000.0),
+    ("30%", 30.0),
+    ("-12.5% p.a.", -12.5),
+    ("+1.2%", 1.2),
+    ("\u22123%", -3.0),
+    ("5 lakhs per month", 500000.0),
+    ("₹5,00,000 over 10 years", 500000.0),
+    ("7 years", 7.0),
+    ("Year 7", None),
+    ("5-7%", None),
+    ("10 to 12 lakh", None),
+    ("N/A", None),
+    ("", None),
+])
+def test_to_number(text, expected):
+    assert to_number(text) == expected
+
+
+@pytest.mark.parametrize("rows, expected", [
+    ([{"Year": 1}, {"Year": 5}, {"Year": 10}], 10),
+    ([{"Year": "3"}, {"Year": "7 years"}], 7),
+    ([{"Year": "2027"}, {"Year": "2030"}], 4),
+    ([{"Year": 2031}], 5),
+    ([{"Year": 45}], MAX_PROJECTION_YEARS),
+    ([{"Year": "2126"}], MAX_PROJECTION_YEARS),
+    ([{"Year": "2020"}, {"Year": 0}, {"Year": None}, "oops"], 10),
+    ([], 10),
+    (None, 10),
+])
+def test_projection_years(rows, expected):
+    assert projection_years(rows, this_year=2026) == expected
+
+
+def test_calendar_year_projection_stays_bounded():
+    rng = np.random.default_rng(0)
+    filled = 100 * np.cumprod(1 + rng.normal(0.0004, 0.01, size=(600, 2)), axis=0)
+    plan = {
+        "Initial_Investment": 500000,
+        "Allocation": [{"Scheme_Code": "1", "Percentage": 60}, {"Scheme_Code": "2", "Percentage": 40}],
+        "Growth_Projection": [{"Year": "2030"}],
+    }
+    projection = project_plan(plan, ["1", "2"], filled, n_paths=1000, seed=1)
+    assert 1 <= len(projection) <= MAX_PROJECTION_YEARS
+    assert len(project_plan(plan, ["1", "2"], filled, years=2030, n_paths=1000, seed=1)) == MAX_PROJECTION_YEARS
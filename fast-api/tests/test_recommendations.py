@@ -0,0 +1,111 @@
+import json
+import pytest
+from recommendations import Recommendation, RecommendationParser, dump_section, parse_recommendations
+
+SAMPLE = {
+    "Investment_Actions": [{"Action": "Start a SIP", "Details": "Invest monthly", "Priority": "High"}],
+    "Sample_Investment_Plan": {
+        "Initial_Investment": 500000,
+        "Allocation": [{"Scheme_Code": "120503", "Fund_Name": "Axis Bluechip", "Percentage": 60}],
+        "Growth_Projection": [{"Year": 1, "Projected_Value": 555000}],
+    },
+    "Justifications": [{"Title": "Diversified", "Details": "Spread across \"large\" caps", "Associated_Funds": []}],
+}
+
+
+def parse(text):
+    parser = RecommendationParser()
+    parser.feed(text)
+    return dump_section(parser.finish())
+
+
+def justifications(text):
+    return [{k: v for k, v in row.items() if k != "Associated_Funds"} for row in parse(text)["Justifications"]]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"Justifications": [{"Title": "A", "Details": "B"}]}', [{"Title": "A", "Details": "B"}]),
+    ('Here you go:\n```json\n{"Justifications": [{"Title": "A", "Details": "B"}]}\n```\nHope it helps!',
+     [{"Title": "A", "Details": "B"}]),
+    ('{\n// why\n"Justifications": [/* one */ {"Title": "A", "Details": "B"}]}', [{"Title": "A", "Details": "B"}]),
+    ('{"Justifications": [{"Title": "A", "Details": "B",},],}', [{"Title": "A", "Details": "B"}]),
+    ('{"Justifications": [{"Title": "A"\n"Details": "B"}\n{"Title": "C"}]}',
+     [{"Title": "A", "Details": "B"}, {"Title": "C", "Details": None}]),
+    ("{'Justifications': [{'Title': 'A', 'Details': 'B'}]}", [{"Title": "A", "Details": "B"}]),
+    ('{"Justifications": [{“Title”: “A”, “Details”: “B”}]}', [{"Title": "A", "Details": "B"}]),
+    ('{Justifications: [{Title: "A", Details: "B"}]}', [{"Title": "A", "Details": "B"}]),
+    ('{"Justifications": [{"Title": "The "best" fund", "Details": "B"}]}',
+     [{"Title": 'The "best" fund', "Details": "B"}]),
+    ('{"Justifications": [{"Title": "line\\nbreak \\u00e9", "Details": "back\\\\slash"}]}',
+     [{"Title": "line\nbreak é", "Details": "back\\slash"}]),
+    ('{"Justifications": [{"Title": "A", "Details": }]}', [{"Title": "A", "Details": None}]),
+    ('{"Justifications": [{"Title": "A", "Details": "cut off mid', [{"Title": "A", "Details": "cut off mid"}]),
+    ('{"Justifications": [{"Title": "A", "Details":', [{"Title": "A", "Details": None}]),
+    # A record cut off inside its first key is kept, empty
+    ('{"Justifications": [{"Title": "A"}, {"Ti', [{"Title": "A", "Details": None}, {"Title": None, "Details": None}]),
+    ('{"Justifications": {"Title": "A", "Details": "B"}}', [{"Title": "A", "Details": "B"}]),
+    ('{"Justifications": [{"Title": "A", "Details": "B"}, "stray", 3]}', [{"Title": "A", "Details": "B"}]),
+])
+def test_repairs(text, expected):
+    assert justifications(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"Justifications": [{"Title": "A", "Flag": True, "Missing": None}]}', {"Flag": True, "Missing": None}),
+    ('{"Justifications": [{"Title": "A", "Score": NaN, "Limit": Infinity}]}', {"Score": None, "Limit": None}),
+    ('{"Justifications": [{"Title": "A", "Count": 3, "Ratio": -1.5e2}]}', {"Count": 3, "Ratio": -150.0}),
+])
+def test_literals_in_extra_fields(text, expected):
+    row = parse(text)["Justifications"][0]
+    assert {k: row[k] for k in expected} == expected
+
+
+def test_missing_sections_are_empty():
+    document = parse('{"Justifications": []}')
+    assert document["Investment_Actions"] == []
+    assert document["Sample_Investment_Plan"]["Allocation"] == []
+
+
+def test_values_are_coerced():
+    plan = parse('{"Sample_Investment_Plan": {"Initial_Investment": "₹5 lakh", '
+                 '"Allocation": {"Percentage": "60%", "Scheme_Code": 120503}}}')["Sample_Investment_Plan"]
+    assert plan["Initial_Investment"] == 500000.0
+    assert plan["Allocation"][0]["Percentage"] == 60.0
+    assert plan["Allocation"][0]["Scheme_Code"] == "120503"
+
+
+def test_no_object_raises():
+    with pytest.raises(ValueError):
+        parse("I cannot help with that.")
+
+
+def test_sections_complete_as_they_stream():
+    text = json.dumps(SAMPLE)
+    parser = RecommendationParser()
+    completed = []
+    for i in range(0, len(text), 7):
+        completed += parser.feed(text[i:i + 7])
+    parser.finish()
+    # The last section completes once the outer object closes or the answer ends
+    assert completed[:2] == ["Investment_Actions", "Sample_Investment_Plan"]
+    assert set(parser.sections) == set(SAMPLE)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 16, 64, 10 ** 6])
+def test_chunking_does_not_change_the_result(size):
+    text = "```json\n" + json.dumps(SAMPLE, indent=2).replace('"High"', "'High'") + "\n```"
+    parser = RecommendationParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    assert dump_section(parser.finish()) == dump_section(Recommendation.model_validate(SAMPLE))
+
+
+def test_every_truncation_parses():
+    text = json.dumps(SAMPLE)
+    for cut in range(text.index("{") + 1, len(text)):
+        parse(text[:cut])
+
+
+def test_parse_recommendations_fast_path_matches_parser():
+    text = "Sure!\n" + json.dumps(SAMPLE)
+    assert dump_section(parse_recommendations(text)) == parse(text)
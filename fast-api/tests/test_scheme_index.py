@@ -0,0 +1,78 @@
+import pytest
+import scheme_index
+from scheme_index import SchemeIndex, normalize
+
+# In mfapi's master order, where the IDCW share class often comes first: the old
+# search fallback took the first hit, the index must pick the Growth option instead
+SCHEMES = [
+    {"schemeCode": 120466, "schemeName": "Axis Bluechip Fund - Direct Plan - IDCW"},
+    {"schemeCode": 120465, "schemeName": "Axis Bluechip Fund - Direct Plan - Growth"},
+    {"schemeCode": 112278, "schemeName": "Axis Bluechip Fund - Regular Plan - IDCW"},
+    {"schemeCode": 112277, "schemeName": "Axis Bluechip Fund - Regular Plan - Growth"},
+    {"schemeCode": 101762, "schemeName": "HDFC Top 100 Fund - IDCW Option - Regular Plan"},
+    {"schemeCode": 101763, "schemeName": "HDFC Top 100 Fund - Growth Option - Regular Plan"},
+    {"schemeCode": 119018, "schemeName": "HDFC Top 100 Fund - Growth Option - Direct Plan"},
+    {"schemeCode": 125498, "schemeName": "SBI Small Cap Fund - Regular Plan - Dividend Payout"},
+    {"schemeCode": 125497, "schemeName": "SBI Small Cap Fund - Direct Plan - Growth"},
+    {"schemeCode": 118825, "schemeName": "Mirae Asset Large Cap Fund - Direct Plan - Growth"},
+    {"schemeCode": 118834, "schemeName": "Mirae Asset Emerging Bluechip Fund - Direct Plan - Growth"},
+    {"schemeCode": 120586, "schemeName": "ICICI Prudential Bluechip Fund - Growth"},
+    {"schemeCode": 102941, "schemeName": "Kotak Emerging Equity Scheme - Growth"},
+    {"schemeCode": None, "schemeName": "Missing code"},
+    {"schemeCode": 1, "schemeName": ""},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SchemeIndex(SCHEMES)
+
+
+def test_size_skips_incomplete_entries(index):
+    assert index.size == 13
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Axis Bluechip Fund - Direct Plan - Growth", "axis bluechip"),
+    ("HDFC Top 100 Fund - IDCW Option - Regular Plan", "hdfc top 100"),
+    ("Banking & PSU Debt", "banking and psu debt"),
+    ("The Scheme", ""),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    # Exact names, ignoring case, including an explicitly requested IDCW class
+    ("Axis Bluechip Fund - Direct Plan - IDCW", 120466),
+    ("AXIS BLUECHIP FUND - REGULAR PLAN - GROWTH", 112277),
+    # Normalized names: the Growth option unless a payout option is asked for
+    ("Axis Bluechip Fund", 120465),
+    ("Axis Bluechip", 120465),
+    ("Axis Bluechip Fund Regular", 112277),
+    ("Axis Bluechip Fund Regular IDCW", 112278),
+    ("HDFC Top 100 Fund Regular Plan Growth", 101763),
+    ("HDFC Top 100 Fund Direct", 119018),
+    ("HDFC Top 100 Fund Dividend", 101762),
+    ("SBI Small Cap Fund", 125497),
+    ("SBI Small Cap Fund Dividend Payout", 125498),
+    ("ICICI Prudential Bluechip", 120586),
+    # Fuzzy token overlap above the threshold
+    ("Mirae Large Cap Fund", 118825),
+    ("Mirae Asset Emerging Bluechip Direct", 118834),
+    ("Kotak Emerging", 102941),
+    # Nothing close enough
+    ("Axis Midcap Fund", None),
+    ("Quant Active Fund", None),
+    ("Direct Plan Growth", None),
+    ("", None),
+])
+def test_resolve(index, query, expected):
+    assert index.resolve(query) == expected
+
+
+@pytest.mark.parametrize("threshold, expected", [(0.6, 102941), (0.7, None)])
+def test_fuzzy_threshold(index, monkeypatch, threshold, expected):
+    # "Kotak Emerging" shares 2 of the 3 core words of "Kotak Emerging Equity Scheme"
+    monkeypatch.setattr(scheme_index, "FUZZY_THRESHOLD", threshold)
+    assert index.resolve("Kotak Emerging") == expected
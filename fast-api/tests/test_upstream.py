@@ -0,0 +1,155 @@
+import asyncio
+import time
+import httpx
+import pytest
+import upstream
+from upstream import CircuitBreaker, CircuitOpenError, TokenBucket, Upstream, UpstreamError
+
+URL = "https://upstream.test/resource"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(upstream, "RETRY_BASE_DELAY", 0.0)
+
+
+def make_upstream(name, responses, **options):
+    """An Upstream whose sync client answers from `responses` in order: status codes or exceptions."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        outcome = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"attempt": len(calls)})
+
+    options.setdefault("rate_per_minute", 0)
+    options.setdefault("burst", 1)
+    service = Upstream(name, **options)
+    service._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return service, calls
+
+
+@pytest.mark.parametrize("responses, status, attempts", [
+    ([200], 200, 1),
+    ([503, 200], 200, 2),
+    ([429, 502, 200], 200, 3),
+    ([httpx.ConnectError("refused"), 200], 200, 2),
+    ([httpx.ReadTimeout("slow"), httpx.ConnectError("refused"), 200], 200, 3),
+    ([404], 404, 1),
+    ([400, 200], 400, 1),
+    ([500], 500, 3),  # retries exhausted: the last response is returned
+])
+def test_retries(responses, status, attempts):
+    service, calls = make_upstream("retries", responses, max_retries=2)
+    assert service.request("GET", URL).status_code == status
+    assert len(calls) == attempts
+
+
+@pytest.mark.parametrize("responses, attempts", [
+    ([httpx.ConnectError("refused")], 3),  # transport errors are retried, then raised
+    ([httpx.DecodingError("garbled"), 200], 1),  # other HTTP errors are not retried
+])
+def test_errors_raise_upstream_error(responses, attempts):
+    service, calls = make_upstream("errors", responses, max_retries=2)
+    with pytest.raises(UpstreamError):
+        service.request("GET", URL)
+    assert len(calls) == attempts
+
+
+@pytest.mark.parametrize("header, delay", [("3", 3.0), ("120", upstream.RETRY_MAX_DELAY)])
+def test_retry_after_is_honoured_and_capped(header, delay):
+    service = Upstream("retry-after", rate_per_minute=0, burst=1)
+    response = httpx.Response(429, headers={"Retry-After": header})
+    assert service._retry_delay(1, response) == delay
+
+
+def test_breaker_opens_after_threshold_then_trial_closes_it():
+    service, calls = make_upstream("breaker", [500, 500, 200], max_retries=0, failure_threshold=2,
+                                   reset_timeout=0.05)
+    service.request("GET", URL)
+    assert service.breaker.state == "closed"
+    service.request("GET", URL)
+    assert service.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        service.request("GET", URL)
+    assert len(calls) == 2  # the open circuit made no call
+    time.sleep(0.06)
+    assert service.breaker.state == "half-open"
+    assert service.request("GET", URL).status_code == 200
+    assert service.breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker():
+    service, calls = make_upstream("reopen", [500, 500, 503], max_retries=0, failure_threshold=2,
+                                   reset_timeout=0.05)
+    service.request("GET", URL)
+    service.request("GET", URL)
+    time.sleep(0.06)
+    assert service.request("GET", URL).status_code == 503
+    assert service.breaker.state == "open"
+
+
+def test_half_open_allows_one_trial_at_a_time():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.0)
+    breaker.record(False)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_cancelled_trial_releases_its_slot():
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    async def scenario():
+        service = Upstream("cancel", rate_per_minute=0, burst=1, max_retries=0, failure_threshold=1,
+                           reset_timeout=0.0)
+        service.breaker.record(False)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            call = asyncio.ensure_future(service.arequest(client, "GET", URL))
+            await asyncio.sleep(0.01)
+            assert not service.breaker.allow()  # the trial is in flight
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+        return service.breaker.allow()
+
+    assert asyncio.run(scenario())
+
+
+def test_async_request_retries_then_succeeds():
+    statuses = iter([503, 200])
+
+    async def scenario():
+        service = Upstream("async", rate_per_minute=0, burst=1, max_retries=2)
+        transport = httpx.MockTransport(lambda request: httpx.Response(next(statuses)))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await service.arequest(client, "GET", URL)
+
+    assert asyncio.run(scenario()).status_code == 200
+
+
+def test_token_bucket_wait():
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(rate_per_minute=0, burst=1)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+
+
+@pytest.mark.parametrize("workers, rate, burst", [(1, 8.0, 8.0), (4, 2.0, 2.0), (16, 0.5, 1.0)])
+def test_quota_is_split_between_worker_processes(monkeypatch, workers, rate, burst):
+    monkeypatch.setenv("QUOTA_RATE_PER_MINUTE", "8")
+    service = Upstream.from_env("quota", workers=workers, burst=8)
+    assert service.bucket.rate * 60 == pytest.approx(rate)
+    assert service.bucket.capacity == burst
@@ -0,0 +1,273 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import httpx
+from telemetry import Gauge, timed, upstream_seconds, upstream_errors
+
+# === Shared upstream clients ===
+# Every outbound call goes through one Upstream per service: a keep-alive connection
+# pool, per-call timeouts, jittered retries on 429/5xx and transport errors, a circuit
+# breaker and a token-bucket rate limiter that keeps us under the provider's quota.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 8.0
+CIRCUIT_STATES = {"closed": 0, "half-open": 1, "open": 2}
+# Rate limits are provider quotas; with several server worker processes each one gets an
+# equal share, since their token buckets are not shared
+WORKER_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+circuit_state = Gauge(
+    "advisor_upstream_circuit_state", "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open).", ["upstream"])
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reserve() takes a token and returns how long to wait for it."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets one trial call through after `reset_timeout`."""
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Give up a trial slot without recording an outcome (e.g. the call was cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, success):
+        with self._lock:
+            self._trial_in_flight = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class Upstream:
+    def __init__(self, name, rate_per_minute, burst, timeout=10.0, max_retries=2,
+                 failure_threshold=5, reset_timeout=30.0, max_connections=20):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._async_client = None
+        circuit_state.set_function(lambda: CIRCUIT_STATES[self.breaker.state], upstream=name)
+
+    @classmethod
+    def from_env(cls, name, workers=WORKER_PROCESSES, **defaults):
+        """
+        Build an upstream whose settings can be overridden with <NAME>_RATE_PER_MINUTE etc.
+
+        The rate and burst are the provider's quota and are divided between `workers` processes.
+        """
+        prefix = name.upper()
+        settings = {
+            "rate_per_minute": float, "burst": float, "timeout": float, "max_retries": int,
+            "failure_threshold": int, "reset_timeout": float, "max_connections": int,
+        }
+        options = {}
+        for option, cast in settings.items():
+            value = os.getenv(f"{prefix}_{option.upper()}")
+            if value is not None:
+                options[option] = cast(value)
+            elif option in defaults:
+                options[option] = defaults[option]
+        for option in ("rate_per_minute", "burst"):
+            if option in options:
+                options[option] /= workers
+        return cls(name, **options)
+
+    def limits(self):
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    @property
+    def client(self):
+        """Shared keep-alive client for synchronous calls."""
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout, limits=self.limits())
+            return self._client
+
+    def close(self):
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    @property
+    def async_client(self):
+        """Keep-alive client for async calls on the app's event loop; None until open_clients()."""
+        return self._async_client
+
+    def open_async(self):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits())
+        return self._async_client
+
+    async def aclose(self):
+        client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+    def _retry_delay(self, attempt, response):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), RETRY_MAX_DELAY)
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            upstream_errors.inc(upstream=self.name, kind="circuit_open")
+            raise CircuitOpenError(f"{self.name} circuit is open; skipping call.")
+
+    def _attempt(self):
+        """Time one HTTP attempt into the upstream latency histogram and the request trace."""
+        return timed(upstream_seconds, f"upstream.{self.name}", upstream=self.name)
+
+    def _count_failure(self, response, error):
+        if error is not None:
+            upstream_errors.inc(upstream=self.name, kind="transport" if isinstance(error, httpx.TransportError) else "http")
+        elif response.status_code in RETRY_STATUSES:
+            upstream_errors.inc(upstream=self.name, kind=str(response.status_code))
+
+    def _finish(self, response, error):
+        """Record the outcome and return the response or raise; retryable failures are failures."""
+        failed = error is not None or response.status_code in RETRY_STATUSES
+        self.breaker.record(not failed)
+        if error is not None:
+            raise UpstreamError(f"{self.name} request failed: {error}") from error
+        return response
+
+    def request(self, method, url, **kwargs):
+        self._check_breaker()
+        response, error = None, None
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    time.sleep(self._retry_delay(attempt, response))
+                time.sleep(self.bucket.reserve())
+                try:
+                    with self._attempt():
+                        response, error = self.client.request(method, url, **kwargs), None
+                except httpx.HTTPError as e:
+                    response, error = None, e
+                self._count_failure(response, error)
+                if error is not None:
+                    if isinstance(error, httpx.TransportError):
+                        continue
+                    break
+                if response.status_code not in RETRY_STATUSES:
+                    break
+        except BaseException:
+            self.breaker.release()
+            raise
+        return self._finish(response, error)
+
+    async def arequest(self, client, method, url, **kwargs):
+        """Same policy as request(), on a caller-owned httpx.AsyncClient."""
+        self._check_breaker()
+        response, error = None, None
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(self._retry_delay(attempt, response))
+                await asyncio.sleep(self.bucket.reserve())
+                try:
+                    with self._attempt():
+                        response, error = await client.request(method, url, timeout=self.timeout, **kwargs), None
+                except httpx.HTTPError as e:
+                    response, error = None, e
+                self._count_failure(response, error)
+                if error is not None:
+                    if isinstance(error, httpx.TransportError):
+                        continue
+                    break
+                if response.status_code not in RETRY_STATUSES:
+                    break
+        except BaseException:
+            self.breaker.release()
+            raise
+        return self._finish(response, error)
+
+    def stats(self):
+        return {"circuit": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+
+lyzr = Upstream.from_env("lyzr", rate_per_minute=120, burst=10, timeout=60.0, max_retries=1)
+twelvedata = Upstream.from_env("twelvedata", rate_per_minute=8, burst=8, timeout=15.0)
+# ENRICH_REQUEST_TIMEOUT predates MFAPI_TIMEOUT and is still honoured as its default
+mfapi = Upstream.from_env("mfapi", rate_per_minute=600, burst=50, max_connections=16,
+                          timeout=float(os.getenv("ENRICH_REQUEST_TIMEOUT", "10")))
+
+UPSTREAMS = {upstream.name: upstream for upstream in (lyzr, twelvedata, mfapi)}
+
+
+def open_clients():
+    """Open the async client of every upstream; called from the app lifespan on its event loop."""
+    for upstream in UPSTREAMS.values():
+        upstream.open_async()
+
+
+async def close_clients():
+    for upstream in UPSTREAMS.values():
+        await upstream.aclose()
+        upstream.close()
@@ -36,36 +36,6 @@ const formSchema = z.object({
   totalDebt: z.string().min(1, 'Total debt is required'),
 });
 
-function formatResponseToJson(response: any) {
-  console.log(response);
-  try {
-    const regex = /```json\s*([\s\S]*?)\s*```/;
-    const match = response.recommendations.match(regex);
-    if (!match) {
-      throw new Error('JSON block not found');
-    }
-    const jsonStr = match[1];
-    const jsonObj = JSON.parse(jsonStr);
-    const requiredFields = [
-      'Market_Trends',
-      'Justifications',
-      'Risk_Assessment',
-      'Projected_Outcomes',
-    ];
-    requiredFields.forEach((field) => {
-      if (
-        !jsonObj[field] ||
-        (Array.isArray(jsonObj[field]) && jsonObj[field].length === 0)
-      ) {
-        jsonObj[field] = [{}];
-      }
-    });
-    return jsonObj;
-  } catch (error) {
-    throw new Error('Invalid JSON response from AI.');
-  }
-}
-
 export function AdvisorForm() {
   const [recommendations, setRecommendations] = useState<any>(null);
   const [loading, setLoading] = useState(false);
@@ -165,8 +135,8 @@ export function AdvisorForm() {
           debt_levels: values.totalDebt,
         }
       );
-      const formattedResponse = formatResponseToJson(response.data);
-      setRecommendations(formattedResponse);
+      // The API returns the recommendations already parsed and validated
+      setRecommendations(response.data.recommendations);
       // Set cooldown timestamp
       const newCooldownTimestamp = now + COOLDOWN_TIME * 1000;
       localStorage.setItem(
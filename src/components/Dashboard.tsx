@@ -56,7 +56,7 @@ interface Fund {
     Return_Percentage: number;
   }[];
   Expense_Ratio: number;
-  AUM?: number;
+  AUM?: string;
 }
 
 interface Strategy {